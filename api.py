@@ -0,0 +1,254 @@
+"""
+HTTP API for receipt extraction, for services that can't go through the
+Streamlit app.
+
+    uvicorn api:app --port 8000        (or: ocreceipt serve)
+
+Endpoints:
+    POST /extract          Multipart `files` (one or more receipts); returns
+                           {"results": [...]} in upload order. With
+                           stream=true the results come back as NDJSON, one
+                           line per receipt as soon as it finishes. With
+                           wait=false the receipts are queued and the job ids
+                           returned (202).
+    GET  /jobs/{id}        Status and result of a queued job
+    GET  /groups/{id}      All jobs queued by one request
+    GET  /health           Pool size, warm-up timings, receipts in flight, queue counts
+                           and per-stage timings across every receipt served
+    GET  /metrics          The same stage timings in the Prometheus text format
+
+The process holds one ReceiptWorkerPool (a warm EasyOCR reader per worker
+process) and a thread pool for LLM parsing, shared by direct requests and
+by the queue worker that serves wait=false jobs.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import threading
+import logging
+import asyncio
+import json
+import uuid
+import os
+import re
+
+from fastapi import FastAPI, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from extract_and_parse import describe_warmup
+from job_queue import JobQueue, DEFAULT_QUEUE_FILE, run_worker, submit_receipt
+from save_to_json import DEFAULT_TRANSACTIONS_FILE
+from worker_pool import ReceiptWorkerPool
+from preprocess import get_pipeline
+from tracing import metrics_snapshot, metrics_prometheus
+from utils import init_groq
+
+logger = logging.getLogger("uvicorn.error")
+
+OCR_WORKERS = int(os.getenv('OCRECEIPT_API_OCR_WORKERS', '0')) or None
+LLM_CONCURRENCY = int(os.getenv('OCRECEIPT_API_LLM_CONCURRENCY', '4'))
+
+# Receipts processed at once across all requests (0: what the OCR pool can hold)
+MAX_IN_FLIGHT = int(os.getenv('OCRECEIPT_API_MAX_IN_FLIGHT', '0'))
+
+# Receipts allowed to wait for a slot before new requests get 503
+MAX_WAITING = int(os.getenv('OCRECEIPT_API_MAX_WAITING', '64'))
+
+MAX_FILES = int(os.getenv('OCRECEIPT_API_MAX_FILES', '50'))
+
+# Serve wait=false jobs from this process; set to 0 when `ocreceipt worker` runs separately
+QUEUE_WORKER = os.getenv('OCRECEIPT_API_QUEUE_WORKER', '1') not in ('', '0')
+
+# Transaction logs live here; clients may only pick a bare *.jsonl name inside it
+OUTPUT_DIR = os.getenv('OCRECEIPT_API_OUTPUT_DIR', '.')
+OUTPUT_NAME = re.compile(r'[A-Za-z0-9][A-Za-z0-9_-]*\.jsonl')
+
+# Result keys returned to clients (the profile report stays in the queue)
+RESULT_FIELDS = ('ocr_text', 'transaction', 'saved_path', 'error', 'trace')
+
+class ConcurrencyLimit:
+    """
+    Caps the receipts processed at once, and rejects requests up front
+    once too many receipts are already waiting, instead of letting
+    latency grow without bound.
+    """
+
+    def __init__(self, max_in_flight, max_waiting):
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+    def reserve(self, count):
+        """Admit `count` receipts, or raise 503 when the wait line is full."""
+        if self.waiting + count > self.max_waiting:
+            raise HTTPException(503, "Too many receipts waiting, retry later", headers={'Retry-After': '1'})
+        self.waiting += count
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one in-flight slot; the receipt must have been reserved."""
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+def resolve_output_file(name):
+    """
+    Map the client's output_file to a log inside OUTPUT_DIR.
+
+    Anything but a bare *.jsonl name (separators, "..", hidden files, other
+    extensions such as the queue database) is rejected with a 422.
+    """
+    if not OUTPUT_NAME.fullmatch(name):
+        raise HTTPException(422, "output_file must be a bare .jsonl file name, e.g. transactions.jsonl")
+    return os.path.join(OUTPUT_DIR, name)
+
+@asynccontextmanager
+async def lifespan(app):
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    pool = ReceiptWorkerPool(OCR_WORKERS)
+    llm_executor = ThreadPoolExecutor(max_workers=LLM_CONCURRENCY)
+    # Load and warm every reader before taking traffic; missing models fail startup here
+    for report in (await asyncio.to_thread(pool.start)).values():
+        logger.info("OCR worker ready: %s", describe_warmup(report))
+
+    app.state.pool = pool
+    app.state.llm_executor = llm_executor
+    app.state.client = init_groq()
+    app.state.queue = JobQueue(DEFAULT_QUEUE_FILE)
+    app.state.limit = ConcurrencyLimit(MAX_IN_FLIGHT or pool.max_pending, MAX_WAITING)
+
+    stop_event = threading.Event()
+    worker = None
+    if QUEUE_WORKER:
+        worker = threading.Thread(
+            target=run_worker,
+            kwargs={'queue_path': DEFAULT_QUEUE_FILE, 'llm_concurrency': LLM_CONCURRENCY,
+                    'stop_event': stop_event, 'pool': pool, 'llm_executor': llm_executor},
+            daemon=True
+        )
+        worker.start()
+    try:
+        yield
+    finally:
+        stop_event.set()
+        if worker is not None:
+            await asyncio.to_thread(worker.join)
+        llm_executor.shutdown()
+        pool.close()
+        app.state.queue.close()
+
+app = FastAPI(title="OCReceipt", lifespan=lifespan)
+
+async def extract_one(name, image_bytes, settings):
+    """Run one receipt through the shared pools; returns its result dict."""
+    state = app.state
+    async with state.limit.slot():
+        try:
+            # submit_receipt may block briefly if the queue worker filled the OCR pool
+            future = await asyncio.to_thread(
+                submit_receipt, state.pool, state.llm_executor, image_bytes, settings, state.client, name
+            )
+            result = await asyncio.wrap_future(future)
+        except Exception as e:
+            result = {'ocr_text': None, 'transaction': None, 'saved_path': None, 'error': f"Error: {str(e)}"}
+    response = {'name': name}
+    response.update((key, result.get(key)) for key in RESULT_FIELDS)
+    return response
+
+async def stream_results(tasks):
+    """NDJSON lines in completion order; `index` is the receipt's position in the upload."""
+    for task in asyncio.as_completed(tasks):
+        index, result = await task
+        yield json.dumps({'index': index, **result}) + '\n'
+
+@app.post("/extract")
+async def extract(
+    files: list[UploadFile] = File(...),
+    use_preprocessing: bool = Form(True),
+    pipeline: str = Form('default'),
+    use_fast_path: bool = Form(True),
+    save: bool = Form(True),
+    output_file: str = Form(DEFAULT_TRANSACTIONS_FILE),
+    wait: bool = Query(True),
+    stream: bool = Query(False)
+):
+    if len(files) > MAX_FILES:
+        raise HTTPException(413, f"At most {MAX_FILES} files per request")
+    try:
+        get_pipeline(pipeline)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    output_file = resolve_output_file(output_file)
+    settings = {
+        'use_preprocessing': use_preprocessing,
+        'pipeline': pipeline,
+        'use_fast_path': use_fast_path,
+        'save': save,
+        'output_file': output_file
+    }
+    # Read everything up front; uploads are closed once the handler returns
+    uploads = [(upload.filename, await upload.read()) for upload in files]
+
+    if not wait:
+        group_id = uuid.uuid4().hex
+        jobs = [
+            {'id': app.state.queue.submit(image_bytes, name, settings, group_id), 'name': name}
+            for name, image_bytes in uploads
+        ]
+        return JSONResponse({'group_id': group_id, 'jobs': jobs}, status_code=202)
+
+    app.state.limit.reserve(len(uploads))
+
+    async def indexed(index, name, image_bytes):
+        return index, await extract_one(name, image_bytes, settings)
+
+    tasks = [asyncio.ensure_future(indexed(idx, name, image_bytes)) for idx, (name, image_bytes) in enumerate(uploads)]
+    if stream:
+        return StreamingResponse(stream_results(tasks), media_type='application/x-ndjson')
+    return {'results': [result for _, result in await asyncio.gather(*tasks)]}
+
+def public_job(job):
+    """Queue job dict with its result narrowed to RESULT_FIELDS."""
+    if job.get('result') is not None:
+        job['result'] = {key: job['result'].get(key) for key in RESULT_FIELDS}
+    return job
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = app.state.queue.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return public_job(job)
+
+@app.get("/groups/{group_id}")
+def get_group(group_id: str):
+    jobs = app.state.queue.get_group(group_id)
+    if not jobs:
+        raise HTTPException(404, "Group not found")
+    return {'group_id': group_id, 'jobs': [public_job(job) for job in jobs]}
+
+@app.get("/health")
+def health():
+    state = app.state
+    return {
+        'ocr_workers': state.pool.num_workers,
+        'warmup': list(state.pool.warmup.values()),
+        'in_flight': state.limit.in_flight,
+        'waiting': state.limit.waiting,
+        'max_in_flight': state.limit.max_in_flight,
+        'queue': state.queue.counts(),
+        # Every receipt runs under a trace, so direct and queued jobs both land here
+        'stages': metrics_snapshot()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return metrics_prometheus()
@@ -0,0 +1,193 @@
+import asyncio
+import inspect
+import random
+import json
+import re
+
+import groq
+
+from cache import get_llm_cache, cache_get, cache_set
+from extract_and_parse import (
+    build_completion_request,
+    validate_transaction_json,
+    add_metadata,
+    llm_cache_key
+)
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# Rough prompt + completion budget of one receipt parse
+TOKENS_PER_REQUEST = 2048
+
+def parse_reset(value):
+    """Parse Groq's reset headers ('7.66s', '2m59.56s', '120ms') into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    for amount, unit in re.findall(r'([\d.]+)(ms|h|m|s)', value):
+        total += float(amount) * {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}[unit]
+    return total or None
+
+class AdaptiveLimiter:
+    """
+    Concurrency limiter whose limit follows the API's rate-limit headers.
+
+    The limit shrinks when the remaining request/token budget runs low or a
+    429 arrives (and all requests pause until the reset time), and grows
+    back by one per healthy response up to `max_concurrency`.
+    """
+
+    def __init__(self, max_concurrency=8, min_concurrency=1):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self._paused_until = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        async with self._cond:
+            while True:
+                delay = self._paused_until - loop.time()
+                if delay > 0:
+                    self._cond.release()
+                    try:
+                        await asyncio.sleep(delay)
+                    finally:
+                        await self._cond.acquire()
+                    continue
+                if self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return
+                await self._cond.wait()
+
+    async def release(self):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    async def update(self, headers):
+        """Adapt the limit from x-ratelimit-* headers of a successful response."""
+        remaining_requests = _int_header(headers, 'x-ratelimit-remaining-requests')
+        remaining_tokens = _int_header(headers, 'x-ratelimit-remaining-tokens')
+        async with self._cond:
+            budget = self.max_concurrency
+            if remaining_requests is not None:
+                budget = min(budget, remaining_requests)
+            if remaining_tokens is not None:
+                budget = min(budget, remaining_tokens // TOKENS_PER_REQUEST)
+            if budget < self.limit:
+                self.limit = max(self.min_concurrency, budget)
+            elif self.limit < self.max_concurrency:
+                self.limit += 1
+            if remaining_requests == 0:
+                reset = parse_reset(headers.get('x-ratelimit-reset-requests'))
+                if reset:
+                    self._pause(reset)
+            self._cond.notify_all()
+
+    async def rate_limited(self, retry_after):
+        """Halve the limit and pause everyone after a 429."""
+        async with self._cond:
+            self.limit = max(self.min_concurrency, self.limit // 2)
+            if retry_after:
+                self._pause(retry_after)
+
+    def _pause(self, seconds):
+        loop = asyncio.get_running_loop()
+        self._paused_until = max(self._paused_until, loop.time() + seconds)
+
+def _int_header(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+def _backoff(attempt, base=0.5, cap=30.0):
+    # Full jitter
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+async def _send(client, limiter, request):
+    """One request holding a limiter slot, released however the request ends (incl. cancellation)."""
+    await limiter.acquire()
+    try:
+        return await client.chat.completions.with_raw_response.create(**request)
+    finally:
+        await limiter.release()
+
+async def _complete(client, limiter, ocr_text, max_retries):
+    request = build_completion_request(ocr_text)
+    attempt = 0
+    while True:
+        try:
+            raw = await _send(client, limiter, request)
+        except groq.APIStatusError as e:
+            if e.status_code not in RETRYABLE_STATUS or attempt >= max_retries:
+                raise
+            retry_after = parse_reset(e.response.headers.get('retry-after'))
+            if e.status_code == 429:
+                await limiter.rate_limited(retry_after)
+            await asyncio.sleep(retry_after or _backoff(attempt))
+            attempt += 1
+            continue
+        except (groq.APIConnectionError, groq.APITimeoutError):
+            if attempt >= max_retries:
+                raise
+            await asyncio.sleep(_backoff(attempt))
+            attempt += 1
+            continue
+        await limiter.update(raw.headers)
+
+        completion = raw.parse()
+        if inspect.isawaitable(completion):
+            completion = await completion
+        return completion.choices[0].message.content
+
+async def parse_with_llm_async(client, limiter, ocr_text, max_retries=5, use_cache=True):
+    """Async counterpart of parse_with_llm sharing its cache and validation."""
+    try:
+        if use_cache:
+            # SQLite calls block, so they run off the event loop
+            cache_key = llm_cache_key(ocr_text)
+            cached_data = await asyncio.to_thread(cache_get, get_llm_cache, cache_key)
+            if cached_data is not None:
+                return add_metadata(cached_data, ocr_text), None
+
+        result = await _complete(client, limiter, ocr_text, max_retries)
+        validated_data = validate_transaction_json(result)
+
+        if use_cache:
+            await asyncio.to_thread(cache_set, get_llm_cache, cache_key, validated_data)
+
+        return add_metadata(validated_data, ocr_text), None
+
+    except json.JSONDecodeError as e:
+        return None, f"Failed to parse JSON response: {str(e)}"
+    except Exception as e:
+        return None, f"Error parsing with LLM: {str(e)}"
+
+async def parse_many_async(client, ocr_texts, max_concurrency=8, max_retries=5, use_cache=True):
+    """
+    Parse many OCR texts concurrently.
+
+    At most `max_concurrency` requests are in flight; the limit adapts to
+    Groq's rate-limit headers and 429/5xx responses are retried with
+    jittered exponential backoff (or the server's retry-after).
+
+    Args:
+        client: groq.AsyncGroq client (see utils.init_groq_async)
+        ocr_texts: List of OCR texts
+
+    Returns:
+        results: List of (transaction_data, error) tuples in input order
+    """
+    limiter = AdaptiveLimiter(max_concurrency)
+    return await asyncio.gather(*(
+        parse_with_llm_async(client, limiter, ocr_text, max_retries, use_cache)
+        for ocr_text in ocr_texts
+    ))
@@ -0,0 +1,271 @@
+import shutil
+import json
+import time
+import uuid
+import os
+
+from extract_and_parse import build_completion_request, validate_transaction_json, add_metadata
+from packed_parse import build_packed_request, split_packed_response
+from save_to_json import TransactionLog, resolve_transactions_file
+from transaction_store import TransactionStore, default_store_path
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# Kept out of the repo root, where requests.jsonl is already taken
+DEFAULT_REQUESTS_FILE = os.path.join("batch", "requests.jsonl")
+
+TERMINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+def write_batch_requests(items, path=DEFAULT_REQUESTS_FILE, build_request=build_completion_request):
+    """
+    Write one chat-completion request per OCR text in Groq batch format.
+
+    Args:
+        items: Iterable of (custom_id, ocr_text) pairs
+        path: JSONL file to write
+        build_request: Builds the request body from the item's payload
+            (build_packed_request for (custom_id, [ocr_text, ...]) packs)
+
+    Returns:
+        count: Number of requests written
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    count = 0
+    with open(path, 'w') as f:
+        for custom_id, ocr_text in items:
+            f.write(json.dumps({
+                'custom_id': custom_id,
+                'method': 'POST',
+                'url': BATCH_ENDPOINT,
+                'body': build_request(ocr_text)
+            }) + '\n')
+            count += 1
+    return count
+
+class GroqBatchBackend:
+    """Submits request files to Groq's Batch API."""
+
+    def __init__(self, client, completion_window="24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, requests_path):
+        with open(requests_path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window
+        )
+        return batch.id
+
+    def status(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        return {
+            'status': batch.status,
+            'output_file_id': batch.output_file_id,
+            'error_file_id': batch.error_file_id
+        }
+
+    def download(self, file_id):
+        return self.client.files.content(file_id).read().decode('utf-8')
+
+class LocalBatchBackend:
+    """
+    File-based stand-in for the Batch API, for tests and offline runs.
+
+    Requests are executed at submit time against a synchronous
+    chat-completions client (e.g. a Groq client pointed at
+    bench.mock_groq_server) and results are written in Groq's output
+    format under `directory`.
+    """
+
+    def __init__(self, client, directory=os.path.join("batch", "local")):
+        self.client = client
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, file_id):
+        return os.path.join(self.directory, f"{file_id}.jsonl")
+
+    def submit(self, requests_path):
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        output_file_id = f"file_{uuid.uuid4().hex}"
+        shutil.copyfile(requests_path, self._path(f"{batch_id}_input"))
+
+        with open(requests_path, 'r') as src, open(self._path(output_file_id), 'w') as dst:
+            for line in src:
+                request = json.loads(line)
+                record = {'id': f"batch_req_{uuid.uuid4().hex}", 'custom_id': request['custom_id']}
+                try:
+                    completion = self.client.chat.completions.create(**request['body'])
+                    record['response'] = {'status_code': 200, 'body': completion.model_dump()}
+                    record['error'] = None
+                except Exception as e:
+                    record['response'] = {'status_code': getattr(e, 'status_code', 500), 'body': None}
+                    record['error'] = {'message': str(e)}
+                dst.write(json.dumps(record) + '\n')
+
+        with open(self._path(batch_id), 'w') as f:
+            json.dump({'status': 'completed', 'output_file_id': output_file_id, 'error_file_id': None}, f)
+        return batch_id
+
+    def status(self, batch_id):
+        with open(self._path(batch_id), 'r') as f:
+            return json.load(f)
+
+    def download(self, file_id):
+        with open(self._path(file_id), 'r') as f:
+            return f.read()
+
+def wait_for_batch(backend, batch_id, poll_interval=60.0, timeout=None, log=print):
+    """Poll until the batch reaches a terminal status and return that status dict."""
+    start = time.monotonic()
+    while True:
+        status = backend.status(batch_id)
+        if status['status'] in TERMINAL_STATUSES:
+            return status
+        if timeout is not None and time.monotonic() - start > timeout:
+            raise TimeoutError(f"Batch {batch_id} still {status['status']} after {timeout}s")
+        log(f"Batch {batch_id}: {status['status']}")
+        time.sleep(poll_interval)
+
+def parse_batch_output(output_text, parse=validate_transaction_json):
+    """
+    Turn batch output lines into {custom_id: (parse(content), error)}; by
+    default the content is validated as one transaction.
+    """
+    results = {}
+    for line in output_text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        custom_id = record['custom_id']
+        response = record.get('response') or {}
+        if record.get('error') or response.get('status_code') != 200:
+            message = (record.get('error') or {}).get('message') or f"HTTP {response.get('status_code')}"
+            results[custom_id] = (None, f"Error parsing with LLM: {message}")
+            continue
+        try:
+            content = response['body']['choices'][0]['message']['content']
+            results[custom_id] = (parse(content), None)
+        except json.JSONDecodeError as e:
+            results[custom_id] = (None, f"Failed to parse JSON response: {str(e)}")
+        except Exception as e:
+            results[custom_id] = (None, f"Error parsing with LLM: {str(e)}")
+    return results
+
+def merge_batch_results(results, ocr_texts, transactions_file):
+    """
+    Append parsed transactions to the transaction log, tagged with their
+    custom_id. IDs that are already stored are skipped, so re-merging a
+    batch is harmless.
+
+    Returns:
+        merged: Number of transactions added
+        errors: {custom_id: error} for items that failed
+    """
+    transactions_file = resolve_transactions_file(transactions_file)
+    store = TransactionStore(default_store_path(transactions_file))
+    store.sync_from_jsonl(transactions_file)
+    already_merged = store.existing_custom_ids(results.keys())
+
+    merged = 0
+    errors = {}
+    with TransactionLog(transactions_file) as transaction_log:
+        for custom_id, (validated_data, error) in results.items():
+            if error:
+                errors[custom_id] = error
+                continue
+            if custom_id in already_merged:
+                continue
+            final_data = add_metadata(validated_data, ocr_texts.get(custom_id, ''))
+            final_data['custom_id'] = custom_id
+            transaction_log.append(final_data)
+            merged += 1
+
+    store.sync_from_jsonl(transactions_file)
+    return merged, errors
+
+def _submit_batch(backend, requests_path, count, poll_interval, timeout, log, parse=validate_transaction_json):
+    """Submit a written request file, wait for it, and parse both output files."""
+    batch_id = backend.submit(requests_path)
+    log(f"Submitted batch {batch_id} with {count} requests")
+
+    status = wait_for_batch(backend, batch_id, poll_interval, timeout, log)
+    results = {}
+    if status.get('output_file_id'):
+        results.update(parse_batch_output(backend.download(status['output_file_id']), parse))
+    if status.get('error_file_id'):
+        results.update(parse_batch_output(backend.download(status['error_file_id']), parse))
+    if status['status'] != 'completed' and not results:
+        raise RuntimeError(f"Batch {batch_id} ended with status {status['status']}")
+    return results
+
+def _run_packed_batch(backend, ocr_texts, requests_path, pack_size, poll_interval, timeout, log):
+    """
+    One batch of packed requests, `pack_size` receipts each.
+
+    Returns:
+        results: {custom_id: (validated_data, None)} for the receipts a pack
+            answered; the others are left out, to be sent on their own
+    """
+    custom_ids = list(ocr_texts)
+    packs = {
+        f"pack-{start // pack_size}": custom_ids[start:start + pack_size]
+        for start in range(0, len(custom_ids), pack_size)
+    }
+    count = write_batch_requests(
+        ((pack_id, [ocr_texts[custom_id] for custom_id in members]) for pack_id, members in packs.items()),
+        requests_path, build_packed_request
+    )
+    # Keep the raw content; it is split per receipt below
+    outputs = _submit_batch(backend, requests_path, count, poll_interval, timeout, log, parse=str)
+
+    results = {}
+    for pack_id, (content, error) in outputs.items():
+        members = packs.get(pack_id)
+        if error or not members:
+            continue
+        items = split_packed_response(content, len(members)) or []
+        for custom_id, validated_data in zip(members, items):
+            if validated_data is not None:
+                results[custom_id] = (validated_data, None)
+    return results
+
+def run_batch(backend, ocr_texts, transactions_file, requests_path=DEFAULT_REQUESTS_FILE,
+              poll_interval=60.0, timeout=None, pack_size=1, log=print):
+    """
+    Write requests, submit them as one batch, wait, and merge the results.
+
+    With `pack_size` > 1 the receipts are first sent `pack_size` per
+    request (packed_parse); any a pack didn't answer go out in a second
+    batch of single-receipt requests.
+
+    Args:
+        backend: GroqBatchBackend or LocalBatchBackend
+        ocr_texts: Dict of custom_id → OCR text
+        pack_size: Receipts per request
+
+    Returns:
+        merged: Number of transactions added
+        errors: {custom_id: error} for items that failed
+    """
+    if not ocr_texts:
+        return 0, {}
+    results = {}
+    if pack_size > 1:
+        results = _run_packed_batch(backend, ocr_texts, requests_path, pack_size, poll_interval, timeout, log)
+
+    single = {custom_id: ocr_text for custom_id, ocr_text in ocr_texts.items() if custom_id not in results}
+    if single:
+        count = write_batch_requests(single.items(), requests_path)
+        results.update(_submit_batch(backend, requests_path, count, poll_interval, timeout, log))
+
+    # Requests missing from both files are reported rather than silently dropped
+    for custom_id in ocr_texts:
+        results.setdefault(custom_id, (None, "Missing from batch output"))
+
+    return merge_batch_results(results, ocr_texts, transactions_file)
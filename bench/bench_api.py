@@ -0,0 +1,125 @@
+"""
+Load test for the HTTP API (api.py): fire receipts from the synthetic
+corpus at POST /extract with a fixed number of concurrent clients and
+report throughput, latency percentiles and status codes.
+
+Start the service first (`ocreceipt serve`); receipts are sent with
+save=false so the transaction log stays untouched.
+
+Usage:
+    python -m bench.bench_api [corpus_dir] [--url http://127.0.0.1:8000] [--requests 100]
+                              [--concurrency 8] [--batch 1] [--stream] [--output report.json]
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import itertools
+import threading
+import json
+import time
+import os
+
+import httpx
+
+from bench.common import load_images, percentile
+from bench.synthetic_receipts import generate_corpus
+
+
+def send(client, url, batch, stream):
+    """
+    POST one request of `batch` receipts.
+
+    Returns:
+        status: HTTP status code (0 on a connection error)
+        latency: Seconds until the full response was read
+        first_result: Seconds until the first NDJSON line (stream only)
+        errors: Receipts that came back with an error
+    """
+    files = [('files', (os.path.basename(path), image_bytes)) for path, image_bytes in batch]
+    data = {'save': 'false'}
+    begin = time.perf_counter()
+    first_result = None
+    errors = 0
+    try:
+        if stream:
+            with client.stream('POST', url, files=files, data=data, params={'stream': 'true'}) as response:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    if first_result is None:
+                        first_result = time.perf_counter() - begin
+                    errors += bool(json.loads(line).get('error'))
+                status = response.status_code
+        else:
+            response = client.post(url, files=files, data=data)
+            status = response.status_code
+            if status == 200:
+                errors = sum(bool(result['error']) for result in response.json()['results'])
+    except httpx.HTTPError:
+        status = 0
+    return status, time.perf_counter() - begin, first_result, errors
+
+
+def run_load(images, url, requests, concurrency, batch_size, stream):
+    # Clients cycle through the corpus, `batch_size` receipts per request
+    batches = itertools.cycle([images[idx:idx + batch_size] for idx in range(0, len(images), batch_size)])
+    lock = threading.Lock()
+
+    def next_batch():
+        with lock:
+            return next(batches)
+
+    with httpx.Client(timeout=600) as client, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        outcomes = list(executor.map(lambda _: send(client, url, next_batch(), stream), range(requests)))
+        wall_time = time.perf_counter() - start
+
+    statuses = {}
+    for status, *_ in outcomes:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = [outcome for outcome in outcomes if outcome[0] == 200]
+    latencies = [latency for _, latency, _, _ in ok]
+    first_results = [first for _, _, first, _ in ok if first is not None]
+    report = {
+        'requests': requests,
+        'concurrency': concurrency,
+        'batch': batch_size,
+        'stream': stream,
+        'wall_s': wall_time,
+        'statuses': statuses,
+        'receipts_per_s': len(ok) * batch_size / wall_time if wall_time else 0.0,
+        'receipt_errors': sum(errors for *_, errors in ok),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000
+    }
+    if first_results:
+        report['first_result_p50_ms'] = percentile(first_results, 50) * 1000
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", nargs="?", default=os.path.join("bench", "corpus"))
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--batch", type=int, default=1, help="Receipts per request")
+    parser.add_argument("--stream", action="store_true", help="Ask for NDJSON results")
+    parser.add_argument("--output", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.corpus):
+        generate_corpus(args.corpus)
+    images = load_images(args.corpus)
+
+    print(httpx.get(f"{args.url}/health").json())
+    report = run_load(images, f"{args.url}/extract", args.requests, args.concurrency, args.batch, args.stream)
+    print(f"{report['receipts_per_s']:.2f} receipts/s  p50 {report['p50_ms']:.0f} ms  "
+          f"p95 {report['p95_ms']:.0f} ms  p99 {report['p99_ms']:.0f} ms  statuses {report['statuses']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
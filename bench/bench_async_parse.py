@@ -0,0 +1,52 @@
+"""
+Compare sequential parse_with_llm calls with parse_many_async against the
+local mock Groq server.
+
+Usage:
+    python -m bench.bench_async_parse [--receipts 100] [--latency 0.3] [--rpm 600] [--failure-rate 0.05]
+"""
+import argparse
+import asyncio
+import time
+
+from groq import Groq, AsyncGroq
+
+from extract_and_parse import parse_with_llm
+from async_parse import parse_many_async
+from bench.mock_groq_server import MockGroqServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--rpm", type=int, default=None)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    ocr_texts = [f"Transaction Successful\nRs\n{100 + i}\nTransaction ID(TID): {i}" for i in range(args.receipts)]
+
+    with MockGroqServer(latency=args.latency, requests_per_window=args.rpm,
+                        failure_rate=args.failure_rate) as server:
+        client = Groq(api_key="mock", base_url=server.base_url)
+        start = time.perf_counter()
+        sequential = [parse_with_llm(client, text, use_cache=False) for text in ocr_texts]
+        sequential_elapsed = time.perf_counter() - start
+
+        async_client = AsyncGroq(api_key="mock", base_url=server.base_url, max_retries=0)
+        start = time.perf_counter()
+        concurrent = asyncio.run(parse_many_async(
+            async_client, ocr_texts, max_concurrency=args.concurrency, use_cache=False
+        ))
+        async_elapsed = time.perf_counter() - start
+
+        print(f"Receipts:    {args.receipts}")
+        print(f"Sequential:  {sequential_elapsed:.2f}s, {sum(1 for _, e in sequential if e is None)} ok")
+        print(f"Async:       {async_elapsed:.2f}s, {sum(1 for _, e in concurrent if e is None)} ok")
+        print(f"Speedup:     {sequential_elapsed / async_elapsed:.2f}x")
+        print(f"Server saw {server.request_count} requests, {server.rate_limited_count} rate-limited")
+
+
+if __name__ == "__main__":
+    main()
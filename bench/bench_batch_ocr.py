@@ -0,0 +1,54 @@
+"""
+Compare receipts/sec of the single-image OCR loop against batched OCR.
+
+Usage:
+    python -m bench.bench_batch_ocr <image_dir> [--batch-size 8] [--limit 100]
+"""
+import argparse
+import time
+
+from extract_and_parse import get_reader, extract_text_easyocr, extract_text_batch
+from bench.common import load_images
+
+
+def run_single(images):
+    return [extract_text_easyocr(image_bytes, use_cache=False) for image_bytes in images]
+
+
+def run_batch(images, batch_size):
+    return extract_text_batch(images, batch_size=batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("image_dir", help="Directory of receipt screenshots")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    images = [image_bytes for _, image_bytes in load_images(args.image_dir, args.limit)]
+    if not images:
+        raise SystemExit(f"No images found in {args.image_dir}")
+
+    # Load the model outside the timed region
+    get_reader()
+
+    start = time.perf_counter()
+    single_results = run_single(images)
+    single_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_results = run_batch(images, args.batch_size)
+    batch_elapsed = time.perf_counter() - start
+
+    matching = sum(1 for a, b in zip(single_results, batch_results) if a == b)
+
+    print(f"Images:            {len(images)}")
+    print(f"Single loop:       {single_elapsed:.2f}s ({len(images) / single_elapsed:.2f} receipts/sec)")
+    print(f"Batched (bs={args.batch_size}):  {batch_elapsed:.2f}s ({len(images) / batch_elapsed:.2f} receipts/sec)")
+    print(f"Speedup:           {single_elapsed / batch_elapsed:.2f}x")
+    print(f"Identical outputs: {matching}/{len(images)}")
+
+
+if __name__ == "__main__":
+    main()
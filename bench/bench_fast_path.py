@@ -0,0 +1,58 @@
+"""
+Measure rule-based fast-path hit rate, per-receipt latency and agreement
+with previously saved LLM parses.
+
+OCR texts come from the `raw_ocr_text` of saved transactions, so the
+LLM's fields serve as the reference.
+
+Usage:
+    python -m bench.bench_fast_path [transactions.jsonl] [--min-confidence 0.85] [--repeat 100]
+"""
+import argparse
+import time
+
+from rule_parser import parse_with_rules, FIELD_WEIGHTS, FAST_PATH_THRESHOLD
+from save_to_json import load_transactions
+from bench.common import percentile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("transactions", nargs="?", default="transactions.jsonl")
+    parser.add_argument("--min-confidence", type=float, default=FAST_PATH_THRESHOLD)
+    parser.add_argument("--repeat", type=int, default=100, help="Timing repetitions per receipt")
+    args = parser.parse_args()
+
+    transactions = [txn for txn in load_transactions(args.transactions) if txn.get('raw_ocr_text')]
+    if not transactions:
+        raise SystemExit(f"No transactions with raw_ocr_text in {args.transactions}")
+
+    latencies = []
+    hits = 0
+    matched = 0
+    compared = 0
+    for txn in transactions:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            data, confidence = parse_with_rules(txn['raw_ocr_text'])
+        latencies.append((time.perf_counter() - start) / args.repeat)
+
+        if data is None or confidence < args.min_confidence:
+            continue
+        hits += 1
+        for field in FIELD_WEIGHTS:
+            reference = txn.get(field)
+            if reference is None:
+                continue
+            compared += 1
+            matched += str(data.get(field)).strip().lower() == str(reference).strip().lower()
+
+    print(f"Receipts:        {len(transactions)}")
+    print(f"Fast-path hits:  {hits} ({hits / len(transactions):.0%})")
+    print(f"Latency:         p50 {percentile(latencies, 50) * 1e6:.0f} µs, p95 {percentile(latencies, 95) * 1e6:.0f} µs")
+    if compared:
+        print(f"Key-field agreement with LLM on hits: {matched}/{compared} ({matched / compared:.0%})")
+
+
+if __name__ == "__main__":
+    main()
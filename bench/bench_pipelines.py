@@ -0,0 +1,72 @@
+"""
+Per-stage latency of each preprocessing pipeline, and optionally OCR
+character accuracy against ground-truth .txt files.
+
+Usage:
+    python -m bench.bench_pipelines [image_dir] [--pipelines pipelines.json] [--repeat 5] [--ocr]
+"""
+import argparse
+import difflib
+import time
+
+from preprocess import decode_image, load_pipelines, PIPELINES_FILE
+from bench.common import load_images, load_ground_truth
+from bench.bench_quality import synthetic_images
+
+
+def time_pipeline(pipeline, images, repeat):
+    """Mean seconds per image for the whole pipeline and for each stage."""
+    timings = {}
+    pipeline.run(images[0], reuse_buffers=True)  # warm up (and size the buffers)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for image in images:
+            pipeline.run(image, reuse_buffers=True, timings=timings)
+    runs = repeat * len(images)
+    total = (time.perf_counter() - start) / runs
+    return total, {stage: seconds / runs for stage, seconds in timings.items()}
+
+
+def ocr_accuracy(pipeline, named_images):
+    from extract_and_parse import get_reader
+
+    reader = get_reader()
+    scores = []
+    for path, image in named_images:
+        truth = load_ground_truth(path)
+        if truth is None:
+            continue
+        binary, _ = pipeline.run(image)
+        text = '\n'.join(result[1] for result in reader.readtext(binary)).strip()
+        scores.append(difflib.SequenceMatcher(None, text, truth.strip()).ratio())
+    return sum(scores) / len(scores) if scores else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("image_dir", nargs="?", default=None)
+    parser.add_argument("--pipelines", default=PIPELINES_FILE)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--ocr", action="store_true", help="Also OCR each image (needs image_dir with .txt ground truth)")
+    args = parser.parse_args()
+
+    if args.image_dir:
+        named_images = [(path, decode_image(image_bytes)) for path, image_bytes in load_images(args.image_dir)]
+    else:
+        named_images = [(f"synthetic_{idx}", image) for idx, image in enumerate(synthetic_images())]
+    images = [image for _, image in named_images]
+
+    for name, pipeline in load_pipelines(args.pipelines).items():
+        total, stages = time_pipeline(pipeline, images, args.repeat)
+        line = f"{name:<18} {total * 1000:8.2f} ms/image"
+        if args.ocr and args.image_dir:
+            accuracy = ocr_accuracy(pipeline, named_images)
+            if accuracy is not None:
+                line += f"  OCR similarity {accuracy:.3f}"
+        print(line)
+        for stage, seconds in stages.items():
+            print(f"    {stage:<20} {seconds * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Memory and latency of preprocess_array with and without reusable buffers,
+compared with the original allocate-per-stage chain.
+
+Usage:
+    python -m bench.bench_preprocess_alloc [image_dir] [--repeat 20]
+"""
+import argparse
+import tracemalloc
+import time
+
+import numpy as np
+import cv2
+
+from preprocess import analyze_image_quality, preprocess_array, decode_image
+from bench.common import load_images
+from bench.bench_quality import synthetic_images
+
+
+def preprocess_reference(image):
+    """The original chain: fresh arrays per stage, CLAHE/kernel rebuilt, morphology computed and discarded."""
+    quality = analyze_image_quality(image)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if quality['noise_level'] < 100:
+        gray = cv2.bilateralFilter(gray, 9, 75, 75)
+    if quality['needs_enhancement']:
+        gray = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(gray)
+    binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
+    cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+    return binary
+
+
+def measure(fn, images, repeat):
+    fn(images[0])  # warm up (and size the buffers)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for image in images:
+            fn(image)
+    elapsed = (time.perf_counter() - start) / (repeat * len(images))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("image_dir", nargs="?", default=None)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.image_dir:
+        images = [decode_image(image_bytes) for _, image_bytes in load_images(args.image_dir)]
+    else:
+        images = synthetic_images()
+
+    identical = sum(
+        np.array_equal(preprocess_reference(image), preprocess_array(image, reuse_buffers=True)[0])
+        for image in images
+    )
+
+    variants = [
+        ("reference", preprocess_reference),
+        ("fresh arrays", lambda image: preprocess_array(image)),
+        ("reused buffers", lambda image: preprocess_array(image, reuse_buffers=True)),
+    ]
+    print(f"Images: {len(images)}, identical output: {identical}/{len(images)}")
+    print(f"{'variant':<16} {'ms/image':>10} {'peak MiB':>10}")
+    for label, fn in variants:
+        elapsed, peak = measure(fn, images, args.repeat)
+        print(f"{label:<16} {elapsed * 1000:10.2f} {peak / 2**20:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
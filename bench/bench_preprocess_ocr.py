@@ -0,0 +1,61 @@
+"""
+Compare latency and accuracy of OCR on raw vs. preprocessed images.
+
+Accuracy is measured against an optional `<image>.txt` ground-truth file
+next to each image (character-level similarity ratio).
+
+Usage:
+    python -m bench.bench_preprocess_ocr <image_dir> [--limit 100]
+"""
+import argparse
+import difflib
+import time
+
+from extract_and_parse import get_reader, load_ocr_input
+from bench.common import load_images, load_ground_truth, percentile
+
+
+def run_path(reader, images, use_preprocessing):
+    latencies = []
+    scores = []
+    for path, image_bytes in images:
+        start = time.perf_counter()
+        image = load_ocr_input(image_bytes, use_preprocessing)
+        results = reader.readtext(image)
+        latencies.append(time.perf_counter() - start)
+
+        text = '\n'.join([result[1] for result in results]).strip()
+        truth = load_ground_truth(path)
+        if truth is not None:
+            scores.append(difflib.SequenceMatcher(None, text, truth.strip()).ratio())
+    return latencies, scores
+
+
+def report(label, latencies, scores):
+    line = (
+        f"{label:<14} mean {sum(latencies) / len(latencies) * 1000:8.1f} ms"
+        f"  p50 {percentile(latencies, 50) * 1000:8.1f} ms"
+        f"  p95 {percentile(latencies, 95) * 1000:8.1f} ms"
+    )
+    if scores:
+        line += f"  accuracy {sum(scores) / len(scores):.3f} (n={len(scores)})"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("image_dir", help="Directory of receipt screenshots")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    images = load_images(args.image_dir, args.limit)
+    if not images:
+        raise SystemExit(f"No images found in {args.image_dir}")
+
+    reader = get_reader()
+    report("raw", *run_path(reader, images, use_preprocessing=False))
+    report("preprocessed", *run_path(reader, images, use_preprocessing=True))
+
+
+if __name__ == "__main__":
+    main()
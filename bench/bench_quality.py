@@ -0,0 +1,101 @@
+"""
+Microbenchmark analyze_image_quality against the original implementation
+and check that both drive the same preprocessing decisions.
+
+Runs on the images in a directory, or on generated screenshots when no
+directory is given.
+
+Usage:
+    python -m bench.bench_quality [image_dir] [--repeat 20]
+"""
+import argparse
+import time
+
+import numpy as np
+import cv2
+
+from preprocess import analyze_image_quality, decode_image
+from bench.common import load_images
+
+
+def analyze_image_quality_reference(image):
+    """The original full-resolution float64 implementation."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+    brightness = np.mean(gray)
+    contrast = np.std(gray)
+    laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+    unique_vals = len(np.unique(gray))
+    return {
+        'brightness': brightness,
+        'contrast': contrast,
+        'noise_level': laplacian_var,
+        'is_binary': unique_vals < 20,
+        'needs_enhancement': contrast < 50 or brightness < 80 or brightness > 180
+    }
+
+
+def decisions(quality):
+    """The branches preprocess_array takes based on the metrics."""
+    return (quality['noise_level'] < 100, quality['needs_enhancement'], quality['is_binary'])
+
+
+def synthetic_images(count=12, seed=0):
+    rng = np.random.default_rng(seed)
+    images = []
+    for idx in range(count):
+        background = int(rng.integers(30, 250))
+        image = np.full((3200, 1440, 3), background, np.uint8)
+        ink = 255 - background
+        for line in range(30):
+            cv2.putText(image, f"Transaction ID {rng.integers(1e5, 1e6)} Rs {rng.integers(100, 99999)}",
+                        (40, 100 + line * 100), cv2.FONT_HERSHEY_SIMPLEX, 1.2 + idx % 3 * 0.4, (ink, ink, ink), 2)
+        if idx % 2:
+            image = cv2.add(image, rng.integers(0, 40, image.shape, dtype=np.uint8))
+        if idx % 3 == 0:
+            image = cv2.GaussianBlur(image, (7, 7), 0)
+        images.append(image)
+    return images
+
+
+def time_it(fn, images, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for image in images:
+            fn(image)
+    return (time.perf_counter() - start) / (repeat * len(images))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("image_dir", nargs="?", default=None)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.image_dir:
+        images = [decode_image(image_bytes) for _, image_bytes in load_images(args.image_dir)]
+    else:
+        images = synthetic_images()
+
+    reference_time = time_it(analyze_image_quality_reference, images, args.repeat)
+    new_time = time_it(analyze_image_quality, images, args.repeat)
+
+    same = 0
+    max_error = {'brightness': 0.0, 'contrast': 0.0, 'noise_level': 0.0}
+    for image in images:
+        reference = analyze_image_quality_reference(image)
+        quality = analyze_image_quality(image)
+        same += decisions(reference) == decisions(quality)
+        for key in max_error:
+            error = abs(quality[key] - reference[key]) / max(abs(reference[key]), 1e-9)
+            max_error[key] = max(max_error[key], error)
+
+    print(f"Images:              {len(images)}")
+    print(f"Reference:           {reference_time * 1000:.2f} ms/image")
+    print(f"Histogram + int16:   {new_time * 1000:.2f} ms/image")
+    print(f"Speedup:             {reference_time / new_time:.1f}x")
+    print(f"Identical decisions: {same}/{len(images)}")
+    print("Max relative error:  " + ", ".join(f"{key} {value:.2%}" for key, value in max_error.items()))
+
+
+if __name__ == "__main__":
+    main()
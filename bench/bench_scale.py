@@ -0,0 +1,78 @@
+"""
+Measure OCR latency and field-level accuracy at different input scales.
+
+Each image is OCR'd at several fixed downscale factors and at the
+glyph-height adaptive scale. Field accuracy compares the rule-based parse
+of the OCR text with an optional `<image>.json` ground-truth
+TransactionData file; character similarity against `<image>.txt` is
+reported when present.
+
+Usage:
+    python -m bench.bench_scale <image_dir> [--scales 1.0 0.75 0.5 0.35] [--limit 50]
+"""
+import argparse
+import difflib
+import time
+
+from extract_and_parse import get_reader
+from preprocess import decode_image, preprocess_array, resize_image, adaptive_scale
+from rule_parser import parse_with_rules
+from bench.common import (
+    load_images,
+    load_ground_truth,
+    load_ground_truth_fields,
+    field_accuracy,
+    percentile
+)
+
+
+def run_scale(reader, images, scale, use_preprocessing):
+    latencies = []
+    field_scores = []
+    text_scores = []
+    for path, image_bytes in images:
+        start = time.perf_counter()
+        image = decode_image(image_bytes)
+        factor = adaptive_scale(image) if scale == 'adaptive' else scale
+        image = resize_image(image, factor)
+        if use_preprocessing:
+            image, _ = preprocess_array(image)
+        text = '\n'.join([result[1] for result in reader.readtext(image)]).strip()
+        latencies.append(time.perf_counter() - start)
+
+        truth_fields = load_ground_truth_fields(path)
+        if truth_fields is not None:
+            predicted, _ = parse_with_rules(text)
+            score = field_accuracy(predicted, truth_fields)
+            if score is not None:
+                field_scores.append(score)
+        truth_text = load_ground_truth(path)
+        if truth_text is not None:
+            text_scores.append(difflib.SequenceMatcher(None, text, truth_text.strip()).ratio())
+    return latencies, field_scores, text_scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("image_dir", help="Directory of receipt screenshots")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0, 0.75, 0.5, 0.35])
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--no-preprocessing", action="store_true")
+    args = parser.parse_args()
+
+    images = load_images(args.image_dir, args.limit)
+    if not images:
+        raise SystemExit(f"No images found in {args.image_dir}")
+
+    reader = get_reader()
+    print(f"{'scale':>9} {'p50 ms':>9} {'p95 ms':>9} {'fields':>8} {'text':>8}")
+    for scale in [*args.scales, 'adaptive']:
+        latencies, field_scores, text_scores = run_scale(reader, images, scale, not args.no_preprocessing)
+        fields = f"{sum(field_scores) / len(field_scores):.3f}" if field_scores else "-"
+        text = f"{sum(text_scores) / len(text_scores):.3f}" if text_scores else "-"
+        label = scale if scale == 'adaptive' else f"{scale:.2f}"
+        print(f"{label:>9} {percentile(latencies, 50) * 1000:9.1f} {percentile(latencies, 95) * 1000:9.1f} {fields:>8} {text:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+End-to-end benchmark on the synthetic receipt corpus, written as a JSON
+report that can be diffed across commits.
+
+Measures throughput, p50/p95 latency and accuracy of the preprocess, OCR
+and parse stages. Parsing goes through parse_receipt with the LLM served
+by bench.mock_groq_server, so no network or API key is needed; the mock
+answers with a label-based extraction, so parse accuracy reflects the
+pipeline and fast path, not the real model.
+
+Usage:
+    python -m bench.bench_suite [corpus_dir] [--generate 60] [--stages preprocess,ocr,parse]
+                                [--llm-latency 0.3] [--output report.json] [--compare old.json]
+"""
+import subprocess
+import argparse
+import platform
+import difflib
+import json
+import time
+import os
+
+from bench.common import load_images, load_ground_truth, load_ground_truth_fields, field_accuracy, percentile
+from bench.synthetic_receipts import generate_corpus
+from bench.mock_groq_server import MockGroqServer
+from rule_parser import parse_with_rules
+from extract_and_parse import TransactionData
+import tracing
+
+STAGES = ('preprocess', 'ocr', 'parse')
+
+# "Label: value" lines the mock LLM understands, for layouts without a rule template
+MOCK_LABELS = {
+    'status': 'transaction_status',
+    'from': 'sender_name',
+    'account': 'sender_account',
+    'to': 'recipient_name',
+    'iban': 'recipient_account',
+    'date': 'transaction_date',
+    'time': 'transaction_time',
+    'reference no': 'transaction_id'
+}
+
+
+def mock_llm_responder(ocr_text):
+    """Deterministic stand-in for the LLM: rule templates first, then labelled lines."""
+    data, _ = parse_with_rules(ocr_text)
+    if data is not None:
+        return data
+
+    data = {field: None for field in TransactionData.model_fields}
+    lines = [line.strip() for line in ocr_text.splitlines() if line.strip()]
+    if lines:
+        data['bank_name'] = lines[0]
+        data['payment_method'] = 'Bank Transfer'
+    for line in lines:
+        label, _, value = line.partition(':')
+        label, value = label.strip().lower(), value.strip()
+        if label == 'amount':
+            currency, _, amount = value.rpartition(' ')
+            data['currency'] = currency or None
+            data['amount'] = amount.replace(',', '')
+        elif label in MOCK_LABELS and value:
+            data[MOCK_LABELS[label]] = value
+    return data
+
+
+def summarize(latencies, wall_time):
+    return {
+        'count': len(latencies),
+        'throughput_per_s': len(latencies) / wall_time if wall_time else 0.0,
+        'mean_ms': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000
+    }
+
+
+def bench_preprocess(images):
+    from extract_and_parse import load_ocr_input
+
+    latencies = []
+    rejected = 0
+    substages = {}
+    start = time.perf_counter()
+    for _, image_bytes in images:
+        with tracing.trace() as trace:
+            begin = time.perf_counter()
+            try:
+                load_ocr_input(image_bytes, use_preprocessing=True, reuse_buffers=True)
+            except ValueError:
+                rejected += 1
+            latencies.append(time.perf_counter() - begin)
+        for stage, seconds in trace.durations().items():
+            substages[stage] = substages.get(stage, 0.0) + seconds
+    report = summarize(latencies, time.perf_counter() - start)
+    report['rejected'] = rejected
+    report['substages_mean_ms'] = {stage: seconds / len(images) * 1000 for stage, seconds in substages.items()}
+    return report
+
+
+def bench_ocr(images):
+    from extract_and_parse import get_reader, extract_text_easyocr
+
+    begin = time.perf_counter()
+    get_reader()
+    reader_load = time.perf_counter() - begin
+
+    texts = {}
+    latencies = []
+    similarities = []
+    errors = 0
+    start = time.perf_counter()
+    for path, image_bytes in images:
+        begin = time.perf_counter()
+        text, error = extract_text_easyocr(image_bytes, use_cache=False)
+        latencies.append(time.perf_counter() - begin)
+        if error:
+            errors += 1
+            continue
+        texts[path] = text
+        truth = load_ground_truth(path)
+        if truth is not None:
+            similarities.append(difflib.SequenceMatcher(None, text, truth).ratio())
+    report = summarize(latencies, time.perf_counter() - start)
+    report.update(
+        reader_load_s=reader_load,
+        errors=errors,
+        char_similarity=sum(similarities) / len(similarities) if similarities else None
+    )
+    return report, texts
+
+
+def bench_parse(images, texts, llm_latency):
+    from groq import Groq
+    from rule_parser import parse_receipt
+
+    latencies = []
+    accuracies = []
+    methods = {}
+    errors = 0
+    with MockGroqServer(mock_llm_responder, latency=llm_latency) as server:
+        client = Groq(api_key="mock", base_url=server.base_url)
+        start = time.perf_counter()
+        for path, _ in images:
+            text = texts.get(path)
+            if text is None:
+                continue
+            begin = time.perf_counter()
+            data, error = parse_receipt(client, text, use_cache=False)
+            latencies.append(time.perf_counter() - begin)
+            if error:
+                errors += 1
+                continue
+            methods[data['parse_method']] = methods.get(data['parse_method'], 0) + 1
+            truth = load_ground_truth_fields(path)
+            if truth is not None:
+                accuracy = field_accuracy(data, truth)
+                if accuracy is not None:
+                    accuracies.append(accuracy)
+        wall_time = time.perf_counter() - start
+        llm_requests = server.request_count
+
+    report = summarize(latencies, wall_time)
+    report.update(
+        errors=errors,
+        parse_methods=methods,
+        llm_requests=llm_requests,
+        field_accuracy=sum(accuracies) / len(accuracies) if accuracies else None
+    )
+    return report
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True).stdout.strip())
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, previous):
+    """Print how each stage moved relative to an earlier report."""
+    print(f"\nvs {previous.get('commit')}:")
+    for stage, current in report['stages'].items():
+        before = previous.get('stages', {}).get(stage)
+        if not before:
+            continue
+        for key in ('throughput_per_s', 'p50_ms', 'p95_ms', 'char_similarity', 'field_accuracy'):
+            if current.get(key) is None or before.get(key) is None:
+                continue
+            change = (current[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            print(f"  {stage:<11} {key:<17} {before[key]:10.3f} → {current[key]:10.3f} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", nargs="?", default=os.path.join("bench", "corpus"))
+    parser.add_argument("--generate", type=int, default=None, metavar="N",
+                        help="(Re)generate N synthetic receipts into the corpus directory first")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", default=','.join(STAGES))
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Mock LLM response time in seconds")
+    parser.add_argument("--output", default=None, help="Report path (default: bench/reports/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    if args.generate or not os.path.isdir(args.corpus):
+        generate_corpus(args.corpus, args.generate or 60, args.seed)
+    images = load_images(args.corpus)
+    manifest_path = os.path.join(args.corpus, 'manifest.json')
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+
+    report = {
+        'commit': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'corpus': {'path': args.corpus, 'images': len(images), 'seed': manifest.get('seed')},
+        'config': {'stages': stages, 'llm_latency': args.llm_latency},
+        'stages': {}
+    }
+
+    if 'preprocess' in stages:
+        report['stages']['preprocess'] = bench_preprocess(images)
+    # Without OCR, the parse stage runs on the ground-truth text
+    texts = {path: load_ground_truth(path) for path, _ in images}
+    if 'ocr' in stages:
+        report['stages']['ocr'], texts = bench_ocr(images)
+    if 'parse' in stages:
+        report['stages']['parse'] = bench_parse(images, texts, args.llm_latency)
+        report['stages']['parse']['input'] = 'ocr' if 'ocr' in stages else 'ground_truth'
+
+    output = args.output or os.path.join("bench", "reports", f"{report['commit'] or 'report'}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for stage, result in report['stages'].items():
+        line = (f"{stage:<11} {result['throughput_per_s']:8.2f}/s  p50 {result['p50_ms']:8.1f} ms  "
+                f"p95 {result['p95_ms']:8.1f} ms")
+        for key in ('char_similarity', 'field_accuracy'):
+            if result.get(key) is not None:
+                line += f"  {key} {result[key]:.3f}"
+        print(line)
+    print(f"Report written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
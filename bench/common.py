@@ -0,0 +1,62 @@
+import json
+import os
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def load_images(image_dir, limit=None):
+    """Return a sorted list of (path, image_bytes) for the images in `image_dir`."""
+    paths = sorted(
+        os.path.join(image_dir, name)
+        for name in os.listdir(image_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if limit:
+        paths = paths[:limit]
+
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append((path, f.read()))
+    return images
+
+
+def load_ground_truth(image_path):
+    """Return the text in `<image>.txt` next to an image, or None if there is none."""
+    truth_path = os.path.splitext(image_path)[0] + '.txt'
+    if not os.path.exists(truth_path):
+        return None
+    with open(truth_path, 'r') as f:
+        return f.read()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def load_ground_truth_fields(image_path):
+    """Return the TransactionData dict in `<image>.json` next to an image, or None."""
+    truth_path = os.path.splitext(image_path)[0] + '.json'
+    if not os.path.exists(truth_path):
+        return None
+    with open(truth_path, 'r') as f:
+        return json.load(f)
+
+
+def field_accuracy(predicted, truth):
+    """Share of non-null ground-truth fields the prediction matches (case/space/comma-insensitive)."""
+    def normalize(value):
+        return ''.join(str(value).lower().replace(',', '').split())
+
+    fields = [field for field, value in truth.items() if value is not None]
+    if not fields:
+        return None
+    matched = sum(
+        1 for field in fields
+        if predicted and predicted.get(field) is not None and normalize(predicted[field]) == normalize(truth[field])
+    )
+    return matched / len(fields)
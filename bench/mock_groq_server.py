@@ -0,0 +1,200 @@
+"""
+Local stand-in for Groq's OpenAI-compatible chat completions endpoint.
+
+Emulates latency, per-window request limits (429 with retry-after and
+x-ratelimit-* headers) and random 5xx failures, so the async parser and
+benchmarks can run without network access or API keys.
+
+Usage:
+    python -m bench.mock_groq_server [--port 8765] [--latency 0.2] [--rpm 60]
+
+Then point a client at it, e.g. init_groq_async(base_url="http://127.0.0.1:8765").
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import threading
+import argparse
+import random
+import json
+import time
+import uuid
+import re
+
+from extract_and_parse import TransactionData
+
+RAW_TEXT_PATTERN = re.compile(r'# RAW OCR TEXT:\n# (.*?)\n\n# Analyze', re.DOTALL)
+
+
+def extract_ocr_text(prompt):
+    """Recover the OCR text embedded in a build_prompt() prompt."""
+    match = RAW_TEXT_PATTERN.search(prompt)
+    return match.group(1) if match else prompt
+
+
+def empty_transaction(ocr_text):
+    return {field: None for field in TransactionData.model_fields}
+
+
+class MockGroqServer:
+    """
+    Threaded HTTP server answering POST /openai/v1/chat/completions.
+
+    Args:
+        responder: Callable mapping the OCR text in the prompt to the dict
+            returned as the completion's JSON content
+        latency: Seconds to sleep before answering each request
+        requests_per_window: Requests allowed per window before 429s (None = unlimited)
+        window: Rate-limit window length in seconds
+        failure_rate: Probability of answering with a 503
+        errors: HTTP statuses answered, one per request, before serving normally
+            (deterministic failures for tests, e.g. [503, 400])
+        port: Port to bind (0 picks a free one)
+    """
+
+    def __init__(self, responder=empty_transaction, latency=0.0, requests_per_window=None,
+                 window=60.0, failure_rate=0.0, errors=(), port=0):
+        self.responder = responder
+        self.latency = latency
+        self.requests_per_window = requests_per_window
+        self.window = window
+        self.failure_rate = failure_rate
+        self.errors = list(errors)
+        self.request_count = 0
+        self.rate_limited_count = 0
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _take_slot(self):
+        """Returns (allowed, remaining, seconds_until_reset)."""
+        with self._lock:
+            self.request_count += 1
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._window_count = 0
+            reset = self.window - (now - self._window_start)
+            if self.requests_per_window is None:
+                return True, 1_000_000, reset
+            if self._window_count >= self.requests_per_window:
+                self.rate_limited_count += 1
+                return False, 0, reset
+            self._window_count += 1
+            return True, self.requests_per_window - self._window_count, reset
+
+    def _next_error(self):
+        with self._lock:
+            return self.errors.pop(0) if self.errors else None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                try:
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up (timeout or cancellation)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._send(404, {'error': {'message': f'Unknown path {self.path}'}})
+                    return
+
+                allowed, remaining, reset = server._take_slot()
+                rate_headers = {
+                    'x-ratelimit-limit-requests': str(server.requests_per_window or 1_000_000),
+                    'x-ratelimit-remaining-requests': str(remaining),
+                    'x-ratelimit-reset-requests': f"{reset:.2f}s"
+                }
+                if not allowed:
+                    self._send(429, {'error': {'message': 'Rate limit reached', 'type': 'requests'}},
+                               {**rate_headers, 'retry-after': f"{reset:.2f}"})
+                    return
+
+                if server.latency:
+                    time.sleep(server.latency)
+                status = server._next_error()
+                if status:
+                    self._send(status, {'error': {'message': f'Injected {status}'}}, rate_headers)
+                    return
+                if random.random() < server.failure_rate:
+                    self._send(503, {'error': {'message': 'Service unavailable'}}, rate_headers)
+                    return
+
+                self._send(200, server._completion(body), rate_headers)
+
+        return Handler
+
+    def _completion(self, body):
+        prompt = body['messages'][-1]['content']
+        content = json.dumps(self.responder(extract_ocr_text(prompt)))
+        return {
+            'id': f"chatcmpl-{uuid.uuid4().hex}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': len(prompt) // 4,
+                'completion_tokens': len(content) // 4,
+                'total_tokens': (len(prompt) + len(content)) // 4
+            }
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--rpm", type=int, default=None, help="Requests per minute before 429s")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = MockGroqServer(latency=args.latency, requests_per_window=args.rpm,
+                            failure_rate=args.failure_rate, port=args.port)
+    print(f"Mock Groq endpoint listening on {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Generate a reproducible corpus of synthetic payment receipts.
+
+Each receipt is an EasyPaisa, JazzCash or bank-transfer screenshot
+rendered with PIL at a random width, noise level, blur and JPEG quality.
+Next to every `<name>.png|jpg` the generator writes `<name>.json` (the
+ground-truth TransactionData fields) and `<name>.txt` (the rendered text,
+one line per line), which is the layout bench.common expects.
+
+Usage:
+    python -m bench.synthetic_receipts [out_dir] [--count 60] [--seed 0]
+"""
+import argparse
+import hashlib
+import random
+import json
+import io
+import os
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from extract_and_parse import TransactionData
+
+TEMPLATES = ('easypaisa', 'jazzcash', 'bank')
+WIDTHS = (720, 1080, 1440)
+
+FIRST_NAMES = ('Ali', 'Ayesha', 'Bilal', 'Fatima', 'Hamza', 'Hira', 'Imran', 'Maryam', 'Omar', 'Sana',
+               'Usman', 'Zainab', 'Ahmed', 'Sadia', 'Faisal', 'Nida')
+LAST_NAMES = ('Khan', 'Ahmed', 'Malik', 'Hussain', 'Qureshi', 'Sheikh', 'Butt', 'Raza', 'Iqbal', 'Siddiqui')
+BANKS = ('Meezan Bank', 'HBL', 'UBL', 'Allied Bank', 'Bank Alfalah', 'MCB Bank')
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+EASYPAISA_NOTE = ("Transactions conducted after 09:00 PM and during holidays will show up in "
+                  "receiver's statement in next working day")
+
+
+def _name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _digits(rng, count):
+    return ''.join(rng.choice('0123456789') for _ in range(count))
+
+
+def _amount(rng):
+    return rng.choice((150, 500, 1250, 2000, 5400, 12000, 25000, 75000)) + rng.randrange(0, 100) * 10
+
+
+def random_receipt(rng, template):
+    """
+    Pick random transaction details for `template`.
+
+    Returns:
+        lines: Text lines as they appear on the receipt
+        truth: Ground-truth TransactionData dict
+    """
+    truth = {field: None for field in TransactionData.model_fields}
+    amount = _amount(rng)
+    day, month, year = rng.randint(1, 28), rng.choice(MONTHS), rng.choice((2024, 2025))
+    hour, minute = rng.randint(1, 12), rng.randint(0, 59)
+    meridiem = rng.choice(('AM', 'PM'))
+    sender, recipient = _name(rng), _name(rng)
+    truth.update(
+        transaction_status='Successful',
+        sender_name=sender,
+        recipient_name=recipient,
+        amount=str(amount)
+    )
+
+    if template == 'easypaisa':
+        sender_account = '03' + _digits(rng, 9)
+        recipient_account = _digits(rng, 4)
+        bank = rng.choice(('Telenor Bank', 'Easypaisa Bank'))
+        tid = _digits(rng, rng.choice((6, 11)))
+        lines = [
+            'Funds Transfer', 'Transaction Successful', sender, sender_account, 'Money Transferred',
+            'Rs', f"{amount:,}", 'to', recipient, 'Account Number', recipient_account,
+            'EasyPaisa -', bank, f"{day:02d} {month} {year}", f"{hour:02d}:{minute:02d} {meridiem}",
+            f"Transaction ID(TID): {tid}", EASYPAISA_NOTE, 'Share Receipt'
+        ]
+        truth.update(
+            sender_account=sender_account, recipient_account=recipient_account, currency='Rs',
+            transaction_date=f"{day:02d} {month} {year}", transaction_time=f"{hour:02d}:{minute:02d} {meridiem}",
+            transaction_id=tid, payment_method='EasyPaisa', bank_name=bank, notes=EASYPAISA_NOTE
+        )
+    elif template == 'jazzcash':
+        sender_account = '03' + _digits(rng, 9)
+        recipient_account = '03' + _digits(rng, 9)
+        tid = _digits(rng, 10)
+        fee = rng.choice((0, 10, 20))
+        lines = [
+            'JazzCash', 'Transaction Successful', f"Rs. {amount:,}", 'Sent to', recipient, recipient_account,
+            'From', sender, sender_account, f"{month} {day}, {year}", f"{hour:02d}:{minute:02d} {meridiem}",
+            f"TID: {tid}", f"Fee: Rs. {fee}", 'Done'
+        ]
+        truth.update(
+            sender_account=sender_account, recipient_account=recipient_account, currency='Rs',
+            transaction_date=f"{month} {day}, {year}", transaction_time=f"{hour:02d}:{minute:02d} {meridiem}",
+            transaction_id=tid, payment_method='JazzCash', fee=str(fee)
+        )
+    else:
+        bank = rng.choice(BANKS)
+        sender_account = f"{_digits(rng, 4)}-{_digits(rng, 7)}"
+        recipient_account = f"PK{_digits(rng, 2)}{rng.choice(('MEZN', 'HABB', 'UNIL'))}{_digits(rng, 12)}"
+        reference = f"FT{_digits(rng, 5)}{''.join(rng.choice('ABCDEFGHJK') for _ in range(4))}"
+        month_number = MONTHS.index(month) + 1
+        lines = [
+            bank, 'Funds Transfer Receipt', 'Status: Successful', f"Amount: PKR {amount:,}",
+            f"From: {sender}", f"Account: {sender_account}", f"To: {recipient}", f"IBAN: {recipient_account}",
+            f"Date: {year}-{month_number:02d}-{day:02d}", f"Time: {hour:02d}:{minute:02d} {meridiem}",
+            f"Reference No: {reference}"
+        ]
+        truth.update(
+            sender_account=sender_account, recipient_account=recipient_account, currency='PKR',
+            transaction_date=f"{year}-{month_number:02d}-{day:02d}", transaction_time=f"{hour:02d}:{minute:02d} {meridiem}",
+            transaction_id=reference, payment_method='Bank Transfer', bank_name=bank
+        )
+    return lines, truth
+
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has a single bitmap size
+        return ImageFont.load_default()
+
+
+def _wrap(draw, line, font, max_width):
+    words, wrapped, current = line.split(), [], ''
+    for word in words:
+        candidate = f"{current} {word}".strip()
+        if current and draw.textlength(candidate, font=font) > max_width:
+            wrapped.append(current)
+            current = word
+        else:
+            current = candidate
+    return wrapped + [current] if current else wrapped
+
+
+def render_receipt(lines, width=1080, noise=0.0, blur=0.0, seed=0):
+    """
+    Draw receipt lines as a phone-screenshot-like image.
+
+    Args:
+        lines: Text lines, top to bottom (long lines are wrapped)
+        width: Image width in pixels; font size and margins scale with it
+        noise: Standard deviation of Gaussian pixel noise
+        blur: Gaussian blur radius
+
+    Returns:
+        image: RGB PIL image
+    """
+    scale = width / 1080
+    font = _font(round(40 * scale))
+    title_font = _font(round(52 * scale))
+    margin, spacing = round(80 * scale), round(24 * scale)
+
+    measure = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+    rows = []
+    for idx, line in enumerate(lines):
+        row_font = title_font if idx == 0 else font
+        rows.extend((text, row_font) for text in _wrap(measure, line, row_font, width - 2 * margin))
+    line_height = round(56 * scale) + spacing
+    height = max(round(width * 1.6), 2 * margin + len(rows) * line_height + round(160 * scale))
+
+    image = Image.new('RGB', (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, width, round(140 * scale)], fill=(22, 160, 90))
+    y = round(200 * scale)
+    for text, row_font in rows:
+        draw.text((margin, y), text, fill=(20, 20, 20), font=row_font)
+        y += line_height
+
+    if blur:
+        image = image.filter(ImageFilter.GaussianBlur(blur))
+    if noise:
+        pixels = np.asarray(image, dtype=np.float32)
+        pixels += np.random.default_rng(seed).normal(0, noise, pixels.shape)
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return image
+
+
+def generate_corpus(out_dir, count=60, seed=0):
+    """
+    Write `count` receipts with ground truth to `out_dir`.
+
+    Returns:
+        manifest: Dict with the seed and one entry per receipt (name,
+            template, width, noise, blur, format)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    entries = []
+    for idx in range(count):
+        template = TEMPLATES[idx % len(TEMPLATES)]
+        lines, truth = random_receipt(rng, template)
+        entry = {
+            'name': f"{idx:04d}_{template}",
+            'template': template,
+            'width': rng.choice(WIDTHS),
+            'noise': rng.choice((0.0, 0.0, 6.0, 12.0)),
+            'blur': rng.choice((0.0, 0.0, 0.8, 1.5)),
+            'format': rng.choice(('png', 'jpg'))
+        }
+        image = render_receipt(lines, entry['width'], entry['noise'], entry['blur'], seed=seed * 100_003 + idx)
+
+        buffer = io.BytesIO()
+        if entry['format'] == 'jpg':
+            image.save(buffer, format='JPEG', quality=rng.choice((60, 80, 95)))
+        else:
+            image.save(buffer, format='PNG')
+        base = os.path.join(out_dir, entry['name'])
+        with open(f"{base}.{entry['format']}", 'wb') as f:
+            f.write(buffer.getvalue())
+        with open(f"{base}.json", 'w') as f:
+            json.dump(truth, f, indent=2)
+        with open(f"{base}.txt", 'w') as f:
+            f.write('\n'.join(lines))
+        entry['sha256'] = hashlib.sha256(buffer.getvalue()).hexdigest()
+        entries.append(entry)
+
+    manifest = {'seed': seed, 'count': count, 'receipts': entries}
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("out_dir", nargs="?", default=os.path.join("bench", "corpus"))
+    parser.add_argument("--count", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    manifest = generate_corpus(args.out_dir, args.count, args.seed)
+    print(f"Wrote {manifest['count']} receipts to {args.out_dir} (seed {args.seed})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import threading
+import sqlite3
+import hashlib
+import json
+import time
+import os
+
+CACHE_DIR = os.getenv('OCRECEIPT_CACHE_DIR', '.cache')
+
+def hash_key(*parts):
+    """Build a stable cache key from bytes/str/JSON-serializable parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        elif not isinstance(part, bytes):
+            part = json.dumps(part, sort_keys=True).encode('utf-8')
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+class SQLiteCache:
+    """
+    Persistent key/value cache stored in a single SQLite file.
+
+    Values are JSON-serialized. When the total stored size exceeds
+    `max_bytes`, the least recently used entries are evicted. Entries
+    older than `ttl` seconds are treated as misses and purged.
+
+    Args:
+        path: SQLite database file
+        max_bytes: Upper bound on the summed size of stored values
+        ttl: Time-to-live in seconds (None keeps entries until evicted)
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL DEFAULT 0,
+                last_access REAL NOT NULL
+            )
+        """)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(cache)")]
+        if 'created_at' not in columns:
+            self._conn.execute("ALTER TABLE cache ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache(last_access)")
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now)
+            )
+            self._evict()
+
+    def purge_expired(self):
+        """Delete entries older than the TTL. Returns the number removed."""
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM cache WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+        return cursor.rowcount
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM cache ORDER BY last_access"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", doomed)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# Failures of a cache file (locked, corrupt, unwritable) that must not fail the work it caches
+CACHE_ERRORS = (sqlite3.Error, OSError, ValueError)
+
+def cache_get(get_cache, key):
+    """Look `key` up in the cache returned by `get_cache()`; a broken cache counts as a miss."""
+    try:
+        return get_cache().get(key)
+    except CACHE_ERRORS:
+        return None
+
+def cache_set(get_cache, key, value):
+    """Store `value` under `key`; a broken cache just isn't updated."""
+    try:
+        get_cache().set(key, value)
+    except CACHE_ERRORS:
+        pass
+
+# OCR results cache (shared per process)
+_ocr_cache = None
+
+def get_ocr_cache():
+    global _ocr_cache
+    if _ocr_cache is None:
+        _ocr_cache = SQLiteCache(
+            os.path.join(CACHE_DIR, 'ocr_cache.sqlite3'),
+            max_bytes=int(os.getenv('OCR_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        )
+    return _ocr_cache
+
+# LLM parse results cache (shared per process)
+_llm_cache = None
+
+def get_llm_cache():
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = SQLiteCache(
+            os.path.join(CACHE_DIR, 'llm_cache.sqlite3'),
+            max_bytes=int(os.getenv('LLM_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+            ttl=float(os.getenv('LLM_CACHE_TTL', 30 * 24 * 3600))
+        )
+        _llm_cache.purge_expired()
+    return _llm_cache
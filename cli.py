@@ -0,0 +1,246 @@
+import argparse
+import sys
+import os
+
+def enable_metrics(args):
+    if args.metrics:
+        import tracing
+        tracing.enable()
+
+def dump_metrics(args):
+    if args.metrics:
+        import tracing
+        print(f"Stage metrics written to {tracing.dump_metrics(args.metrics)}")
+
+def cmd_ingest(args):
+    from ingest import ingest
+
+    enable_metrics(args)
+    stats = ingest(
+        args.source,
+        output=args.output,
+        transactions_file=args.transactions,
+        workers=args.workers,
+        llm_concurrency=args.llm_concurrency,
+        use_preprocessing=not args.no_preprocessing,
+        pipeline=args.pipeline,
+        pack_size=args.pack_size
+    )
+    print(f"Done: {stats['processed']} processed, {stats['failed']} failed, {stats['skipped']} skipped, "
+          f"{stats['duplicates']} duplicates ({stats['similar']} images looked alike)")
+
+    from triage import triage_stats
+    triage_counts = triage_stats()
+    rejected = ', '.join(f"{count} {reason}" for reason, count in triage_counts['rejected'].items()) or "none"
+    print(f"Triage: {triage_counts['accepted']} accepted ({triage_counts['downscaled']} downscaled), "
+          f"rejected: {rejected}")
+
+    from rule_parser import fast_path_stats
+    parse_stats = fast_path_stats()
+    print(f"Fast path: {parse_stats['fast_path']} rule-parsed, {parse_stats['llm_fallback']} sent to LLM "
+          f"({parse_stats['hit_rate']:.0%} hit rate)")
+    dump_metrics(args)
+    return 1 if stats['failed'] else 0
+
+def cmd_migrate(args):
+    from save_to_json import migrate_json_to_jsonl
+
+    try:
+        count = migrate_json_to_jsonl(args.source, args.dest, force=args.force)
+    except FileExistsError:
+        print(f"{args.dest} already contains transactions; refusing to overwrite them (use --force)")
+        return 1
+    print(f"Migrated {count} transactions from {args.source} to {args.dest}")
+    return 0
+
+def cmd_compact(args):
+    from save_to_json import compact_transactions
+
+    kept, removed = compact_transactions(args.file)
+    print(f"Compacted {args.file}: {kept} records kept, {removed} lines removed")
+    return 0
+
+def cmd_batch(args):
+    import hashlib
+    from ingest import iter_images
+    from worker_pool import ReceiptWorkerPool
+    from batch_parse import run_batch, GroqBatchBackend, LocalBatchBackend
+    from utils import init_groq
+
+    enable_metrics(args)
+    if args.local_base_url:
+        from groq import Groq
+        backend = LocalBatchBackend(Groq(api_key="local", base_url=args.local_base_url))
+    else:
+        client = init_groq()
+        if client is None:
+            print("Failed to initialize Groq client (is GROQ_API_KEY set?)", file=sys.stderr)
+            return 1
+        backend = GroqBatchBackend(client)
+
+    # OCR everything first; custom_id is the image hash
+    names = []
+    hashes = []
+    def images():
+        for name, image_bytes in iter_images(args.source):
+            names.append(name)
+            hashes.append(hashlib.sha256(image_bytes).hexdigest())
+            yield image_bytes
+
+    ocr_texts = {}
+    ocr_failures = 0
+    with ReceiptWorkerPool(args.workers) as pool:
+        for idx, (text, error) in enumerate(pool.map(images(), use_preprocessing=not args.no_preprocessing,
+                                                            pipeline=args.pipeline)):
+            if not error and not text:
+                error = "No text found in image"
+            if error:
+                print(f"[error] {names[idx]}: {error}", file=sys.stderr)
+                ocr_failures += 1
+            else:
+                ocr_texts[hashes[idx]] = text
+
+    if not ocr_texts:
+        print(f"Nothing to submit: {ocr_failures} of {len(names)} receipts failed OCR")
+        dump_metrics(args)
+        return 1 if ocr_failures else 0
+
+    merged, errors = run_batch(
+        backend,
+        ocr_texts,
+        args.transactions,
+        requests_path=args.requests,
+        poll_interval=args.poll_interval,
+        pack_size=args.pack_size
+    )
+    for custom_id, error in errors.items():
+        print(f"[error] {custom_id}: {error}", file=sys.stderr)
+    print(f"Done: {merged} transactions merged, {len(errors) + ocr_failures} failed "
+          f"({ocr_failures} in OCR)")
+    dump_metrics(args)
+    return 1 if errors or ocr_failures else 0
+
+def cmd_worker(args):
+    from job_queue import run_worker
+
+    # Runs until interrupted; the metrics cover every job served until then
+    try:
+        run_worker(
+            args.queue,
+            ocr_workers=args.workers,
+            llm_concurrency=args.llm_concurrency,
+            poll_interval=args.poll_interval,
+            torch_threads=args.torch_threads
+        )
+    finally:
+        dump_metrics(args)
+    return 0
+
+def cmd_warmup(args):
+    from extract_and_parse import warm_up, describe_warmup
+
+    report, error = warm_up(download=args.download, runs=args.runs)
+    if error:
+        print(error)
+        return 1
+    print(f"EasyOCR ready: {describe_warmup(report)}")
+    return 0
+
+def cmd_serve(args):
+    import uvicorn
+
+    # One process: the OCR pool inside it is what scales
+    uvicorn.run("api:app", host=args.host, port=args.port)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="ocreceipt", description="OCReceipt command line tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Bulk-process a folder or zip of receipt images")
+    ingest_parser.add_argument("source", help="Directory or .zip archive of receipt images")
+    ingest_parser.add_argument("--output", default="ingest_results.jsonl",
+                               help="Per-image results log, also used to resume (default: %(default)s)")
+    ingest_parser.add_argument("--transactions", default="transactions.jsonl",
+                               help="Transaction file parsed receipts are saved to (default: %(default)s)")
+    ingest_parser.add_argument("--workers", type=int, default=None,
+                               help="OCR worker processes (default: CPU count)")
+    ingest_parser.add_argument("--llm-concurrency", type=int, default=4,
+                               help="Concurrent LLM requests (default: %(default)s)")
+    ingest_parser.add_argument("--no-preprocessing", action="store_true",
+                               help="OCR the raw images without CV2 preprocessing")
+    ingest_parser.add_argument("--pipeline", default="default",
+                               help="Preprocessing pipeline from pipelines.json (default: %(default)s)")
+    ingest_parser.add_argument("--pack-size", type=int, default=1,
+                               help="Receipts per LLM request; >1 packs several into one prompt (default: %(default)s)")
+    ingest_parser.add_argument("--metrics", default=None, metavar="PATH",
+                               help="Write per-stage timing metrics here (.prom for Prometheus text, else JSON)")
+    ingest_parser.set_defaults(func=cmd_ingest)
+
+    batch_parser = subparsers.add_parser("batch", help="Backfill a folder or zip through the Groq Batch API")
+    batch_parser.add_argument("source", help="Directory or .zip archive of receipt images")
+    batch_parser.add_argument("--transactions", default="transactions.jsonl",
+                              help="Transaction file results are merged into (default: %(default)s)")
+    batch_parser.add_argument("--requests", default=os.path.join("batch", "requests.jsonl"),
+                              help="Batch request file to write (default: %(default)s)")
+    batch_parser.add_argument("--workers", type=int, default=None,
+                              help="OCR worker processes (default: CPU count)")
+    batch_parser.add_argument("--poll-interval", type=float, default=60.0,
+                              help="Seconds between batch status checks (default: %(default)s)")
+    batch_parser.add_argument("--local-base-url", default=None,
+                              help="Run the batch locally against this chat-completions endpoint instead of Groq")
+    batch_parser.add_argument("--no-preprocessing", action="store_true",
+                              help="OCR the raw images without CV2 preprocessing")
+    batch_parser.add_argument("--pipeline", default="default",
+                              help="Preprocessing pipeline from pipelines.json (default: %(default)s)")
+    batch_parser.add_argument("--pack-size", type=int, default=1,
+                              help="Receipts per LLM request; >1 packs several into one prompt (default: %(default)s)")
+    batch_parser.add_argument("--metrics", default=None, metavar="PATH",
+                              help="Write per-stage timing metrics here (.prom for Prometheus text, else JSON)")
+    batch_parser.set_defaults(func=cmd_batch)
+
+    worker_parser = subparsers.add_parser("worker", help="Process receipt jobs queued by the web app")
+    worker_parser.add_argument("--queue", default=os.getenv('OCRECEIPT_QUEUE', 'jobs.db'),
+                               help="Job queue database (default: %(default)s)")
+    worker_parser.add_argument("--workers", type=int, default=None,
+                               help="OCR worker processes (default: CPU count)")
+    worker_parser.add_argument("--llm-concurrency", type=int, default=4,
+                               help="Concurrent LLM requests (default: %(default)s)")
+    worker_parser.add_argument("--poll-interval", type=float, default=0.5,
+                               help="Seconds between queue checks when idle (default: %(default)s)")
+    worker_parser.add_argument("--torch-threads", type=int, default=1,
+                               help="Torch intra-op threads per OCR process (default: %(default)s)")
+    worker_parser.add_argument("--metrics", default=None, metavar="PATH",
+                               help="Write per-stage timing metrics here on exit (.prom for Prometheus text, else JSON)")
+    worker_parser.set_defaults(func=cmd_worker)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the HTTP extraction API")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.set_defaults(func=cmd_serve)
+
+    warmup_parser = subparsers.add_parser("warmup", help="Check the OCR models are installed and time a cold vs warm inference")
+    warmup_parser.add_argument("--download", action="store_true",
+                               help="Download missing model files (otherwise only local files are used)")
+    warmup_parser.add_argument("--runs", type=int, default=3, help="Dummy inferences; the first is the cold one")
+    warmup_parser.set_defaults(func=cmd_warmup)
+
+    migrate_parser = subparsers.add_parser("migrate", help="Convert a JSON array transaction file to JSONL")
+    migrate_parser.add_argument("source", nargs="?", default="transactions.json")
+    migrate_parser.add_argument("dest", nargs="?", default="transactions.jsonl")
+    migrate_parser.add_argument("--force", action="store_true",
+                                help="Overwrite a destination that already has transactions")
+    migrate_parser.set_defaults(func=cmd_migrate)
+
+    compact_parser = subparsers.add_parser("compact", help="Drop torn lines and duplicates from a JSONL transaction file")
+    compact_parser.add_argument("file", nargs="?", default="transactions.jsonl")
+    compact_parser.set_defaults(func=cmd_compact)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
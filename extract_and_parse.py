@@ -1,67 +1,184 @@
 from datetime import datetime
-from PIL import Image
 import numpy as np
-import easyocr
 import json
-import io
+import time
+import os
+import cv2
 
-from preprocess import preprocess_image
+from preprocess import decode_image, preprocess_array, resize_image, get_pipeline
+from triage import triage_image
+from cache import get_ocr_cache, get_llm_cache, hash_key, cache_get, cache_set
+from tracing import span
 
-def extract_text_easyocr(image_bytes):
-    try:
-        reader = easyocr.Reader(['en'])
-        
-        # Convert bytes → numpy array (RGB)
-        image = np.array(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
-        
-        # Perform OCR
-        results = reader.readtext(image)
-        
-        # Combine all detected text
-        text = '\n'.join([result[1] for result in results])
-        return text.strip(), None
-    except Exception as e:
-        return None, f"OCR Error: {str(e)}"
+OCR_LANGUAGES = ['en']
+
+# Bump when a change to decoding/preprocessing/OCR would alter cached text
+OCR_CACHE_VERSION = 5
+
+# EasyOCR model directory (None: EasyOCR's default, ~/.EasyOCR/model)
+OCR_MODEL_DIR = os.getenv('OCRECEIPT_MODEL_DIR') or None
+
+# Models are fetched once with `ocreceipt warmup --download`; everything else
+# (the API, queue workers, the app) only loads local files, so missing models
+# fail at startup instead of being downloaded in the middle of a request.
+# Set OCRECEIPT_MODEL_DOWNLOAD=1 to allow downloads anywhere.
+OCR_MODEL_DOWNLOAD = os.getenv('OCRECEIPT_MODEL_DOWNLOAD', '0') not in ('', '0')
 
 # Initialize EasyOCR reader (cached to avoid reloading)
 _reader = None
+_warmup = None
 
-def get_reader():
+def get_reader(download=None):
     global _reader
     if _reader is None:
-        _reader = easyocr.Reader(['en'], gpu=False)
+        # Imported here: easyocr pulls in torch, which processes that never
+        # OCR (the Streamlit app, the API front end, parsing-only tools) skip
+        import easyocr
+        _reader = easyocr.Reader(
+            OCR_LANGUAGES,
+            gpu=False,
+            model_storage_directory=OCR_MODEL_DIR,
+            download_enabled=OCR_MODEL_DOWNLOAD if download is None else download
+        )
     return _reader
 
-def extract_text_easyocr(image_bytes, use_preprocessing=True):
+def _warmup_image():
+    # Real text, so both the detector and the recognizer run
+    image = np.full((96, 480), 255, dtype=np.uint8)
+    cv2.putText(image, "Rs 1,250 TID 0042", (16, 62), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 2, cv2.LINE_AA)
+    return image
+
+def warm_up(download=None, runs=3):
+    """
+    Load the EasyOCR models and run dummy inferences, so the first real
+    receipt doesn't pay for model loading and first-call allocation.
+    Runs once per process; later calls return the first report.
+    
+    Args:
+        download: Allow downloading missing model files (defaults to OCRECEIPT_MODEL_DOWNLOAD)
+        runs: Dummy inferences; the first is the cold one
+    
+    Returns:
+        report: Dict with load_s (reader construction), cold_s (first
+            inference) and warm_s (mean of the others), or None
+        error: Error message if the models are missing or fail to load
+    """
+    global _warmup
+    if _warmup is not None:
+        return _warmup
+    
+    try:
+        begin = time.perf_counter()
+        reader = get_reader(download)
+        load_s = time.perf_counter() - begin
+        
+        image = _warmup_image()
+        latencies = []
+        for _ in range(max(runs, 1)):
+            begin = time.perf_counter()
+            reader.readtext(image)
+            latencies.append(time.perf_counter() - begin)
+    except FileNotFoundError as e:
+        # Raised by EasyOCR when a model file is missing and downloads are disabled
+        return None, f"EasyOCR model files missing: {str(e)}. Run `ocreceipt warmup --download` once"
+    except Exception as e:
+        return None, f"OCR warm-up failed: {str(e)}"
+    
+    report = {
+        'load_s': load_s,
+        'cold_s': latencies[0],
+        'warm_s': sum(latencies[1:]) / len(latencies[1:]) if len(latencies) > 1 else None
+    }
+    _warmup = report, None
+    return _warmup
+
+def describe_warmup(report):
+    """One-line summary of a warm_up report."""
+    warm = f"{report['warm_s'] * 1000:.0f} ms" if report['warm_s'] is not None else "n/a"
+    return f"models loaded in {report['load_s']:.2f} s, cold inference {report['cold_s'] * 1000:.0f} ms, warm {warm}"
+
+def load_ocr_input(image_bytes, use_preprocessing=True, use_triage=True, reuse_buffers=False,
+                   pipeline='default'):
+    """
+    Decode image bytes once and return the array handed to EasyOCR.
+
+    Triage rejects blank/non-receipt images (raising ValueError) and
+    downscales oversized ones before any expensive work. With preprocessing
+    the grayscale/binary output of preprocess_array is returned directly,
+    so the image is never decoded a second time. With `reuse_buffers` that
+    output lives in a per-thread buffer and must be consumed before the
+    next call. `pipeline` names the preprocessing pipeline to run.
+    """
+    with span('decode'):
+        image = decode_image(image_bytes)
+    if use_triage:
+        with span('triage'):
+            decision = triage_image(image)
+        if not decision['accept']:
+            raise ValueError(f"Image rejected by triage: {decision['reason']}")
+        with span('resize'):
+            image = resize_image(image, decision['scale'])
+    if use_preprocessing:
+        with span('preprocess'):
+            image, _ = preprocess_array(image, reuse_buffers=reuse_buffers, pipeline=pipeline)
+    return image
+
+def ocr_cache_key(image_bytes, use_preprocessing, pipeline='default'):
+    """Cache key covering the image content and every setting that affects OCR output."""
+    settings = {
+        'version': OCR_CACHE_VERSION,
+        'languages': OCR_LANGUAGES,
+        'use_preprocessing': use_preprocessing
+    }
+    # Keyed by the stage list rather than the name, so editing any pipeline
+    # in pipelines.json (including "default") invalidates its entries
+    if use_preprocessing:
+        settings['pipeline'] = get_pipeline(pipeline).spec
+    return hash_key(image_bytes, settings)
+
+def extract_text_easyocr(image_bytes, use_preprocessing=True, use_cache=True, pipeline='default'):
     """
     Extract text from image using EasyOCR with optional preprocessing.
     
     Args:
         image_bytes: Image as bytes
         use_preprocessing: Whether to apply CV2 preprocessing
+        use_cache: Whether to look up/store the result in the OCR cache
+        pipeline: Name of the preprocessing pipeline (see preprocess.get_pipeline)
     
     Returns:
         text: Extracted text
         error: Error message if any
     """
     try:
+        # Cache failures are misses, so they can't fail the extraction
+        if use_cache:
+            key = ocr_cache_key(image_bytes, use_preprocessing, pipeline)
+            cached_text = cache_get(get_ocr_cache, key)
+            if cached_text is not None:
+                return cached_text, None
+
         reader = get_reader()
 
-        # Convert bytes → numpy array (RGB)
-        image = np.array(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+        # Decode once, then OCR the preprocessed or the raw array
+        image = load_ocr_input(image_bytes, use_preprocessing, reuse_buffers=True, pipeline=pipeline)
         
         # Perform OCR
-        results = reader.readtext(image)
+        with span('ocr'):
+            results = reader.readtext(image)
         
         # Combine all detected text
-        text = '\n'.join([result[1] for result in results])
+        text = '\n'.join([result[1] for result in results]).strip()
+
+        if use_cache:
+            cache_set(get_ocr_cache, key, text)
         
-        return text.strip(), None
+        return text, None
     
     except Exception as e:
         return None, f"OCR Error: {str(e)}"
 
-def extract_text_easyocr_with_debug(image_bytes):
+def extract_text_easyocr_with_debug(image_bytes, pipeline='default'):
     """
     Extract text with preprocessing debug info.
     Returns both text and preprocessing steps.
@@ -70,13 +187,10 @@ def extract_text_easyocr_with_debug(image_bytes):
         reader = get_reader()
         
         # Apply preprocessing with debug
-        preprocessed_image, steps = preprocess_image(image_bytes, debug=True)
+        preprocessed_image, steps = preprocess_array(decode_image(image_bytes), debug=True, pipeline=pipeline)
         
-        # Convert bytes → numpy array (RGB)
-        image = np.array(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
-        
-        # Perform OCR
-        results = reader.readtext(image)
+        # Perform OCR on the preprocessed image
+        results = reader.readtext(preprocessed_image)
         
         # Combine all detected text
         text = '\n'.join([result[1] for result in results])
@@ -86,6 +200,62 @@ def extract_text_easyocr_with_debug(image_bytes):
     except Exception as e:
         return None, None, f"OCR Error: {str(e)}"
 
+def extract_text_batch(images_bytes, use_preprocessing=True, batch_size=8, pipeline='default'):
+    """
+    Extract text from many images with batched EasyOCR recognition.
+
+    Images are grouped by size so each group goes through a single
+    `readtext_batched` call instead of one `readtext` call per image.
+
+    Args:
+        images_bytes: List of images as bytes
+        use_preprocessing: Whether to apply CV2 preprocessing
+        batch_size: Number of text crops recognized per forward pass
+        pipeline: Name of the preprocessing pipeline
+
+    Returns:
+        results: List of (text, error) tuples in input order
+    """
+    results = [(None, None)] * len(images_bytes)
+
+    # Decode everything up front and group images of identical size
+    groups = {}
+    for idx, image_bytes in enumerate(images_bytes):
+        try:
+            image = load_ocr_input(image_bytes, use_preprocessing, pipeline=pipeline)
+        except Exception as e:
+            results[idx] = (None, f"OCR Error: {str(e)}")
+            continue
+        groups.setdefault(image.shape[:2], []).append((idx, image))
+
+    if not groups:
+        return results
+
+    try:
+        reader = get_reader()
+    except Exception as e:
+        for items in groups.values():
+            for idx, _ in items:
+                results[idx] = (None, f"OCR Error: {str(e)}")
+        return results
+
+    for items in groups.values():
+        try:
+            batch = reader.readtext_batched(
+                [image for _, image in items],
+                batch_size=batch_size
+            )
+        except Exception as e:
+            for idx, _ in items:
+                results[idx] = (None, f"OCR Error: {str(e)}")
+            continue
+
+        for (idx, _), detections in zip(items, batch):
+            text = '\n'.join([result[1] for result in detections])
+            results[idx] = (text.strip(), None)
+
+    return results
+
 from pydantic import BaseModel, Field
 from typing import Optional
 
@@ -107,21 +277,15 @@ class TransactionData(BaseModel):
     fee: Optional[str] = Field(None, description="Transaction fee if mentioned")
     any_other_details: Optional[str] = Field(None, description="Any other relevant information")
 
-    
-def parse_with_llm(client, ocr_text):
-    """
-    Parse extracted text using Groq LLM with structured output.
-    """
-    try:
-        # Create the prompt for structured extraction
-        prompt = f"""You are a transaction receipt parser. Below is the raw text extracted from a payment receipt screenshot using OCR.
 
-# RAW OCR TEXT:
-# {ocr_text}
+LLM_MODEL = "openai/gpt-oss-20b"
 
-# Analyze this text and extract transaction information in a structured JSON format.
+# Bump whenever the prompt or post-processing changes so cached parses are not reused
+PROMPT_VERSION = 1
+
+SYSTEM_PROMPT = "You are a transaction receipt parser. Extract structured information from payment receipts accurately."
 
-# Extract the following fields (use null if not found):
+FIELD_INSTRUCTIONS = """# Extract the following fields (use null if not found):
 # - transaction_status: (e.g., "Successful", "Failed", "Pending")
 # - sender_name: Full name of sender
 # - sender_account: Account number or ID of sender
@@ -136,47 +300,98 @@ def parse_with_llm(client, ocr_text):
 # - bank_name: Bank name if applicable
 # - notes: Any additional notes or messages
 # - fee: Transaction fee if mentioned
-# - any_other_details: Any other relevant information
+# - any_other_details: Any other relevant information"""
+
+def build_prompt(ocr_text):
+    """Create the prompt for structured extraction."""
+    return f"""You are a transaction receipt parser. Below is the raw text extracted from a payment receipt screenshot using OCR.
+
+# RAW OCR TEXT:
+# {ocr_text}
+
+# Analyze this text and extract transaction information in a structured JSON format.
+
+{FIELD_INSTRUCTIONS}
 
 # Return ONLY a valid JSON object with these fields. Do not include any explanation or markdown formatting."""
 
+def normalize_ocr_text(ocr_text):
+    """Collapse whitespace and drop blank lines so trivially different OCR runs share a cache key."""
+    lines = (' '.join(line.split()) for line in ocr_text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+def llm_cache_key(ocr_text, model=LLM_MODEL):
+    return hash_key(normalize_ocr_text(ocr_text), {'model': model, 'prompt_version': PROMPT_VERSION})
+
+def build_completion_request(ocr_text):
+    """Keyword arguments for a chat completion parsing one receipt."""
+    return {
+        'model': LLM_MODEL,
+        'messages': [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": build_prompt(ocr_text)
+            }
+        ],
+        'temperature': 0,
+        'max_tokens': 1024,
+        'response_format': {"type": "json_object"}
+    }
+
+def validate_transaction_json(result):
+    """
+    Decode the model's JSON reply and validate it against TransactionData.
+    Raises json.JSONDecodeError or a pydantic ValidationError.
+    """
+    transaction_data = json.loads(result)
+    return validate_transaction(transaction_data)
+
+def validate_transaction(transaction_data):
+    for key in ["amount", "fee"]:
+        if key in transaction_data and transaction_data[key] is not None:
+            transaction_data[key] = str(transaction_data[key])
+    
+    # Validate with Pydantic model
+    return TransactionData(**transaction_data).model_dump()
+
+def add_metadata(validated_data, ocr_text):
+    """Attach the extraction timestamp and raw OCR text to a parsed transaction."""
+    final_data = dict(validated_data)
+    final_data['extraction_timestamp'] = datetime.now().isoformat()
+    final_data['raw_ocr_text'] = ocr_text
+    return final_data
+
+def parse_with_llm(client, ocr_text, use_cache=True):
+    """
+    Parse extracted text using Groq LLM with structured output.
+
+    Parses are memoized on the normalized OCR text, model and prompt
+    version, so a duplicate receipt skips the API call entirely.
+    """
+    try:
+        if use_cache:
+            cache_key = llm_cache_key(ocr_text)
+            cached_data = cache_get(get_llm_cache, cache_key)
+            if cached_data is not None:
+                return add_metadata(cached_data, ocr_text), None
+
         # Use Groq with structured output
-        completion = client.chat.completions.create(
-            model="openai/gpt-oss-20b",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a transaction receipt parser. Extract structured information from payment receipts accurately."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0,
-            max_tokens=1024,
-            response_format={"type": "json_object"}
-        )
+        with span('llm'):
+            completion = client.chat.completions.create(**build_completion_request(ocr_text))
         
         result = completion.choices[0].message.content
-        transaction_data = json.loads(result)
-        
-        for key in ["amount", "fee"]:
-            if key in transaction_data and transaction_data[key] is not None:
-                transaction_data[key] = str(transaction_data[key])
-        
-        # Validate with Pydantic model
-        validated_data = TransactionData(**transaction_data)
-        
-        # Convert to dict and add metadata
-        
-        final_data = validated_data.model_dump()
-        final_data['extraction_timestamp'] = datetime.now().isoformat()
-        final_data['raw_ocr_text'] = ocr_text
+        validated_data = validate_transaction_json(result)
+
+        if use_cache:
+            cache_set(get_llm_cache, cache_key, validated_data)
         
-        return final_data, None
+        return add_metadata(validated_data, ocr_text), None
         
     except json.JSONDecodeError as e:
         return None, f"Failed to parse JSON response: {str(e)}"
     except Exception as e:
-        return None, f"Error parsing with LLM: {str(e)}"
\ No newline at end of file
+        return None, f"Error parsing with LLM: {str(e)}"
@@ -0,0 +1,244 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from collections import deque
+import threading
+import hashlib
+import zipfile
+import json
+import os
+
+from utils import init_groq
+from save_to_json import TransactionLog, DEFAULT_TRANSACTIONS_FILE, resolve_transactions_file
+from rule_parser import parse_receipt, parse_fast_path
+from packed_parse import PackQueue
+from worker_pool import ReceiptWorkerPool
+from triage import SimilarImageIndex, image_fingerprint
+from extract_and_parse import normalize_ocr_text
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+def iter_images(source):
+    """
+    Stream (name, image_bytes) pairs from a directory tree or a zip archive.
+    Only one image is held in memory at a time.
+    """
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    yield info.filename, archive.read(info)
+    elif os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    with open(path, 'rb') as f:
+                        yield path, f.read()
+    else:
+        raise ValueError(f"{source} is neither a directory nor a zip archive")
+
+def duplicate_keys(transaction):
+    """
+    Keys under which two parsed receipts are the same transaction: the
+    transaction ID, or identical OCR text when there is none.
+    """
+    keys = []
+    transaction_id = ''.join(str(transaction.get('transaction_id') or '').split()).lower()
+    if transaction_id:
+        keys.append('tid:' + transaction_id)
+    ocr_text = normalize_ocr_text(transaction.get('raw_ocr_text') or '')
+    if ocr_text:
+        keys.append('text:' + hashlib.sha256(ocr_text.encode('utf-8')).hexdigest())
+    return keys
+
+def load_processed(output):
+    """
+    Read the results log of earlier runs.
+
+    Returns:
+        processed: Hashes of images already ingested or found to be duplicates
+        seen: {duplicate key: source} of the transactions already saved
+    """
+    processed = set()
+    seen = {}
+    if not os.path.exists(output):
+        return processed, seen
+    with open(output, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Partial line from an interrupted run
+                continue
+            # Older runs flagged look-alike images as duplicates without
+            # parsing them; those have no duplicate_of and are retried
+            if record.get('status') == 'ok' or (record.get('status') == 'duplicate' and record.get('duplicate_of')):
+                processed.add(record['image_hash'])
+            if record.get('status') == 'ok' and record.get('transaction'):
+                for key in duplicate_keys(record['transaction']):
+                    seen.setdefault(key, record['source'])
+    return processed, seen
+
+def ingest(source, output="ingest_results.jsonl", transactions_file=DEFAULT_TRANSACTIONS_FILE,
+           workers=None, llm_concurrency=4, use_preprocessing=True, pipeline='default', pack_size=1,
+           log=print):
+    """
+    Run every image in `source` through preprocess → OCR → parse
+    (rule-based fast path first, LLM for everything else).
+
+    OCR runs in a ReceiptWorkerPool while LLM parsing runs on a thread pool,
+    so both stages overlap. Each result is appended to `output` (JSONL) as
+    soon as it is ready; rerunning after a crash skips images whose hash
+    already has a successful record there.
+
+    Byte-identical images are skipped before OCR. Receipts whose parsed
+    transaction ID (or OCR text) matches one already saved are recorded as
+    duplicates instead of being saved again. Images that merely look alike
+    (difference hash) are still processed and only flagged with
+    `similar_to`, since receipts from one app template look alike too.
+
+    With `pack_size` > 1, receipts the rule fast path can't parse are sent
+    to the LLM `pack_size` at a time (packed_parse) instead of one request
+    each.
+
+    Returns:
+        stats: Dict of processed/failed/skipped/duplicates/similar counts
+    """
+    client = init_groq()
+    if client is None:
+        raise RuntimeError("Failed to initialize Groq client (is GROQ_API_KEY set?)")
+
+    processed, seen = load_processed(output)
+    similar_images = SimilarImageIndex()
+    stats = {'processed': 0, 'failed': 0, 'skipped': 0, 'duplicates': 0, 'similar': 0}
+
+    def pending_images():
+        for name, image_bytes in iter_images(source):
+            image_hash = hashlib.sha256(image_bytes).hexdigest()
+            if image_hash in processed:
+                stats['skipped'] += 1
+                continue
+            processed.add(image_hash)
+
+            record = {'source': name, 'image_hash': image_hash}
+            # Only a hint (e.g. a re-encoded copy); the parsed receipt decides
+            try:
+                similar_to = similar_images.match(image_fingerprint(image_bytes), name)
+            except ValueError:
+                similar_to = None
+            if similar_to:
+                record['similar_to'] = similar_to
+                stats['similar'] += 1
+            yield record, image_bytes
+
+    def chain(ocr_future, llm_executor):
+        # Hand OCR output to the LLM threads as soon as it is ready
+        result_future = Future()
+
+        def on_parsed(parse_future):
+            result_future.set_result(_result(parse_future))
+
+        def on_ocr_done(done_future):
+            ocr_text, ocr_error = _result(done_future)
+            if ocr_error:
+                result_future.set_result((None, ocr_error))
+            elif packs is not None:
+                transaction_data = parse_fast_path(ocr_text)
+                if transaction_data is not None:
+                    result_future.set_result((transaction_data, None))
+                else:
+                    packs.add(ocr_text).add_done_callback(on_packed)
+            else:
+                try:
+                    llm_executor.submit(parse_receipt, client, ocr_text).add_done_callback(on_parsed)
+                except Exception as e:  # executor shut down
+                    result_future.set_exception(e)
+            if packs is not None:
+                ocr_finished()
+
+        def on_packed(pack_future):
+            transaction_data, error = _result(pack_future)
+            if transaction_data is not None:
+                transaction_data['parse_method'] = 'llm'
+            result_future.set_result((transaction_data, error))
+
+        ocr_future.add_done_callback(on_ocr_done)
+        return result_future
+
+    # Receipts still in OCR; when none are left, a partial pack can't fill
+    # up any further and is sent as is (otherwise ordered writes could wait on it forever)
+    ocr_running = 0
+    ocr_lock = threading.Lock()
+
+    def ocr_started():
+        nonlocal ocr_running
+        with ocr_lock:
+            ocr_running += 1
+
+    def ocr_finished():
+        nonlocal ocr_running
+        with ocr_lock:
+            ocr_running -= 1
+            idle = ocr_running == 0
+        if idle:
+            packs.flush()
+
+    def write(out, record, result):
+        transaction_data, error = result
+        duplicate_of = None
+        if error is None:
+            keys = duplicate_keys(transaction_data)
+            duplicate_of = next((seen[key] for key in keys if key in seen), None)
+            if duplicate_of is None:
+                try:
+                    transaction_log.append(transaction_data)
+                    for key in keys:
+                        seen[key] = record['source']
+                except Exception as e:
+                    error = f"Failed to save: {str(e)}"
+        record['status'] = 'error' if error else 'duplicate' if duplicate_of else 'ok'
+        record['error'] = error
+        record['transaction'] = transaction_data
+        if duplicate_of:
+            record['duplicate_of'] = duplicate_of
+        out.write(json.dumps(record) + '\n')
+        out.flush()
+
+        stats['failed' if error else 'duplicates' if duplicate_of else 'processed'] += 1
+        detail = error or (f"same transaction as {duplicate_of}" if duplicate_of else None)
+        if not detail and record.get('similar_to'):
+            detail = f"looks like {record['similar_to']}"
+        log(f"[{record['status']}] {record['source']}" + (f": {detail}" if detail else ""))
+
+    in_flight = deque()
+    # Room for a few packs per LLM thread, so packs can fill while earlier ones are parsed
+    max_in_flight = llm_concurrency * 4 * pack_size
+    transactions_file = resolve_transactions_file(transactions_file)
+
+    with ReceiptWorkerPool(workers) as pool, \
+            ThreadPoolExecutor(max_workers=llm_concurrency) as llm_executor, \
+            TransactionLog(transactions_file) as transaction_log, \
+            open(output, 'a') as out:
+        packs = PackQueue(client, llm_executor, pack_size) if pack_size > 1 else None
+        for record, image_bytes in pending_images():
+            if packs is not None:
+                ocr_started()
+            ocr_future = pool.submit(image_bytes, use_preprocessing, pipeline)
+            in_flight.append((record, chain(ocr_future, llm_executor)))
+
+            # Write finished results in input order; block if too far ahead
+            while in_flight and (in_flight[0][1].done() or len(in_flight) > max_in_flight):
+                record, future = in_flight.popleft()
+                write(out, record, _result(future))
+
+        while in_flight:
+            record, future = in_flight.popleft()
+            write(out, record, _result(future))
+
+    return stats
+
+def _result(future):
+    try:
+        return future.result()
+    except Exception as e:
+        return None, f"Pipeline Error: {str(e)}"
@@ -0,0 +1,419 @@
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from contextlib import ExitStack, nullcontext
+import threading
+import socket
+import sqlite3
+import json
+import time
+import uuid
+import os
+
+from extract_and_parse import parse_with_llm, describe_warmup
+from rule_parser import parse_receipt
+from save_to_json import save_to_json, DEFAULT_TRANSACTIONS_FILE
+from tracing import Trace, Profiler, activate
+from worker_pool import ReceiptWorkerPool
+from utils import init_groq
+
+DEFAULT_QUEUE_FILE = os.getenv('OCRECEIPT_QUEUE', 'jobs.db')
+
+# A running job whose worker stops heartbeating for this long is handed to another worker
+LEASE_SECONDS = 120
+
+# Claims per job before it is failed instead of retried (e.g. a worker crashing on it)
+MAX_ATTEMPTS = 3
+
+# Columns returned to callers (the image blob is only read by workers)
+JOB_FIELDS = ('id', 'group_id', 'name', 'status', 'stage', 'settings', 'result', 'error', 'attempts',
+              'worker', 'created_at', 'started_at', 'finished_at')
+
+class JobQueue:
+    """
+    Durable receipt job queue in a single SQLite file.
+
+    Jobs move queued → running → done/failed. Workers claim a job with a
+    lease that they extend at each stage; if a worker dies, the job is
+    claimed again once the lease expires (up to MAX_ATTEMPTS times).
+    Safe to share between threads and processes.
+
+    Args:
+        path: SQLite database file
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                group_id TEXT,
+                name TEXT,
+                status TEXT NOT NULL,
+                stage TEXT,
+                image BLOB,
+                settings TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_until REAL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+            CREATE INDEX IF NOT EXISTS idx_jobs_group ON jobs(group_id);
+        """)
+
+    def submit(self, image_bytes, name=None, settings=None, group_id=None):
+        """Queue one image. Returns the job id."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, group_id, name, status, stage, image, settings, created_at) "
+                "VALUES (?, ?, ?, 'queued', 'queued', ?, ?, ?)",
+                (job_id, group_id, name, image_bytes, json.dumps(settings or {}), time.time())
+            )
+        return job_id
+
+    def claim(self, worker_id, lease=LEASE_SECONDS):
+        """
+        Take the oldest queued job (or one whose lease expired).
+
+        Returns:
+            job: Job dict including `image` bytes, or None if there is no work
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Give up on jobs that keep losing their worker
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', stage = 'failed', finished_at = ?, "
+                    "error = 'Job abandoned after ' || attempts || ' attempts', image = NULL "
+                    "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                    (now, now, MAX_ATTEMPTS)
+                )
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', stage = 'claimed', worker = ?, lease_until = ?, "
+                    "attempts = attempts + 1, started_at = ? WHERE id = ?",
+                    (worker_id, now + lease, now, row['id'])
+                )
+                job = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (row['id'],)).fetchone()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self._to_dict(job, with_image=True)
+
+    def heartbeat(self, job_id, worker_id, stage=None, lease=LEASE_SECONDS):
+        """Extend the lease (and record the current stage). Returns False if the job was taken over."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_until = ?, stage = COALESCE(?, stage) "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time() + lease, stage, job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, result):
+        return self._finish(job_id, worker_id, 'done', result, result.get('error'))
+
+    def fail(self, job_id, worker_id, error):
+        return self._finish(job_id, worker_id, 'failed', None, error)
+
+    def _finish(self, job_id, worker_id, status, result, error):
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, result = ?, error = ?, finished_at = ?, image = NULL "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (status, status, json.dumps(result) if result is not None else None, error, time.time(),
+                 job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id):
+        """Job dict (without the image), or None for an unknown id."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def get_many(self, job_ids):
+        """Job dicts for `job_ids`, in the given order (unknown ids are skipped)."""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE id IN ({', '.join('?' * len(job_ids))})",
+                job_ids
+            ).fetchall()
+        jobs = {row['id']: self._to_dict(row) for row in rows}
+        return [jobs[job_id] for job_id in job_ids if job_id in jobs]
+
+    def get_group(self, group_id):
+        """Job dicts submitted together under `group_id`, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE group_id = ? ORDER BY created_at", (group_id,)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def counts(self):
+        """Number of jobs per status."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def purge(self, older_than=7 * 24 * 3600):
+        """Delete finished jobs older than `older_than` seconds. Returns the number removed."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (time.time() - older_than,)
+            )
+        return cursor.rowcount
+
+    @staticmethod
+    def _to_dict(row, with_image=False):
+        job = {field: row[field] for field in JOB_FIELDS}
+        job['settings'] = json.loads(job['settings']) if job['settings'] else {}
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        if with_image:
+            job['image'] = row['image']
+        return job
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def parse_and_save(ocr_text, settings, client=None, on_stage=None):
+    """
+    Second pipeline stage: parse OCR text and save the transaction.
+
+    Args:
+        ocr_text: Text returned by the OCR stage
+        settings: Job settings (use_fast_path, output_file, save)
+        client: Groq client (None limits parsing to the rule-based fast path)
+        on_stage: Optional callback invoked with each stage name ('parse'
+            when the rule fast path may answer, 'llm' when it is off, 'save')
+
+    Returns:
+        transaction: Transaction dict, or None
+        saved_path: File the transaction was appended to, or None
+        error: Error message if any
+    """
+    on_stage = on_stage or (lambda stage: None)
+    use_fast_path = settings.get('use_fast_path', True)
+
+    on_stage('parse' if use_fast_path else 'llm')
+    if client is None and not use_fast_path:
+        return None, None, "Failed to initialize Groq client"
+    if use_fast_path:
+        transaction, error = parse_receipt(client, ocr_text)
+    else:
+        transaction, error = parse_with_llm(client, ocr_text)
+    if transaction is None:
+        return None, None, error
+
+    if not settings.get('save', True):
+        return transaction, None, None
+
+    on_stage('save')
+    success, message = save_to_json(transaction, settings.get('output_file', DEFAULT_TRANSACTIONS_FILE))
+    if not success:
+        return transaction, None, f"Failed to save: {message}"
+    return transaction, message, None
+
+def submit_receipt(pool, llm_executor, image_bytes, settings, client=None, name=None, on_stage=None):
+    """
+    Run one receipt through both pipeline stages without blocking on either.
+
+    OCR goes to `pool`; as soon as it finishes, parse/save runs on
+    `llm_executor`, so OCR of the next receipt overlaps this one's LLM call.
+
+    Args:
+        pool: ReceiptWorkerPool for the OCR stage (submission blocks while it is saturated)
+        llm_executor: Executor for the parse/save stage
+        image_bytes: Raw image bytes
+        settings: Job settings (use_preprocessing, pipeline, profile, use_fast_path, output_file, save)
+        client: Groq client
+        name: Receipt name for the trace
+        on_stage: Optional callback invoked with each stage name
+
+    Returns:
+        future: Resolves to the result dict (ocr_text, transaction,
+            saved_path, error, use_preprocessing, trace, profile)
+    """
+    on_stage = on_stage or (lambda stage: None)
+    receipt_trace = Trace(name)
+    done = Future()
+
+    def finish(ocr_future):
+        try:
+            ocr_text, ocr_error = ocr_future.result()
+        except Exception as e:
+            ocr_text, ocr_error = None, f"OCR Error: {str(e)}"
+        result = {'ocr_text': ocr_text, 'transaction': None, 'saved_path': None, 'error': ocr_error,
+                  'use_preprocessing': settings.get('use_preprocessing', True)}
+        profiler = Profiler(settings['profile']) if settings.get('profile') else nullcontext()
+        with activate(receipt_trace), profiler:
+            if not ocr_error:
+                result['transaction'], result['saved_path'], result['error'] = parse_and_save(
+                    ocr_text, settings, client, on_stage
+                )
+        if getattr(profiler, 'text', None):
+            receipt_trace.add_profile(profiler.text)
+        result['trace'] = receipt_trace.to_dict()
+        result['profile'] = '\n\n'.join(receipt_trace.profiles) or None
+        return result
+
+    def on_ocr_done(ocr_future):
+        try:
+            llm_executor.submit(finish, ocr_future).add_done_callback(on_finished)
+        except Exception as e:  # executor shut down
+            done.set_exception(e)
+
+    def on_finished(parse_future):
+        try:
+            done.set_result(parse_future.result())
+        except Exception as e:
+            done.set_exception(e)
+
+    on_stage('ocr')
+    with activate(receipt_trace):
+        ocr_future = pool.submit(image_bytes, settings.get('use_preprocessing', True),
+                                 settings.get('pipeline', 'default'), settings.get('profile'))
+    ocr_future.add_done_callback(on_ocr_done)
+    return done
+
+def run_worker(queue_path=DEFAULT_QUEUE_FILE, ocr_workers=None, llm_concurrency=4, poll_interval=0.5,
+               stop_event=None, torch_threads=1, log=print, pool=None, llm_executor=None):
+    """
+    Process jobs from the queue until `stop_event` is set (or forever).
+
+    Jobs flow through submit_receipt: OCR in a ReceiptWorkerPool (one warm
+    EasyOCR reader per process) and parse/save on a thread pool. Jobs are
+    only claimed while both stages have room, and their leases are renewed
+    while they are in flight.
+
+    Args:
+        queue_path: Job queue database
+        ocr_workers: OCR processes (defaults to CPU count)
+        llm_concurrency: Concurrent parse/LLM calls
+        stop_event: threading/multiprocessing Event that ends the loop
+        pool: Existing ReceiptWorkerPool to share (left open on exit)
+        llm_executor: Existing parse/save executor to share (left open on exit)
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    queue = JobQueue(queue_path)
+    client = init_groq()
+    in_flight = {}
+
+    def start(job):
+        # Resolves once the job is recorded in the queue, not just processed
+        finished = Future()
+        done = submit_receipt(
+            pool, llm_executor, job['image'], job['settings'], client, job['name'],
+            on_stage=lambda stage: queue.heartbeat(job['id'], worker_id, stage)
+        )
+
+        def on_done(future):
+            try:
+                result = future.result()
+                queue.complete(job['id'], worker_id, result)
+                log(f"[{'error' if result['error'] else 'done'}] {job['name'] or job['id']}")
+            except Exception as e:
+                queue.fail(job['id'], worker_id, f"Worker Error: {str(e)}")
+                log(f"[failed] {job['name'] or job['id']}: {e}")
+            finished.set_result(None)
+
+        done.add_done_callback(on_done)
+        return finished
+
+    with ExitStack() as stack:
+        if pool is None:
+            pool = stack.enter_context(ReceiptWorkerPool(ocr_workers, torch_threads=torch_threads))
+            # Warm every reader before claiming, so no job pays for model loading
+            for report in pool.start().values():
+                log(f"OCR worker ready: {describe_warmup(report)}")
+        if llm_executor is None:
+            llm_executor = stack.enter_context(ThreadPoolExecutor(max_workers=llm_concurrency))
+        stack.callback(queue.close)
+        try:
+            capacity = pool.max_pending + llm_concurrency
+            log(f"Worker {worker_id} ready ({pool.num_workers} OCR processes, {llm_concurrency} parse threads)")
+            last_heartbeat = time.monotonic()
+            while stop_event is None or not stop_event.is_set():
+                for job_id in [job_id for job_id, done in in_flight.items() if done.done()]:
+                    del in_flight[job_id]
+
+                # Renew the leases of everything still in flight
+                if time.monotonic() - last_heartbeat > LEASE_SECONDS / 3:
+                    for job_id in in_flight:
+                        queue.heartbeat(job_id, worker_id)
+                    last_heartbeat = time.monotonic()
+
+                job = queue.claim(worker_id) if len(in_flight) < capacity else None
+                if job is None:
+                    time.sleep(poll_interval)
+                    continue
+                in_flight[job['id']] = start(job)
+
+            # Let claimed jobs finish before the pools shut down
+            wait(list(in_flight.values()))
+        except KeyboardInterrupt:
+            # Interrupted jobs are picked up again once their leases expire
+            log(f"Worker {worker_id} stopping")
+
+def start_worker_thread(queue_path=DEFAULT_QUEUE_FILE, ocr_workers=None, llm_concurrency=4, log=print):
+    """
+    Run run_worker on a daemon thread (its OCR still runs in worker processes).
+
+    The OCR pool is warmed up before this returns, so a startup failure
+    reaches the caller instead of silently ending the thread.
+
+    Returns:
+        thread: The started thread
+        stop_event: Set it to stop claiming jobs and shut the pools down
+
+    Raises:
+        RuntimeError: If a worker could not load the OCR models
+    """
+    pool = ReceiptWorkerPool(ocr_workers)
+    try:
+        for report in pool.start().values():
+            log(f"OCR worker ready: {describe_warmup(report)}")
+    except BaseException:
+        pool.close(wait=False)
+        raise
+
+    stop_event = threading.Event()
+
+    def serve():
+        try:
+            run_worker(queue_path, llm_concurrency=llm_concurrency, stop_event=stop_event, log=log, pool=pool)
+        finally:
+            pool.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    return thread, stop_event
@@ -1,19 +1,78 @@
 import streamlit as st
 import json
+import time
+import uuid
 import os
 
-from utils import init_groq
-from save_to_json import save_to_json
-from extract_and_parse import extract_text_easyocr, extract_text_easyocr_with_debug, parse_with_llm
-from preprocess import convert_cv_to_pil
+from save_to_json import resolve_transactions_file
+from transaction_store import TransactionStore, default_store_path
+from preprocess import decode_image, preprocess_array, convert_cv_to_pil, load_pipelines
+from job_queue import JobQueue, start_worker_thread
+from cache import hash_key
+from tracing import metrics_json, metrics_prometheus
+
+# Jobs remembered per browser session
+MAX_SESSION_RESULTS = 200
+
+# OCR processes of the worker the app runs itself; set to 0 when running `ocreceipt worker` separately
+UI_WORKERS = int(os.getenv('OCRECEIPT_UI_WORKERS', '2'))
+UI_LLM_CONCURRENCY = int(os.getenv('OCRECEIPT_UI_LLM_CONCURRENCY', '4'))
+
+# Uploaded images previewed when many files are selected
+MAX_PREVIEWS = 12
+
+# Seconds between job status checks while a receipt is processing
+JOB_POLL_INTERVAL = 1.0
+
+JOB_STAGE_LABELS = {
+    'queued': "Waiting for a worker...",
+    'claimed': "Starting...",
+    'ocr': "Step 1/2: Extracting text with OCR...",
+    'parse': "Step 2/2: Parsing (known layouts locally, others with LLM)...",
+    'llm': "Step 2/2: Parsing with LLM (Structured Output)...",
+    'save': "Saving..."
+}
+
+# Process-wide resources, shared by every session and rerun
+@st.cache_resource
+def load_queue():
+    return JobQueue()
+
+@st.cache_resource(show_spinner="Starting workers...")
+def ensure_workers(count):
+    """The app's own queue worker; `error` says why it isn't running (e.g. missing OCR models)."""
+    if not count:
+        return {'error': None}
+    try:
+        thread, stop_event = start_worker_thread(load_queue().path, ocr_workers=count,
+                                                 llm_concurrency=UI_LLM_CONCURRENCY)
+    except RuntimeError as e:
+        return {'error': str(e)}
+    return {'thread': thread, 'stop_event': stop_event, 'error': None}
+
+@st.cache_resource
+def load_store(path):
+    return TransactionStore(path)
+
+@st.cache_data
+def pipeline_names():
+    return list(load_pipelines())
 
 # Streamlit UI
 def main():
     st.set_page_config(page_title="Payment Receipt OCR", page_icon="💳", layout="wide")
+    workers = ensure_workers(UI_WORKERS)
     
     st.title("💳 OCReceipt : Payment Receipt OCR + LLM Parser")
     st.markdown("Upload payment screenshots → Preprocess with CV2 → Extract text with OCR → Parse with AI")
     
+    if workers['error']:
+        # Queued receipts would otherwise wait forever with no explanation
+        st.error(f"❌ Receipt worker failed to start: {workers['error']}")
+        if st.button("🔄 Retry"):
+            ensure_workers.clear()
+            st.rerun()
+    
     with st.sidebar:
         st.header("⚙️ Settings")
         
@@ -24,12 +83,40 @@ def main():
             help="Apply CV2 preprocessing for better OCR accuracy"
         )
         
+        pipeline = st.selectbox(
+            "Preprocessing Pipeline",
+            options=pipeline_names(),
+            disabled=not use_preprocessing,
+            help="Named stage list from pipelines.json"
+        )
+        
         show_preprocessing_steps = st.checkbox(
             "Show Preprocessing Steps",
             value=False,
             help="Visualize intermediate preprocessing steps"
         )
         
+        use_fast_path = st.checkbox(
+            "Enable Rule-Based Fast Path",
+            value=True,
+            help="Parse known EasyPaisa/JazzCash layouts locally and only call the LLM for other receipts"
+        )
+        
+        show_timings = st.checkbox(
+            "Show Stage Timings",
+            value=False,
+            help="Time decode, preprocessing, OCR, parsing and saving for each receipt"
+        )
+        
+        profile_choice = st.selectbox(
+            "Profiler",
+            ["Off", "cProfile", "pyinstrument"],
+            help="Profile the whole extraction (pyinstrument falls back to cProfile if not installed)"
+        )
+        profile_kind = None if profile_choice == "Off" else profile_choice.lower()
+        
+        render_metrics()
+        
         st.markdown("---")
         
         st.markdown("### 📋 Supported Apps")
@@ -42,7 +129,8 @@ def main():
         """)
         
         st.markdown("---")
-        output_file = st.text_input("Output JSON filename", value="transactions.json")
+        output_file = st.text_input("Output JSONL filename", value="transactions.jsonl")
+        output_file = resolve_transactions_file(output_file)
         
         st.markdown("---")
         st.markdown("### 💡 How it works")
@@ -62,132 +150,316 @@ def main():
     col1, col2 = st.columns([1, 1])
     
     with col1:
-        st.subheader("📤 Upload Screenshot")
-        uploaded_file = st.file_uploader(
-            "Choose a payment receipt screenshot",
+        st.subheader("📤 Upload Screenshots")
+        uploaded_files = st.file_uploader(
+            "Choose payment receipt screenshots",
             type=['png', 'jpg', 'jpeg'],
-            help="Upload a clear screenshot of your payment receipt"
+            accept_multiple_files=True,
+            help="Upload clear screenshots of your payment receipts; several are processed in parallel"
         )
         
-        if uploaded_file:
-            st.image(uploaded_file, caption="Original Screenshot", width='stretch')
+        if len(uploaded_files) == 1:
+            st.image(uploaded_files[0], caption="Original Screenshot", width='stretch')
+        elif uploaded_files:
+            st.image(uploaded_files[:MAX_PREVIEWS], caption=[f.name for f in uploaded_files[:MAX_PREVIEWS]], width=160)
+            if len(uploaded_files) > MAX_PREVIEWS:
+                st.caption(f"... and {len(uploaded_files) - MAX_PREVIEWS} more")
     
     with col2:
         st.subheader("📊 Processing Results")
         
-        if uploaded_file:
-            if st.button("🔍 Extract & Parse", type="primary", width='stretch'):
-                image_bytes = uploaded_file.read()
-                
-                # Show preprocessing steps if enabled
-                if use_preprocessing and show_preprocessing_steps:
-                    with st.spinner("Preprocessing image..."):
-                        _, steps, error = extract_text_easyocr_with_debug(image_bytes)
-                        
-                        if steps and not error:
-                            st.success("✅ Preprocessing complete")
-                            
-                            # Display preprocessing steps
-                            with st.expander("🔬 Preprocessing Steps", expanded=True):
-                                step_names = list(steps.keys())
-                                cols = st.columns(2)
-                                
-                                for idx, step_name in enumerate(step_names):
-                                    col_idx = idx % 2
-                                    with cols[col_idx]:
-                                        st.caption(step_name.replace('_', ' ').title())
-                                        st.image(
-                                            convert_cv_to_pil(steps[step_name]), 
-                                            width='stretch'
-                                        )
-                
-                # Step 1: OCR
-                with st.spinner("Step 1/2: Extracting text with OCR..."):
-                    ocr_text, ocr_error = extract_text_easyocr(image_bytes, use_preprocessing=use_preprocessing)
-                    
-                    if ocr_error:
-                        st.error(f"❌ {ocr_error}")
-                        st.stop()
-                    
-                    st.success(f"✅ Text extracted with {'preprocessed' if use_preprocessing else 'raw'} OCR")
-                    
-                    # Show extracted text in expander
-                    with st.expander("📝 View Raw OCR Text"):
-                        st.text_area("Extracted Text", ocr_text, height=200, key="ocr_text")
-                
-                # Step 2: LLM Parsing
-                with st.spinner("Step 2/2: Parsing with LLM (Structured Output)..."):
-                    client = init_groq()
-                    if client:
-                        transaction_data, parse_error = parse_with_llm(client, ocr_text)
-                        
-                        if parse_error:
-                            st.error(f"❌ {parse_error}")
-                        else:
-                            st.success("✅ Details parsed & validated with Pydantic!")
-                            
-                            # Display extracted data
-                            st.json(transaction_data)
-                            
-                            # Save to JSON
-                            success, message = save_to_json(transaction_data, output_file)
-                            if success:
-                                st.success(f"💾 Saved to {message}")
-                                
-                                # Download button
-                                with open(output_file, 'r') as f:
-                                    st.download_button(
-                                        label="⬇️ Download JSON File",
-                                        data=f.read(),
-                                        file_name=output_file,
-                                        mime="application/json",
-                                        width='stretch'
-                                    )
-                            else:
-                                st.error(f"Failed to save: {message}")
-                    else:
-                        st.error("Failed to initialize Groq client")
+        if uploaded_files:
+            uploads = [(f.name, f.getvalue()) for f in uploaded_files]
+            settings = {
+                'use_preprocessing': use_preprocessing,
+                'pipeline': pipeline,
+                'use_fast_path': use_fast_path,
+                'output_file': output_file
+            }
+            
+            # Jobs are remembered per upload and settings, so widget reruns
+            # (and pressing the button again) show the same jobs instead of
+            # queueing the receipts again; failed jobs can be retried
+            jobs = st.session_state.setdefault('jobs', {})
+            result_keys = [hash_key(image_bytes, settings) for _, image_bytes in uploads]
+            
+            label = "🔍 Extract & Parse" if len(uploads) == 1 else f"🔍 Extract & Parse {len(uploads)} Receipts"
+            if st.button(label, type="primary", width='stretch'):
+                queue = load_queue()
+                group_id = uuid.uuid4().hex
+                known = {job['id']: job for job in queue.get_many(jobs[key] for key in result_keys if key in jobs)}
+                for (name, image_bytes), key in zip(uploads, result_keys):
+                    job = known.get(jobs.get(key))
+                    if job is None or job_failed(job):
+                        jobs[key] = queue.submit(image_bytes, name, {**settings, 'profile': profile_kind}, group_id)
+                while len(jobs) > MAX_SESSION_RESULTS:
+                    jobs.pop(next(iter(jobs)))
+                # Keep the jobs in the URL so a reload can pick them up again
+                st.query_params['job'] = [jobs[key] for key in result_keys]
+            
+            job_ids = [jobs[key] for key in result_keys if key in jobs]
+            
+            # Show preprocessing steps if enabled
+            if use_preprocessing and show_preprocessing_steps and job_ids:
+                names = [name for name, _ in uploads]
+                selected = st.selectbox("Preprocessing steps for", names) if len(names) > 1 else names[0]
+                render_preprocessing_steps(uploads[names.index(selected)][1], pipeline)
+            
+            render_jobs(job_ids, show_timings or profile_kind)
+        elif st.query_params.get_all('job'):
+            # The uploads are gone after a reload, but the jobs aren't
+            render_jobs(st.query_params.get_all('job'), show_timings or profile_kind)
         else:
-            st.info("👆 Upload a screenshot to begin extraction")
+            st.info("👆 Upload screenshots to begin extraction")
     
     # Show existing transactions
     if os.path.exists(output_file):
         st.markdown("---")
         st.subheader("📜 Transaction History")
+        render_history(output_file)
+
+
+def job_failed(job):
+    return job['status'] == 'failed' or (job['status'] == 'done' and job['result']['error'] is not None)
+
+
+def render_jobs(job_ids, show_timings=False):
+    """Show progress while any job is pending, then the results."""
+    jobs = load_queue().get_many(job_ids)
+    if not jobs:
+        if job_ids:
+            st.warning("Jobs not found")
+        return
+    if any(job['status'] in ('queued', 'running') for job in jobs):
+        render_jobs_progress([job['id'] for job in jobs])
+        return
+    
+    if len(jobs) > 1:
+        render_jobs_table(jobs)
+        names = [f"{idx}. {job['name']}" for idx, job in enumerate(jobs, 1)]
+        job = jobs[names.index(st.selectbox("Receipt details", names))]
+    else:
+        job = jobs[0]
+    
+    if job['status'] == 'failed':
+        st.error(f"❌ {job['error']}")
+    else:
+        render_result(job['result'], show_timings)
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def render_jobs_progress(job_ids):
+    """Poll the queue without rerunning the whole page; rerun once every job finishes."""
+    jobs = load_queue().get_many(job_ids)
+    pending = sum(job['status'] in ('queued', 'running') for job in jobs)
+    if not pending:
+        st.rerun()
+    
+    if len(jobs) == 1:
+        st.info(f"⏳ {JOB_STAGE_LABELS.get(jobs[0]['stage'], jobs[0]['stage'])}")
+        return
+    st.progress((len(jobs) - pending) / len(jobs), text=f"{len(jobs) - pending}/{len(jobs)} receipts processed")
+    render_jobs_table(jobs)
+
+
+def render_jobs_table(jobs):
+    """One row per receipt: stage while pending, key fields once done."""
+    rows = []
+    for job in jobs:
+        result = job['result'] or {}
+        transaction = result.get('transaction') or {}
+        finished = job['finished_at'] or time.time()
+        rows.append({
+            "Receipt": job['name'],
+            "Status": JOB_STAGE_LABELS.get(job['stage'], job['stage']) if job['status'] in ('queued', 'running')
+                      else ('error' if job_failed(job) else 'done'),
+            "Amount": f"{transaction.get('currency') or ''} {transaction.get('amount') or ''}".strip(),
+            "Method": transaction.get('payment_method'),
+            "Seconds": round(finished - job['created_at'], 1),
+            "Error": job['error'] or result.get('error')
+        })
+    st.dataframe(rows, width='stretch')
+
+
+def render_result(result, show_timings=False):
+    """Draw a finished job's result (the dict job_queue.submit_receipt resolves to)."""
+    if result['ocr_text'] is None:
+        st.error(f"❌ {result['error']}")
+        return
+    
+    st.success(f"✅ Text extracted with {'preprocessed' if result['use_preprocessing'] else 'raw'} OCR")
+    
+    # Show extracted text in expander
+    with st.expander("📝 View Raw OCR Text"):
+        st.text_area("Extracted Text", result['ocr_text'], height=200, key="ocr_text")
+    
+    if result['transaction'] is None:
+        st.error(f"❌ {result['error']}")
+    else:
+        method = "rule-based fast path" if result['transaction'].get('parse_method') == 'rules' else "LLM"
+        st.success(f"✅ Details parsed with the {method} & validated with Pydantic!")
         
-        with open(output_file, 'r') as f:
-            transactions = json.load(f)
+        # Display extracted data
+        st.json(result['transaction'])
         
-        if transactions:
-            st.write(f"Total transactions: {len(transactions)}")
-            
-            # Display summary table
-            summary_data = []
-            for txn in transactions:
-                summary_data.append({
-                    "Status": txn.get('transaction_status', 'N/A'),
-                    "Amount": f"{txn.get('currency', '')} {txn.get('amount', 'N/A')}",
-                    "From": txn.get('sender_name', 'N/A'),
-                    "To": txn.get('recipient_name', 'N/A'),
-                    "Date": txn.get('transaction_date', 'N/A'),
-                    "Method": txn.get('payment_method', 'N/A')
-                })
+        if result['saved_path']:
+            st.success(f"💾 Saved to {result['saved_path']}")
             
-            st.dataframe(summary_data, width='stretch')
-            
-            # Display in expandable sections
-            st.markdown("### Detailed View")
-            for idx, txn in enumerate(reversed(transactions), 1):
-                with st.expander(f"Transaction #{len(transactions) - idx + 1} - {txn.get('amount', 'N/A')} {txn.get('currency', '')}"):
-                    col_a, col_b = st.columns(2)
-                    with col_a:
-                        st.json({k: v for k, v in txn.items() if k != 'raw_ocr_text'})
-                    with col_b:
-                        if 'raw_ocr_text' in txn:
-                            st.text_area("Raw OCR Text", txn['raw_ocr_text'], height=300, key=f"history_ocr_{idx}")
+            # Download button
+            with open(result['saved_path'], 'r') as f:
+                st.download_button(
+                    label="⬇️ Download JSONL File",
+                    data=f.read(),
+                    file_name=os.path.basename(result['saved_path']),
+                    mime="application/x-ndjson",
+                    width='stretch'
+                )
         else:
-            st.info("No transactions saved yet")
+            st.error(result['error'])
+    
+    if show_timings:
+        render_timings(result['trace'], result['profile'])
 
 
+def render_preprocessing_steps(image_bytes, pipeline):
+    """Show intermediate preprocessing images; only the latest upload's steps are kept."""
+    steps_key = hash_key(image_bytes, pipeline)
+    cached = st.session_state.get('preprocessing_steps')
+    if cached is None or cached[0] != steps_key:
+        try:
+            _, steps = preprocess_array(decode_image(image_bytes), debug=True, pipeline=pipeline)
+        except ValueError as e:
+            st.error(f"❌ Preprocessing Error: {str(e)}")
+            return
+        cached = st.session_state['preprocessing_steps'] = (steps_key, steps)
+    steps = cached[1]
+    
+    st.success("✅ Preprocessing complete")
+    
+    # Display preprocessing steps
+    with st.expander("🔬 Preprocessing Steps", expanded=True):
+        step_names = list(steps.keys())
+        cols = st.columns(2)
+        
+        for idx, step_name in enumerate(step_names):
+            col_idx = idx % 2
+            with cols[col_idx]:
+                st.caption(step_name.replace('_', ' ').title())
+                st.image(
+                    convert_cv_to_pil(steps[step_name]), 
+                    width='stretch'
+                )
+
+
+def render_timings(receipt_trace, profile_text=None):
+    """Show where time went for a receipt (a Trace.to_dict() recorded by the worker)."""
+    with st.expander("⏱️ Stage Timings", expanded=True):
+        st.dataframe(
+            [{"Stage": stage, "ms": round(seconds * 1000, 1)} for stage, seconds in receipt_trace['stages'].items()],
+            width='stretch'
+        )
+        st.caption(f"Total: {receipt_trace['total'] * 1000:.0f} ms")
+        
+        if profile_text:
+            st.code(profile_text)
+        
+        st.download_button("⬇️ Stage Timings (JSON)", json.dumps(receipt_trace, indent=2),
+                           file_name="timings.json", mime="application/json", width='stretch')
+
+
+def render_metrics():
+    """Downloads of the stage timings aggregated over every receipt this app's worker has processed."""
+    with st.expander("📈 Stage Metrics"):
+        if not UI_WORKERS:
+            st.caption("Receipts run in a separate `ocreceipt worker`; use its --metrics option")
+            return
+        st.download_button("⬇️ Metrics (JSON)", metrics_json(),
+                           file_name="metrics.json", mime="application/json", width='stretch')
+        st.download_button("⬇️ Metrics (Prometheus)", metrics_prometheus(),
+                           file_name="metrics.prom", mime="text/plain", width='stretch')
+
+
+def reset_history_page():
+    # Changing the filters or page size starts again from the first page
+    st.session_state.history_page = 1
+
+
+def render_history(output_file):
+    """Render one filtered page of transaction history; only that page is queried and drawn."""
+    # Index any newly appended records, then query the SQLite store
+    store = load_store(default_store_path(output_file))
+    store.sync_from_jsonl(output_file)
+    
+    if not store.count():
+        st.info("No transactions saved yet")
+        return
+    
+    # Filters
+    filter_cols = st.columns([2, 1, 1, 1])
+    with filter_cols[0]:
+        search = st.text_input("Search", placeholder="Name or transaction ID", key="history_search",
+                               on_change=reset_history_page)
+    with filter_cols[1]:
+        payment_method = st.selectbox(
+            "Method", ["All"] + store.distinct_values('payment_method'), key="history_method",
+            on_change=reset_history_page
+        )
+    with filter_cols[2]:
+        status = st.selectbox(
+            "Status", ["All"] + store.distinct_values('transaction_status'), key="history_status",
+            on_change=reset_history_page
+        )
+    with filter_cols[3]:
+        page_size = st.selectbox("Per page", [10, 25, 50, 100], index=1, key="history_page_size",
+                                 on_change=reset_history_page)
+    
+    filters = {
+        'search': search.strip() or None,
+        'payment_method': None if payment_method == "All" else payment_method,
+        'transaction_status': None if status == "All" else status
+    }
+    
+    total = store.count(**filters)
+    st.write(f"Total transactions: {total}")
+    if not total:
+        st.info("No transactions match the filters")
+        return
+    
+    num_pages = (total + page_size - 1) // page_size
+    # The log can also shrink between reruns (e.g. compaction)
+    if st.session_state.get('history_page', 1) > num_pages:
+        st.session_state.history_page = num_pages
+    page = st.number_input(f"Page (of {num_pages})", min_value=1, max_value=num_pages, key="history_page")
+    
+    # Newest first
+    transactions = store.page(limit=page_size, offset=(page - 1) * page_size, **filters)
+    
+    # Display summary table
+    summary_data = []
+    for txn in transactions:
+        summary_data.append({
+            "#": txn['id'],
+            "Status": txn.get('transaction_status', 'N/A'),
+            "Amount": f"{txn.get('currency', '')} {txn.get('amount', 'N/A')}",
+            "From": txn.get('sender_name', 'N/A'),
+            "To": txn.get('recipient_name', 'N/A'),
+            "Date": txn.get('transaction_date', 'N/A'),
+            "Method": txn.get('payment_method', 'N/A')
+        })
+    
+    st.dataframe(summary_data, width='stretch')
+    
+    # Display in expandable sections
+    st.markdown("### Detailed View")
+    for txn in transactions:
+        idx = txn['id']
+        with st.expander(f"Transaction #{idx} - {txn.get('amount', 'N/A')} {txn.get('currency', '')}"):
+            col_a, col_b = st.columns(2)
+            with col_a:
+                st.json({k: v for k, v in txn.items() if k not in ('id', 'raw_ocr_text')})
+            with col_b:
+                if 'raw_ocr_text' in txn:
+                    st.text_area("Raw OCR Text", txn['raw_ocr_text'], height=300, key=f"history_ocr_{idx}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,237 @@
+from concurrent.futures import Future
+import threading
+import json
+
+from cache import get_llm_cache, cache_get, cache_set, hash_key
+from extract_and_parse import (
+    LLM_MODEL,
+    SYSTEM_PROMPT,
+    FIELD_INSTRUCTIONS,
+    validate_transaction,
+    add_metadata,
+    normalize_ocr_text,
+    parse_with_llm
+)
+
+# Output budget per receipt in a packed request
+TOKENS_PER_RECEIPT = 512
+MAX_COMPLETION_TOKENS = 8192
+
+# Bump when the packed prompt changes in a way that affects results
+PACKED_PROMPT_VERSION = 1
+
+def packed_cache_key(ocr_text, model=LLM_MODEL):
+    """
+    LLM cache key for a parse made by the packed prompt. Kept apart from
+    llm_cache_key, so single-receipt and packed results never stand in for
+    each other.
+    """
+    return hash_key(normalize_ocr_text(ocr_text),
+                    {'model': model, 'prompt': 'packed', 'prompt_version': PACKED_PROMPT_VERSION})
+
+def build_packed_prompt(ocr_texts):
+    """Create one prompt asking for a JSON array with a transaction per OCR text."""
+    receipts = '\n\n'.join(
+        f"# RECEIPT {idx}:\n# {ocr_text}" for idx, ocr_text in enumerate(ocr_texts, 1)
+    )
+    return f"""You are a transaction receipt parser. Below are {len(ocr_texts)} raw texts, each extracted from a different payment receipt screenshot using OCR.
+
+{receipts}
+
+# Analyze each receipt independently and extract its transaction information in a structured JSON format.
+
+{FIELD_INSTRUCTIONS}
+
+# Return ONLY a valid JSON object of the form {{"transactions": [...]}} containing exactly {len(ocr_texts)} objects, in receipt order. Each object must have a "receipt" field with its receipt number plus the fields above. Do not include any explanation or markdown formatting."""
+
+def build_packed_request(ocr_texts):
+    """Keyword arguments for a chat completion parsing several receipts at once."""
+    return {
+        'model': LLM_MODEL,
+        'messages': [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": build_packed_prompt(ocr_texts)
+            }
+        ],
+        'temperature': 0,
+        'max_tokens': min(MAX_COMPLETION_TOKENS, TOKENS_PER_RECEIPT * len(ocr_texts)),
+        'response_format': {"type": "json_object"}
+    }
+
+def _receipt_number(item):
+    try:
+        return int(item['receipt'])
+    except (TypeError, KeyError, ValueError):
+        return None
+
+def split_packed_response(content, count):
+    """
+    Match a packed reply's transactions to the `count` receipts sent.
+
+    Receipt numbers are trusted only when they are exactly 1..count; a
+    model that counts from 0 or skips one would otherwise hand each
+    receipt its neighbour's fields. Otherwise a reply with exactly `count`
+    transactions is matched by position.
+
+    Returns:
+        items: List of validated dicts or None (per input) when the response
+            was usable, or None if the whole response must be retried
+    """
+    try:
+        transactions = json.loads(content)['transactions']
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return None
+    if not isinstance(transactions, list):
+        return None
+
+    numbers = [_receipt_number(item) for item in transactions]
+    if sorted(number or 0 for number in numbers) == list(range(1, count + 1)):
+        by_receipt = dict(zip(numbers, transactions))
+    elif len(transactions) == count:
+        by_receipt = dict(enumerate(transactions, 1))
+    else:
+        return None
+
+    items = []
+    for idx in range(1, count + 1):
+        try:
+            item = {key: value for key, value in by_receipt[idx].items() if key != 'receipt'}
+            items.append(validate_transaction(item))
+        except Exception:
+            items.append(None)
+    return items
+
+def _request_pack(client, ocr_texts):
+    """Send one packed request; returns split_packed_response's items (or None)."""
+    completion = client.chat.completions.create(**build_packed_request(ocr_texts))
+    return split_packed_response(completion.choices[0].message.content, len(ocr_texts))
+
+def _parse_pack(client, ocr_texts, use_cache):
+    """Parse a pack, re-splitting it in halves on failure down to single receipts."""
+    if len(ocr_texts) == 1:
+        return [parse_with_llm(client, ocr_texts[0], use_cache=use_cache)]
+
+    try:
+        items = _request_pack(client, ocr_texts)
+    except Exception:
+        items = None
+
+    # Unusable response (or nothing in it validated): split the pack in two
+    if items is None or all(item is None for item in items):
+        middle = len(ocr_texts) // 2
+        return (_parse_pack(client, ocr_texts[:middle], use_cache)
+                + _parse_pack(client, ocr_texts[middle:], use_cache))
+
+    results = [None] * len(ocr_texts)
+    failed = []
+    for idx, (ocr_text, validated_data) in enumerate(zip(ocr_texts, items)):
+        if validated_data is None:
+            failed.append(idx)
+            continue
+        if use_cache:
+            cache_set(get_llm_cache, packed_cache_key(ocr_text), validated_data)
+        results[idx] = (add_metadata(validated_data, ocr_text), None)
+
+    # Retry only the items that failed validation, as a smaller pack
+    if failed:
+        retried = _parse_pack(client, [ocr_texts[idx] for idx in failed], use_cache)
+        for idx, result in zip(failed, retried):
+            results[idx] = result
+    return results
+
+def parse_packed(client, ocr_texts, pack_size=10, use_cache=True):
+    """
+    Parse many OCR texts with K receipts per LLM request.
+
+    The system prompt and field list are sent once per pack instead of once
+    per receipt. Items that come back missing or invalid are retried in
+    smaller packs, ending with single-receipt parse_with_llm calls.
+
+    Used by `ocreceipt ingest --pack-size` for the receipts the rule fast
+    path can't parse.
+
+    Args:
+        client: Groq client
+        ocr_texts: List of OCR texts
+        pack_size: Receipts per request (K)
+        use_cache: Whether to consult/fill the LLM parse cache
+
+    Returns:
+        results: List of (transaction_data, error) tuples in input order
+    """
+    results = [None] * len(ocr_texts)
+    pending = []
+    for idx, ocr_text in enumerate(ocr_texts):
+        cached_data = cache_get(get_llm_cache, packed_cache_key(ocr_text)) if use_cache else None
+        if cached_data is not None:
+            results[idx] = (add_metadata(cached_data, ocr_text), None)
+        else:
+            pending.append(idx)
+
+    for start in range(0, len(pending), pack_size):
+        indices = pending[start:start + pack_size]
+        packed_results = _parse_pack(client, [ocr_texts[idx] for idx in indices], use_cache)
+        for idx, result in zip(indices, packed_results):
+            results[idx] = result
+    return results
+
+class PackQueue:
+    """
+    Groups receipts arriving one at a time into packs for parse_packed,
+    run on `executor`. A pack is sent once it holds `pack_size` receipts
+    or when flush() is called (e.g. when nothing else is coming soon).
+
+    Args:
+        client: Groq client
+        executor: Executor the packed requests run on
+        pack_size: Receipts per request (K)
+        use_cache: Whether to consult/fill the LLM parse cache
+    """
+
+    def __init__(self, client, executor, pack_size=10, use_cache=True):
+        self.client = client
+        self.executor = executor
+        self.pack_size = pack_size
+        self.use_cache = use_cache
+        self._lock = threading.Lock()
+        self._pending = []
+
+    def add(self, ocr_text):
+        """Queue one OCR text; returns a Future of its (transaction_data, error)."""
+        future = Future()
+        with self._lock:
+            self._pending.append((ocr_text, future))
+            full = len(self._pending) >= self.pack_size
+        if full:
+            self.flush()
+        return future
+
+    def flush(self):
+        """Send whatever is waiting, even if the pack isn't full."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        def on_parsed(parse_future):
+            try:
+                results = parse_future.result()
+            except Exception as e:
+                results = [(None, f"Error parsing with LLM: {str(e)}")] * len(pending)
+            for (_, future), result in zip(pending, results):
+                future.set_result(result)
+
+        try:
+            parse_future = self.executor.submit(
+                parse_packed, self.client, [ocr_text for ocr_text, _ in pending], self.pack_size, self.use_cache
+            )
+        except Exception as e:  # executor shut down
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        parse_future.add_done_callback(on_parsed)
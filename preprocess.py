@@ -1,11 +1,30 @@
 from PIL import Image
+import threading
+import json
+import time
+import sys
+import os
 import numpy as np
 import cv2
 
-def analyze_image_quality(image):
+import tracing
+
+# Histogram statistics are computed on a strided view of roughly this many pixels
+QUALITY_SAMPLE_PIXELS = 250_000
+
+_LEVELS = np.arange(256, dtype=np.float64)
+
+def analyze_image_quality(image, laplacian_dst=None):
     """
     Analyze image to determine which preprocessing steps are needed.
     Returns a dict with quality metrics.
+    
+    Brightness, contrast and the distinct-level count all come from one
+    256-bin histogram of a strided sample instead of separate
+    full-resolution passes and a sort. Only the sample (about
+    QUALITY_SAMPLE_PIXELS pixels) is copied, not the full image. The Laplacian stays at full
+    resolution, since subsampling would shift the noise estimate, but is
+    computed in int16 rather than float64 (into `laplacian_dst` if given).
     """
     # Convert to grayscale for analysis
     if len(image.shape) == 3:
@@ -13,15 +32,21 @@ def analyze_image_quality(image):
     else:
         gray = image
     
+    # Histogram of a strided sample (ravel copies it out of the view)
+    step = max(1, int(np.sqrt(gray.size / QUALITY_SAMPLE_PIXELS)))
+    hist = np.bincount(gray[::step, ::step].ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    
     # Calculate metrics
-    brightness = np.mean(gray)
-    contrast = np.std(gray)
+    brightness = (hist @ _LEVELS) / total
+    contrast = np.sqrt(max(0.0, (hist @ (_LEVELS * _LEVELS)) / total - brightness * brightness))
     
     # Estimate noise level using Laplacian variance
-    laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+    _, laplacian_std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_16S, dst=laplacian_dst))
+    laplacian_var = float(laplacian_std[0, 0]) ** 2
     
     # Check if image is already binary/high contrast
-    unique_vals = len(np.unique(gray))
+    unique_vals = int(np.count_nonzero(hist))
     is_binary = unique_vals < 20
     
     return {
@@ -32,6 +57,69 @@ def analyze_image_quality(image):
         'needs_enhancement': contrast < 50 or brightness < 80 or brightness > 180
     }
 
+def decode_image(image_bytes):
+    """Decode image bytes into a BGR numpy array."""
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image")
+    return image
+
+# Glyph height (px) EasyOCR's CRAFT detector handles reliably at its default settings
+TARGET_TEXT_HEIGHT = 24
+
+def estimate_text_height(image, analysis_side=1024):
+    """
+    Estimate the typical glyph height in pixels from connected components.
+
+    Components are measured on a copy whose longest side is at most
+    `analysis_side` and the median is mapped back to full resolution.
+    Returns None when no glyph-like components are found.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+    h, w = gray.shape[:2]
+    factor = min(1.0, analysis_side / max(h, w))
+    if factor < 1:
+        gray = cv2.resize(gray, (max(1, round(w * factor)), max(1, round(h * factor))), interpolation=cv2.INTER_AREA)
+
+    # Strokes are the minority class, whether dark-on-light or light-on-dark
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if np.count_nonzero(binary) > binary.size / 2:
+        binary = cv2.bitwise_not(binary)
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    comp_w = stats[1:, cv2.CC_STAT_WIDTH]
+    comp_h = stats[1:, cv2.CC_STAT_HEIGHT]
+    area = stats[1:, cv2.CC_STAT_AREA]
+
+    # Keep glyph-like blobs: not specks, not lines/boxes, reasonably filled
+    glyphs = (
+        (comp_h >= 3) & (comp_h <= binary.shape[0] // 4)
+        & (comp_w <= comp_h * 3) & (comp_w >= 1)
+        & (area >= 0.1 * comp_w * comp_h)
+    )
+    if np.count_nonzero(glyphs) < 10:
+        return None
+    return float(np.median(comp_h[glyphs])) / factor
+
+def adaptive_scale(image, target_text_height=TARGET_TEXT_HEIGHT, min_scale=0.25):
+    """
+    Downscale factor that brings the estimated glyph height to
+    `target_text_height`. Never upscales; returns 1.0 when unsure.
+    """
+    text_height = estimate_text_height(image)
+    if text_height is None or text_height <= target_text_height:
+        return 1.0
+    return max(min_scale, target_text_height / text_height)
+
+def resize_image(image, scale):
+    """Resize by `scale` (INTER_AREA when shrinking); returns the image unchanged for scale 1."""
+    if scale == 1:
+        return image
+    h, w = image.shape[:2]
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    return cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=interpolation)
+
 def preprocess_image(image_bytes, debug=False):
     """
     Intelligently preprocess image for better OCR results.
@@ -44,67 +132,278 @@ def preprocess_image(image_bytes, debug=False):
         processed_image: Preprocessed image ready for OCR
         steps: Dict of intermediate images (if debug=True)
     """
-    # Convert bytes to numpy array
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    binary, steps = preprocess_array(decode_image(image_bytes), debug=debug)
     
-    steps = {'original': image.copy()} if debug else {}
-    
-    # Analyze image quality
-    quality = analyze_image_quality(image)
-    
-    # Step 1: Convert to grayscale (always beneficial for text OCR)
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    if debug:
-        steps['grayscale'] = gray.copy()
-    
-    # Step 2: Noise reduction (only if image is noisy)
-    if quality['noise_level'] < 100:  # Low sharpness indicates noise
-        # Use bilateral filter to preserve edges while removing noise
-        denoised = cv2.bilateralFilter(gray, 9, 75, 75)
+    # Convert back to PIL Image for compatibility
+    return Image.fromarray(binary), steps
+
+class PreprocessBuffers:
+    """
+    Scratch arrays for preprocessing pipelines, reused across calls.
+
+    Each stage writes into a named buffer via OpenCV's `dst=` argument, so
+    steady-state preprocessing of same-sized images allocates nothing.
+    CLAHE objects and structuring elements are cached per parameter set.
+    Not thread-safe: use get_buffers() for a per-thread instance.
+    """
+
+    def __init__(self):
+        self._arrays = {}
+        self._clahe = {}
+        self._kernels = {}
+
+    def get(self, name, shape, dtype=np.uint8):
+        array = self._arrays.get(name)
+        if array is None or array.shape != shape or array.dtype != dtype:
+            array = np.empty(shape, dtype)
+            self._arrays[name] = array
+        return array
+
+    def clahe(self, clip_limit, tile_grid):
+        key = (clip_limit, tuple(tile_grid))
+        if key not in self._clahe:
+            self._clahe[key] = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tuple(tile_grid))
+        return self._clahe[key]
+
+    def kernel(self, shape, size):
+        key = (shape, tuple(size))
+        if key not in self._kernels:
+            self._kernels[key] = cv2.getStructuringElement(MORPH_SHAPES[shape], tuple(size))
+        return self._kernels[key]
+
+_thread_buffers = threading.local()
+
+def get_buffers():
+    """PreprocessBuffers owned by the calling thread (one per worker)."""
+    buffers = getattr(_thread_buffers, 'buffers', None)
+    if buffers is None:
+        buffers = _thread_buffers.buffers = PreprocessBuffers()
+    return buffers
+
+MORPH_SHAPES = {'rect': cv2.MORPH_RECT, 'ellipse': cv2.MORPH_ELLIPSE, 'cross': cv2.MORPH_CROSS}
+
+# Stage implementations: fn(gray, params, buffers, dst) -> uint8 grayscale array
+def _stage_resize(gray, params, buffers, dst):
+    scale = params.get('scale')
+    if scale is None:
+        max_side = params.get('max_side')
+        scale = min(1.0, max_side / max(gray.shape[:2])) if max_side else adaptive_scale(gray)
+    return resize_image(gray, scale)
+
+def _stage_denoise(gray, params, buffers, dst):
+    # Use bilateral filter to preserve edges while removing noise
+    return cv2.bilateralFilter(gray, params.get('d', 9), params.get('sigma_color', 75),
+                               params.get('sigma_space', 75), dst=dst)
+
+def _stage_median_blur(gray, params, buffers, dst):
+    return cv2.medianBlur(gray, params.get('ksize', 3), dst=dst)
+
+def _stage_clahe(gray, params, buffers, dst):
+    # Contrast Limited Adaptive Histogram Equalization
+    clahe = buffers.clahe(params.get('clip_limit', 2.0), params.get('tile_grid', [8, 8]))
+    return clahe.apply(gray, dst=dst)
+
+def _stage_adaptive_threshold(gray, params, buffers, dst):
+    # Adaptive instead of global threshold to handle uneven lighting
+    method = (cv2.ADAPTIVE_THRESH_MEAN_C if params.get('method') == 'mean'
+              else cv2.ADAPTIVE_THRESH_GAUSSIAN_C)
+    return cv2.adaptiveThreshold(gray, 255, method, cv2.THRESH_BINARY,
+                                 params.get('block_size', 11), params.get('c', 2), dst=dst)
+
+def _stage_otsu_threshold(gray, params, buffers, dst):
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=dst)
+    return binary
+
+def _stage_morph_close(gray, params, buffers, dst):
+    # Remove small noise and connect broken characters
+    kernel = buffers.kernel(params.get('shape', 'rect'), params.get('kernel', [2, 2]))
+    return cv2.morphologyEx(gray, cv2.MORPH_CLOSE, kernel, dst=dst)
+
+STAGES = {
+    'resize': _stage_resize,
+    'denoise': _stage_denoise,
+    'median_blur': _stage_median_blur,
+    'clahe': _stage_clahe,
+    'adaptive_threshold': _stage_adaptive_threshold,
+    'otsu_threshold': _stage_otsu_threshold,
+    'morph_close': _stage_morph_close,
+}
+
+# Conditions a stage can be gated on via "when", evaluated on the quality metrics
+CONDITIONS = {
+    'always': lambda quality, params: True,
+    'noisy': lambda quality, params: quality['noise_level'] < params.get('noise_threshold', 100),
+    'needs_enhancement': lambda quality, params: quality['needs_enhancement'],
+    'not_binary': lambda quality, params: not quality['is_binary'],
+}
+
+# Names the Streamlit debug view has always used for these stages
+DEBUG_STEP_NAMES = {
+    'denoise': 'denoised',
+    'clahe': 'contrast_enhanced',
+    'adaptive_threshold': 'binary',
+    'otsu_threshold': 'binary',
+    'morph_close': 'morphological',
+}
+
+class PreprocessPipeline:
+    """
+    Declarative preprocessing pipeline.
+
+    A pipeline is a list of stage specs such as
+    `{"stage": "clahe", "clip_limit": 2.0, "when": "needs_enhancement"}`.
+    Every pipeline starts from grayscale; each stage feeds the next, and the
+    last stage's output is what OCR sees. Stages marked `"debug_only": true`
+    are only run (on the side) for the debug view.
+
+    Args:
+        name: Pipeline name
+        stages: List of stage spec dicts
+    """
+
+    def __init__(self, name, stages):
+        for spec in stages:
+            if spec.get('stage') not in STAGES:
+                raise ValueError(f"Unknown preprocessing stage: {spec.get('stage')}")
+            if spec.get('when', 'always') not in CONDITIONS:
+                raise ValueError(f"Unknown stage condition: {spec.get('when')}")
+        self.name = name
+        self.stages = [dict(spec) for spec in stages]
+
+    @property
+    def spec(self):
+        return [dict(spec) for spec in self.stages]
+
+    def run(self, image, debug=False, reuse_buffers=False, timings=None):
+        """
+        Run the pipeline on a decoded BGR (or grayscale) image.
+
+        Args:
+            image: Numpy image
+            debug: If True, returns intermediate steps for visualization
+            reuse_buffers: Write stages into this thread's preallocated
+                buffers; the result is only valid until the next call on
+                the same thread. Ignored in debug mode.
+            timings: Optional dict; seconds spent per stage are added to it
+
+        Returns:
+            output: Preprocessed grayscale/binary numpy array ready for OCR
+            steps: Dict of intermediate images (if debug=True)
+        """
+        # Stage timings also go to the active trace, if any
+        traced = timings is None and (tracing.is_enabled() or tracing.current_trace() is not None)
+        if traced:
+            timings = {}
+
+        buffers = get_buffers() if reuse_buffers and not debug else None
+        cache = buffers or PreprocessBuffers()
+
+        def dst(name, shape, dtype=np.uint8):
+            return buffers.get(name, shape, dtype) if buffers is not None else None
+
+        def timed(label, start):
+            if timings is not None:
+                timings[label] = timings.get(label, 0.0) + time.perf_counter() - start
+
+        # Every stage writes a new array (or a separate buffer), so debug
+        # steps can reference them directly without copying
+        steps = {'original': image} if debug else {}
+
+        # Convert to grayscale (always beneficial for text OCR)
+        start = time.perf_counter()
+        gray = (cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=dst('gray', image.shape[:2]))
+                if len(image.shape) == 3 else image)
+        timed('grayscale', start)
         if debug:
-            steps['denoised'] = denoised.copy()
-        gray = denoised
-    
-    # Step 3: Contrast enhancement (if needed)
-    if quality['needs_enhancement']:
-        # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(gray)
+            steps['grayscale'] = gray
+
+        # Analyze image quality to decide which conditional stages run
+        start = time.perf_counter()
+        quality = analyze_image_quality(gray, laplacian_dst=dst('laplacian', gray.shape[:2], np.int16))
+        timed('analyze', start)
+
+        for idx, spec in enumerate(self.stages):
+            name = spec['stage']
+            if not CONDITIONS[spec.get('when', 'always')](quality, spec):
+                continue
+            if spec.get('debug_only') and not debug:
+                continue
+            start = time.perf_counter()
+            output = STAGES[name](gray, spec, cache, dst(f"{idx}_{name}", gray.shape[:2]))
+            timed(name, start)
+            if debug:
+                steps[DEBUG_STEP_NAMES.get(name, name)] = output
+            if not spec.get('debug_only'):
+                gray = output
+
+        if traced:
+            for stage, seconds in timings.items():
+                tracing.record(f"preprocess.{stage}", seconds)
+
         if debug:
-            steps['contrast_enhanced'] = enhanced.copy()
-        gray = enhanced
-    
-    # Step 4: Adaptive thresholding for better text separation
-    # This is crucial for payment receipts with varying backgrounds
-    # Use adaptive threshold instead of global to handle uneven lighting
-    binary = cv2.adaptiveThreshold(
-        gray, 
-        255, 
-        cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-        cv2.THRESH_BINARY, 
-        11, 
-        2
-    )
-    if debug:
-        steps['binary'] = binary.copy()
-    
-    # Step 5: Morphological operations to clean up text
-    # Remove small noise and connect broken characters
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
-    morphed = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
-    if debug:
-        steps['morphological'] = morphed.copy()
-    
-      
-    # Convert back to PIL Image for compatibility
-    final_image = Image.fromarray(binary)
+            steps['final'] = gray
+            return gray, steps
+        return gray, None
+
+# The original hardcoded chain
+DEFAULT_PIPELINE_SPEC = [
+    {'stage': 'denoise', 'd': 9, 'sigma_color': 75, 'sigma_space': 75, 'when': 'noisy'},
+    {'stage': 'clahe', 'clip_limit': 2.0, 'tile_grid': [8, 8], 'when': 'needs_enhancement'},
+    {'stage': 'adaptive_threshold', 'method': 'gaussian', 'block_size': 11, 'c': 2},
+    {'stage': 'morph_close', 'kernel': [2, 2], 'debug_only': True},
+]
+
+def _default_pipelines_file():
+    # Next to this module in a checkout or editable install; a wheel puts it
+    # under <prefix>/share/ocreceipt (data-files). Not the cwd, so the CLI and
+    # API see the same pipelines wherever they are started from
+    here = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipelines.json')
+    installed = os.path.join(sys.prefix, 'share', 'ocreceipt', 'pipelines.json')
+    return installed if not os.path.exists(here) and os.path.exists(installed) else here
+
+PIPELINES_FILE = os.getenv('OCRECEIPT_PIPELINES') or _default_pipelines_file()
+
+_pipelines = None
+
+def load_pipelines(path=PIPELINES_FILE):
+    """
+    Load named pipelines from a JSON file of the form
+    `{"name": [stage, ...], ...}`. The built-in "default" pipeline is
+    always available unless the file overrides it.
+    """
+    pipelines = {'default': PreprocessPipeline('default', DEFAULT_PIPELINE_SPEC)}
+    if path and os.path.exists(path):
+        with open(path, 'r') as f:
+            for name, stages in json.load(f).items():
+                pipelines[name] = PreprocessPipeline(name, stages)
+    return pipelines
+
+def get_pipeline(name='default'):
+    global _pipelines
+    if _pipelines is None:
+        _pipelines = load_pipelines()
+    if name not in _pipelines:
+        raise ValueError(f"Unknown preprocessing pipeline: {name}")
+    return _pipelines[name]
+
+def preprocess_array(image, debug=False, reuse_buffers=False, pipeline='default'):
+    """
+    Preprocess an already decoded BGR image.
     
-    if debug:
-        steps['final'] = binary
-        return final_image, steps
+    Args:
+        image: BGR numpy array (as returned by decode_image)
+        debug: If True, returns intermediate steps for visualization
+        reuse_buffers: Write every stage into this thread's preallocated
+            buffers. The returned array is then only valid until the next
+            call on the same thread, so consume it (e.g. OCR it) right away.
+            Ignored in debug mode, where each step must be kept.
+        pipeline: Name of the preprocessing pipeline to run
     
-    return final_image, None
+    Returns:
+        binary: Preprocessed grayscale/binary numpy array ready for OCR
+        steps: Dict of intermediate images (if debug=True)
+    """
+    return get_pipeline(pipeline).run(image, debug=debug, reuse_buffers=reuse_buffers)
 
 def convert_cv_to_pil(cv_image):
     """Convert OpenCV image to PIL Image"""
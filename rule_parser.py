@@ -0,0 +1,246 @@
+import threading
+import re
+
+from extract_and_parse import TransactionData, add_metadata, parse_with_llm
+from tracing import span
+
+MONTHS = r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*'
+
+STATUS_PATTERN = re.compile(r'\b(?:Transaction\s+)?(Successful|Successfully|Failed|Pending)\b', re.IGNORECASE)
+AMOUNT_PATTERN = re.compile(r'^(?:(Rs\.?|PKR)\s*)?([\d,]+(?:\.\d{1,2})?)$', re.IGNORECASE)
+CURRENCY_PATTERN = re.compile(r'^(Rs\.?|PKR)$', re.IGNORECASE)
+TID_PATTERN = re.compile(
+    r'(?:Transaction\s*ID|TID|Trx\.?\s*ID|Reference\s*(?:No\.?|Number)?)\s*(?:\(TID\))?\s*[:#.]?\s*([A-Za-z0-9]{4,})',
+    re.IGNORECASE
+)
+DATE_PATTERN = re.compile(
+    rf'\b(\d{{1,2}}[\s-]{MONTHS},?[\s-]\d{{4}}|{MONTHS}\s+\d{{1,2}},?\s+\d{{4}}|\d{{1,2}}[/-]\d{{1,2}}[/-]\d{{2,4}}|\d{{4}}-\d{{2}}-\d{{2}})\b',
+    re.IGNORECASE
+)
+TIME_PATTERN = re.compile(r'\b(\d{1,2}[:.]\d{2}(?:[:.]\d{2})?\s*(?:AM|PM))\b|\b(\d{1,2}:\d{2}(?::\d{2})?)\b', re.IGNORECASE)
+FEE_PATTERN = re.compile(r'\bFee\b[^\d]*([\d,]+(?:\.\d{1,2})?)', re.IGNORECASE)
+ACCOUNT_PATTERN = re.compile(r'^[\d*\-\s]{4,}$')
+
+# Buttons and chrome that show up in screenshots but carry no data
+UI_LINES = {'screenshot', 'share receipt', 'share', 'ok', 'done', 'close', 'home', 'download'}
+
+# Minimum confidence for a rule-based parse to be used instead of the LLM
+FAST_PATH_THRESHOLD = 0.85
+
+# Weight of each field in the confidence score
+FIELD_WEIGHTS = {
+    'amount': 0.3,
+    'transaction_id': 0.25,
+    'transaction_date': 0.15,
+    'transaction_status': 0.1,
+    'recipient_name': 0.1,
+    'payment_method': 0.1
+}
+
+def _clean_amount(value):
+    return value.replace(',', '')
+
+def _is_account(line):
+    return bool(ACCOUNT_PATTERN.match(line)) and sum(ch.isdigit() for ch in line) >= 4
+
+def _line_after(lines, predicate):
+    for idx, line in enumerate(lines[:-1]):
+        if predicate(line):
+            return lines[idx + 1]
+    return None
+
+def _extract_common(lines, text):
+    """Fields that are found the same way on every supported layout."""
+    data = {}
+
+    match = STATUS_PATTERN.search(text)
+    if match:
+        status = match.group(1).capitalize()
+        data['transaction_status'] = 'Successful' if status == 'Successfully' else status
+
+    match = TID_PATTERN.search(text)
+    if match:
+        data['transaction_id'] = match.group(1)
+
+    match = DATE_PATTERN.search(text)
+    if match:
+        data['transaction_date'] = match.group(1)
+
+    match = TIME_PATTERN.search(text)
+    if match:
+        data['transaction_time'] = match.group(1) or match.group(2)
+
+    match = FEE_PATTERN.search(text)
+    if match:
+        data['fee'] = _clean_amount(match.group(1))
+
+    # Amount: "Rs 5,400" on one line, or "Rs" followed by the number on the next
+    for idx, line in enumerate(lines):
+        if CURRENCY_PATTERN.match(line) and idx + 1 < len(lines):
+            amount = AMOUNT_PATTERN.match(lines[idx + 1])
+            if amount and not amount.group(1):
+                data['currency'] = line.rstrip('.')
+                data['amount'] = _clean_amount(amount.group(2))
+                break
+        amount = AMOUNT_PATTERN.match(line)
+        if amount and amount.group(1):
+            data['currency'] = amount.group(1).rstrip('.')
+            data['amount'] = _clean_amount(amount.group(2))
+            break
+
+    # Long sentences are disclaimers/messages
+    notes = [line.rstrip('_ ') for line in lines if len(line.split()) >= 6]
+    if notes:
+        data['notes'] = ' '.join(notes)
+
+    return data
+
+def _extract_easypaisa(lines, text):
+    data = {'payment_method': 'EasyPaisa'}
+
+    # Sender name and account follow the status line
+    for idx, line in enumerate(lines):
+        if STATUS_PATTERN.search(line):
+            if idx + 1 < len(lines) and not _is_account(lines[idx + 1]):
+                data['sender_name'] = lines[idx + 1]
+                if idx + 2 < len(lines) and _is_account(lines[idx + 2]):
+                    data['sender_account'] = lines[idx + 2]
+            break
+
+    recipient = _line_after(lines, lambda line: line.lower() == 'to')
+    if recipient and not _is_account(recipient):
+        data['recipient_name'] = recipient
+
+    for idx, line in enumerate(lines):
+        if line.lower().startswith('number') or line.lower() == 'account number':
+            if idx + 1 < len(lines) and _is_account(lines[idx + 1]):
+                data['recipient_account'] = lines[idx + 1]
+                break
+
+    # "EasyPaisa -" is followed by the bank, e.g. "Telenor Bank"
+    bank = _line_after(lines, lambda line: line.lower().startswith('easypaisa'))
+    if bank and 'bank' in bank.lower():
+        data['bank_name'] = bank
+    return data
+
+def _extract_jazzcash(lines, text):
+    data = {'payment_method': 'JazzCash'}
+    for label, name_key, account_key in (('to', 'recipient_name', 'recipient_account'),
+                                         ('from', 'sender_name', 'sender_account')):
+        for idx, line in enumerate(lines):
+            if line.lower().rstrip(':') in (label, f'sent {label}', f'received {label}'):
+                following = lines[idx + 1:idx + 3]
+                if following and not _is_account(following[0]):
+                    data[name_key] = following[0]
+                    following = following[1:]
+                if following and _is_account(following[0]):
+                    data[account_key] = following[0]
+                break
+    return data
+
+# Labels printed on every EasyPaisa receipt; one may be lost to OCR
+EASYPAISA_LABELS = (
+    re.compile(r'^funds transfer$', re.IGNORECASE),
+    re.compile(r'^money transferred$', re.IGNORECASE),
+    re.compile(r'^easypaisa\s*-$', re.IGNORECASE),
+    re.compile(r'^transaction id\s*\(tid\)', re.IGNORECASE)
+)
+JAZZCASH_HEADER = re.compile(r'^jazz\s?cash$', re.IGNORECASE)
+JAZZCASH_LABEL = re.compile(r'^(?:(?:sent|received)\s+)?(?:to|from):?$', re.IGNORECASE)
+
+def _is_easypaisa(lines):
+    return sum(any(label.match(line) for line in lines) for label in EASYPAISA_LABELS) >= 3
+
+def _is_jazzcash(lines):
+    # The logo heads the receipt and parties sit under "Sent to"/"From" labels
+    return (any(JAZZCASH_HEADER.match(line) for line in lines[:3])
+            and any(JAZZCASH_LABEL.match(line) for line in lines))
+
+# (name, detector, extractor) tried in order; the first detector that matches wins.
+# Detection looks at the layout's labels, not the app name: a bank receipt
+# paying into an EasyPaisa account names it too.
+TEMPLATES = [
+    ('easypaisa', _is_easypaisa, _extract_easypaisa),
+    ('jazzcash', _is_jazzcash, _extract_jazzcash),
+]
+
+def parse_with_rules(ocr_text):
+    """
+    Parse a receipt with layout templates, without calling the LLM.
+
+    Returns:
+        data: Validated TransactionData dict (None for unknown layouts)
+        confidence: Share of key fields found, weighted (0.0 - 1.0)
+    """
+    lines = [line.strip() for line in ocr_text.splitlines() if line.strip()]
+    lines = [line for line in lines if line.lower() not in UI_LINES]
+    text = '\n'.join(lines)
+
+    for name, detect, extract in TEMPLATES:
+        if detect(lines):
+            fields = _extract_common(lines, text)
+            fields.update(extract(lines, text))
+            confidence = sum(weight for field, weight in FIELD_WEIGHTS.items() if fields.get(field))
+            return TransactionData(**fields).model_dump(), round(confidence, 3)
+    return None, 0.0
+
+# Fast-path counters (shared per process)
+_stats_lock = threading.Lock()
+_stats = {'fast_path': 0, 'llm_fallback': 0}
+
+def fast_path_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats['fast_path'] + stats['llm_fallback']
+    stats['hit_rate'] = stats['fast_path'] / total if total else 0.0
+    return stats
+
+def parse_fast_path(ocr_text, min_confidence=FAST_PATH_THRESHOLD):
+    """
+    The rule-based half of parse_receipt, for callers that batch the LLM
+    fallbacks themselves (e.g. packed parsing).
+
+    Returns:
+        data: Transaction dict with metadata if a known layout scored at
+            least `min_confidence`, else None (the receipt needs the LLM)
+    """
+    try:
+        with span('parse_rules'):
+            data, confidence = parse_with_rules(ocr_text)
+    except Exception:
+        data, confidence = None, 0.0
+
+    if data is None or confidence < min_confidence:
+        with _stats_lock:
+            _stats['llm_fallback'] += 1
+        return None
+
+    with _stats_lock:
+        _stats['fast_path'] += 1
+    final_data = add_metadata(data, ocr_text)
+    final_data['parse_method'] = 'rules'
+    final_data['parse_confidence'] = confidence
+    return final_data
+
+def parse_receipt(client, ocr_text, min_confidence=FAST_PATH_THRESHOLD, use_cache=True):
+    """
+    Parse a receipt, trying the rule-based fast path before the LLM.
+
+    Known layouts scoring at least `min_confidence` are returned without a
+    network call; low-confidence or unknown formats fall back to
+    parse_with_llm.
+
+    Returns:
+        data: Transaction dict with metadata (parse_method is 'rules' or 'llm')
+        error: Error message if any
+    """
+    final_data = parse_fast_path(ocr_text, min_confidence)
+    if final_data is not None:
+        return final_data, None
+
+    if client is None:
+        return None, "Failed to initialize Groq client"
+    final_data, error = parse_with_llm(client, ocr_text, use_cache=use_cache)
+    if final_data is not None:
+        final_data['parse_method'] = 'llm'
+    return final_data, error
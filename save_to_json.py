@@ -1,23 +1,232 @@
+from contextlib import contextmanager
 import json
+import time
 import os
 
-# Save to JSON file
-def save_to_json(data, filename="transactions.json"):
+from tracing import span
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to no inter-process locking
+    fcntl = None
+
+DEFAULT_TRANSACTIONS_FILE = "transactions.jsonl"
+
+@contextmanager
+def _locked(filename):
+    """
+    Hold an exclusive lock on `<filename>.lock`.
+
+    A separate lock file is used so compaction can atomically replace the
+    data file without writers ending up appending to the old inode.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(filename + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class TransactionLog:
+    """
+    Append-only JSONL transaction writer.
+
+    Each record is one line, so saving is O(1) regardless of file size.
+    fsync is batched: the file is synced every `sync_every` records or
+    `sync_interval` seconds, whichever comes first, and on close().
+
+    Args:
+        filename: JSONL file to append to
+        sync_every: Records written between fsyncs
+        sync_interval: Maximum seconds between fsyncs
+    """
+
+    def __init__(self, filename=DEFAULT_TRANSACTIONS_FILE, sync_every=64, sync_interval=1.0):
+        self.filename = filename
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._file = open(filename, 'a')
+        self._tail_checked = False
+
+    def append(self, data):
+        line = json.dumps(data) + '\n'
+        with _locked(self.filename):
+            self._reopen_if_replaced()
+            if not self._tail_checked:
+                self._end_torn_line()
+            self._file.write(line)
+            self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def _reopen_if_replaced(self):
+        # compact_transactions() swaps in a new file; follow it
+        try:
+            replaced = os.stat(self.filename).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            replaced = True
+        if replaced:
+            self.sync()
+            self._file.close()
+            self._file = open(self.filename, 'a')
+            self._tail_checked = False
+
+    def _end_torn_line(self):
+        # A writer that crashed mid-line leaves no newline; without one the
+        # next record would be glued onto the torn line and skipped with it
+        with open(self.filename, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self._file.write('\n')
+        self._tail_checked = True
+
+    def sync(self):
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Save to JSONL file
+def save_to_json(data, filename=DEFAULT_TRANSACTIONS_FILE):
     try:
-        # Load existing data if file exists
-        if os.path.exists(filename):
-            with open(filename, 'r') as f:
-                existing_data = json.load(f)
-        else:
-            existing_data = []
-        
-        # Append new data
-        existing_data.append(data)
-        
-        # Save back to file
-        with open(filename, 'w') as f:
-            json.dump(existing_data, f, indent=2)
-        
+        filename = resolve_transactions_file(filename)
+
+        # Append a single line instead of rewriting the whole file
+        with span('save'), TransactionLog(filename, sync_every=1) as log:
+            log.append(data)
+
         return True, filename
     except Exception as e:
-        return False, str(e)
\ No newline at end of file
+        return False, str(e)
+
+def iter_transactions(filename=DEFAULT_TRANSACTIONS_FILE):
+    """
+    Yield transactions from a JSONL file (or a legacy JSON array file).
+    Torn lines left by an interrupted write are skipped.
+    """
+    if not os.path.exists(filename):
+        return
+    if filename.endswith('.json'):
+        with open(filename, 'r') as f:
+            yield from json.load(f)
+        return
+    with open(filename, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+def load_transactions(filename=DEFAULT_TRANSACTIONS_FILE):
+    return list(iter_transactions(filename))
+
+def compact_transactions(filename=DEFAULT_TRANSACTIONS_FILE):
+    """
+    Rewrite a JSONL file dropping torn lines and exact duplicate records.
+
+    Returns:
+        kept: Number of records in the compacted file
+        removed: Number of lines dropped
+    """
+    with _locked(filename):
+        kept = 0
+        removed = 0
+        seen = set()
+        tmp_filename = filename + '.tmp'
+        with open(filename, 'r') as src, open(tmp_filename, 'w') as dst:
+            for line in src:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    removed += 1
+                    continue
+                canonical = json.dumps(record, sort_keys=True)
+                if canonical in seen:
+                    removed += 1
+                    continue
+                seen.add(canonical)
+                dst.write(json.dumps(record) + '\n')
+                kept += 1
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_filename, filename)
+    return kept, removed
+
+def _has_records(filename):
+    return os.path.exists(filename) and os.path.getsize(filename) > 0
+
+def migrate_json_to_jsonl(json_filename, jsonl_filename, force=False):
+    """
+    One-time conversion of a legacy JSON array file to JSONL.
+
+    Args:
+        force: Replace `jsonl_filename` even if it already holds transactions
+
+    Returns:
+        count: Number of records migrated
+
+    Raises:
+        FileExistsError: If `jsonl_filename` already has transactions and
+            `force` is not set (they would be lost)
+    """
+    with _locked(jsonl_filename):
+        # Checked under the lock, so a concurrent append can't be overwritten
+        if _has_records(jsonl_filename) and not force:
+            raise FileExistsError(f"{jsonl_filename} already contains transactions")
+        with open(json_filename, 'r') as f:
+            transactions = json.load(f)
+        tmp_filename = jsonl_filename + '.tmp'
+        with open(tmp_filename, 'w') as f:
+            for txn in transactions:
+                f.write(json.dumps(txn) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, jsonl_filename)
+    return len(transactions)
+
+def ensure_migrated(jsonl_filename=DEFAULT_TRANSACTIONS_FILE):
+    """Migrate `<name>.json` to `jsonl_filename` if only the legacy file has transactions."""
+    legacy_filename = os.path.splitext(jsonl_filename)[0] + '.json'
+    if (not jsonl_filename.endswith('.jsonl') or not os.path.exists(legacy_filename)
+            or _has_records(jsonl_filename)):
+        return 0
+    try:
+        return migrate_json_to_jsonl(legacy_filename, jsonl_filename)
+    except FileExistsError:
+        # Another process migrated or appended first
+        return 0
+
+def resolve_transactions_file(filename=DEFAULT_TRANSACTIONS_FILE):
+    """
+    Map a legacy `.json` filename to its `.jsonl` counterpart, migrating
+    the old JSON array the first time it is seen.
+    """
+    if filename.endswith('.json'):
+        filename = os.path.splitext(filename)[0] + '.jsonl'
+    ensure_migrated(filename)
+    return filename
@@ -0,0 +1,71 @@
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from api import OUTPUT_DIR, ConcurrencyLimit, public_job, resolve_output_file
+from job_queue import JobQueue
+
+
+def test_output_file_stays_in_output_dir():
+    assert resolve_output_file('transactions.jsonl') == os.path.join(OUTPUT_DIR, 'transactions.jsonl')
+    assert resolve_output_file('shop_2024-01.jsonl') == os.path.join(OUTPUT_DIR, 'shop_2024-01.jsonl')
+
+
+@pytest.mark.parametrize('name', [
+    '/etc/cron.d/x.jsonl',
+    '../transactions.jsonl',
+    'logs/transactions.jsonl',
+    'logs\\transactions.jsonl',
+    '..',
+    '.hidden.jsonl',
+    'transactions.json',
+    'jobs.db',
+    'transactions.jsonl\0',
+    ''
+])
+def test_output_file_rejects_paths(name):
+    with pytest.raises(HTTPException) as excinfo:
+        resolve_output_file(name)
+    assert excinfo.value.status_code == 422
+
+
+def test_limit_rejects_when_wait_line_is_full():
+    limit = ConcurrencyLimit(max_in_flight=1, max_waiting=2)
+    limit.reserve(2)
+    with pytest.raises(HTTPException) as excinfo:
+        limit.reserve(1)
+    assert excinfo.value.status_code == 503
+
+
+def test_limit_caps_in_flight():
+    async def run():
+        limit = ConcurrencyLimit(max_in_flight=2, max_waiting=10)
+        peak = 0
+
+        async def one():
+            nonlocal peak
+            async with limit.slot():
+                peak = max(peak, limit.in_flight)
+                await asyncio.sleep(0.01)
+
+        limit.reserve(5)
+        await asyncio.gather(*(one() for _ in range(5)))
+        return limit, peak
+
+    limit, peak = asyncio.run(run())
+    assert peak == 2
+    assert (limit.in_flight, limit.waiting) == (0, 0)
+
+
+def test_job_result_leaves_the_profile_in_the_queue(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'))
+    job_id = queue.submit(b'a', 'a.png')
+    queue.claim('w1')
+    queue.complete(job_id, 'w1', {'ocr_text': 'Rs 100', 'error': None, 'profile': 'ncalls tottime'})
+
+    result = public_job(queue.get(job_id))['result']
+    queue.close()
+    assert result['ocr_text'] == 'Rs 100'
+    assert 'profile' not in result
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from groq import AsyncGroq
+
+import async_parse
+from async_parse import AdaptiveLimiter, parse_with_llm_async
+from bench.mock_groq_server import MockGroqServer
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(async_parse, '_backoff', lambda attempt: 0.01)
+
+
+def parse_all(server, ocr_texts, limiter, max_retries=3):
+    async def run():
+        client = AsyncGroq(api_key='test', base_url=server.base_url, max_retries=0)
+        return await asyncio.gather(*(
+            parse_with_llm_async(client, limiter, ocr_text, max_retries, use_cache=False)
+            for ocr_text in ocr_texts
+        ))
+    return asyncio.run(run())
+
+
+def test_429_waits_for_retry_after_and_halves_the_limit():
+    limiter = AdaptiveLimiter(max_concurrency=4)
+    with MockGroqServer(requests_per_window=1, window=0.3) as server:
+        results = parse_all(server, ['Rs 100', 'Rs 200'], limiter)
+
+    assert [error for _, error in results] == [None, None]
+    assert server.rate_limited_count >= 1
+    assert limiter.in_flight == 0
+
+
+def test_5xx_is_retried():
+    limiter = AdaptiveLimiter(max_concurrency=2)
+    with MockGroqServer(errors=[503, 502]) as server:
+        results = parse_all(server, ['Rs 100'], limiter)
+
+    assert results[0][1] is None
+    assert server.request_count == 3
+    assert limiter.in_flight == 0
+
+
+def test_non_retryable_error_fails_without_leaking_a_slot():
+    limiter = AdaptiveLimiter(max_concurrency=1)
+    with MockGroqServer(errors=[400]) as server:
+        (data, error), = parse_all(server, ['Rs 100'], limiter)
+        assert data is None and error
+        assert server.request_count == 1
+        assert limiter.in_flight == 0
+
+        # The only slot is free again, so the next parse goes through
+        assert parse_all(server, ['Rs 200'], limiter)[0][1] is None
+
+
+def test_cancelled_request_releases_its_slot():
+    limiter = AdaptiveLimiter(max_concurrency=1)
+
+    async def run(server):
+        client = AsyncGroq(api_key='test', base_url=server.base_url, max_retries=0)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(parse_with_llm_async(client, limiter, 'Rs 100', use_cache=False), 0.1)
+
+    with MockGroqServer(latency=0.5) as server:
+        asyncio.run(run(server))
+    assert limiter.in_flight == 0
@@ -0,0 +1,62 @@
+import json
+
+from batch_parse import parse_batch_output, run_batch
+
+
+class UnusedBackend:
+    def submit(self, requests_path):
+        raise AssertionError("an empty batch must not be submitted")
+
+
+def test_run_batch_skips_empty_batches(tmp_path):
+    assert run_batch(UnusedBackend(), {}, str(tmp_path / 'transactions.jsonl'),
+                     requests_path=str(tmp_path / 'requests.jsonl')) == (0, {})
+
+
+def test_parse_batch_output_reports_failed_requests():
+    output = json.dumps({
+        'custom_id': 'abc',
+        'response': {'status_code': 500, 'body': {'error': {'message': 'boom'}}},
+        'error': None
+    })
+    results = parse_batch_output(output + '\n')
+    assert results['abc'][0] is None
+    assert results['abc'][1]
+
+
+def test_cmd_batch_counts_empty_ocr_and_submits_nothing(tmp_path, monkeypatch, capsys):
+    import argparse
+    import batch_parse
+    import worker_pool
+    import cli
+
+    class Pool:
+        def __init__(self, workers):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+        def map(self, images, use_preprocessing=True, pipeline='default'):
+            return [('', None) if idx == 0 else (None, 'OCR Error: unreadable') for idx, _ in enumerate(images)]
+
+    def run_batch(*args, **kwargs):
+        raise AssertionError("an empty batch must not be submitted")
+
+    for name in ('a.png', 'b.png'):
+        (tmp_path / name).write_bytes(name.encode())
+    monkeypatch.setattr(worker_pool, 'ReceiptWorkerPool', Pool)
+    monkeypatch.setattr(batch_parse, 'run_batch', run_batch)
+    args = argparse.Namespace(
+        source=str(tmp_path), local_base_url='http://127.0.0.1:1', workers=1, no_preprocessing=False,
+        pipeline='default', transactions=str(tmp_path / 'transactions.jsonl'),
+        requests=str(tmp_path / 'requests.jsonl'), poll_interval=0, pack_size=1, metrics=None
+    )
+
+    assert cli.cmd_batch(args) == 1
+    captured = capsys.readouterr()
+    assert "No text found" in captured.err
+    assert "2 of 2 receipts failed OCR" in captured.out
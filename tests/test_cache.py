@@ -0,0 +1,56 @@
+import sqlite3
+
+import numpy as np
+
+from cache import SQLiteCache, cache_get, cache_set, hash_key
+
+
+def broken_cache():
+    raise sqlite3.OperationalError("database is locked")
+
+
+def test_hash_key_is_stable_and_separates_parts():
+    assert hash_key(b'abc', {'a': 1}) == hash_key(b'abc', {'a': 1})
+    assert hash_key('ab', 'c') != hash_key('a', 'bc')
+
+
+def test_round_trip_and_miss(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite3'))
+    assert cache.get('missing') is None
+    cache.set('key', {'text': 'Rs 1,250'})
+    assert cache.get('key') == {'text': 'Rs 1,250'}
+    assert cache.stats()['hits'] == 1
+
+
+def test_broken_cache_is_a_miss():
+    assert cache_get(broken_cache, 'key') is None
+    cache_set(broken_cache, 'key', 'value')
+
+
+def test_ocr_succeeds_when_cache_fails(monkeypatch):
+    import extract_and_parse
+
+    class Reader:
+        def readtext(self, image):
+            return [(None, 'Rs 1,250', 1.0)]
+
+    monkeypatch.setattr(extract_and_parse, 'get_reader', lambda *args: Reader())
+    monkeypatch.setattr(extract_and_parse, 'get_ocr_cache', broken_cache)
+    monkeypatch.setattr(extract_and_parse, 'load_ocr_input', lambda *args, **kwargs: np.zeros((8, 8), np.uint8))
+
+    assert extract_and_parse.extract_text_easyocr(b'image') == ('Rs 1,250', None)
+
+
+def test_llm_parse_succeeds_when_cache_fails(monkeypatch):
+    import json
+    from types import SimpleNamespace
+    import extract_and_parse
+
+    content = json.dumps({'amount': 1250, 'currency': 'Rs'})
+    completion = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: completion)))
+    monkeypatch.setattr(extract_and_parse, 'get_llm_cache', broken_cache)
+
+    data, error = extract_and_parse.parse_with_llm(client, 'Rs 1,250')
+    assert error is None
+    assert data['amount'] == '1250'
@@ -0,0 +1,127 @@
+from concurrent.futures import Future
+import threading
+import hashlib
+import io
+import json
+import random
+import os
+
+import pytest
+
+import ingest
+from bench.synthetic_receipts import random_receipt, render_receipt
+
+
+class FakeOCRPool:
+    """Stands in for ReceiptWorkerPool: returns the rendered text of each image."""
+    texts = {}
+
+    def __init__(self, workers=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def submit(self, image_bytes, use_preprocessing=True, pipeline='default'):
+        future = Future()
+        future.set_result((self.texts[hashlib.sha256(image_bytes).hexdigest()], None))
+        return future
+
+
+class SlowOCRPool(FakeOCRPool):
+    """Finishes each OCR a little later, on another thread, like the real pool."""
+
+    def submit(self, image_bytes, use_preprocessing=True, pipeline='default'):
+        future = Future()
+        result = (self.texts[hashlib.sha256(image_bytes).hexdigest()], None)
+        threading.Timer(0.05, future.set_result, (result,)).start()
+        return future
+
+
+def encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def receipts(tmp_path, monkeypatch):
+    """Ten distinct receipts per template, plus a JPEG copy of the first one."""
+    rng = random.Random(0)
+    source = tmp_path / 'receipts'
+    source.mkdir()
+    FakeOCRPool.texts = {}
+    for template in ('easypaisa', 'jazzcash'):
+        for idx in range(10):
+            lines, _ = random_receipt(rng, template)
+            image = render_receipt(lines, width=720)
+            for fmt, copy in (('PNG', False), ('JPEG', template == 'easypaisa' and idx == 0)):
+                if fmt == 'PNG' or copy:
+                    data = encode(image, fmt)
+                    FakeOCRPool.texts[hashlib.sha256(data).hexdigest()] = '\n'.join(lines)
+                    (source / f"{template}_{idx:02d}.{fmt.lower()}").write_bytes(data)
+
+    monkeypatch.setattr(ingest, 'ReceiptWorkerPool', FakeOCRPool)
+    monkeypatch.setattr(ingest, 'init_groq', lambda: object())
+    return source
+
+
+def run(source, tmp_path, **kwargs):
+    return ingest.ingest(str(source), output=str(tmp_path / 'results.jsonl'),
+                         transactions_file=str(tmp_path / 'transactions.jsonl'), log=lambda message: None, **kwargs)
+
+
+def test_look_alike_receipts_are_not_dropped(receipts, tmp_path):
+    stats = run(receipts, tmp_path)
+
+    # Same-template receipts look alike, but all 20 are distinct transactions
+    assert stats['similar'] > 10
+    assert stats['processed'] == 20
+    assert stats['duplicates'] == 1
+    records = [json.loads(line) for line in open(tmp_path / 'results.jsonl')]
+    duplicate = next(record for record in records if record['status'] == 'duplicate')
+    names = {os.path.basename(duplicate['source']), os.path.basename(duplicate['duplicate_of'])}
+    assert names == {'easypaisa_00.jpeg', 'easypaisa_00.png'}
+
+
+def test_resumed_run_skips_everything_and_still_detects_duplicates(receipts, tmp_path):
+    run(receipts, tmp_path)
+    stats = run(receipts, tmp_path)
+    assert stats['processed'] == 0
+    assert stats['skipped'] == 21
+
+
+def test_legacy_near_duplicate_records_are_retried(receipts, tmp_path):
+    image_hash = hashlib.sha256((receipts / 'jazzcash_03.png').read_bytes()).hexdigest()
+    (tmp_path / 'results.jsonl').write_text(json.dumps(
+        {'source': 'jazzcash_03.png', 'image_hash': image_hash, 'status': 'duplicate'}
+    ) + '\n')
+
+    stats = run(receipts, tmp_path)
+    assert stats['processed'] == 20
+
+
+def test_llm_fallbacks_are_sent_in_packs(receipts, tmp_path, monkeypatch):
+    import packed_parse
+    from cache import SQLiteCache
+    from test_packed_parse import PackedClient
+
+    client = PackedClient()
+    cache = SQLiteCache(str(tmp_path / 'llm.sqlite3'))
+    monkeypatch.setattr(ingest, 'ReceiptWorkerPool', SlowOCRPool)
+    monkeypatch.setattr(ingest, 'init_groq', lambda: client)
+    monkeypatch.setattr(ingest, 'parse_fast_path', lambda ocr_text: None)
+    monkeypatch.setattr(packed_parse, 'get_llm_cache', lambda: cache)
+
+    stats = run(receipts, tmp_path, pack_size=10)
+    assert (stats['processed'], stats['duplicates']) == (20, 1)
+    # 21 receipts (the JPEG copy may be served from the cache) in packs of up to 10
+    assert client.requests <= 3
+    assert client.pack_sizes[:2] == [10, 10]
+    for line in open(tmp_path / 'results.jsonl'):
+        record = json.loads(line)
+        assert record['transaction']['notes'] == FakeOCRPool.texts[record['image_hash']]
+        assert record['transaction']['parse_method'] == 'llm'
@@ -0,0 +1,53 @@
+import pytest
+
+from job_queue import MAX_ATTEMPTS, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'))
+    yield queue
+    queue.close()
+
+
+def test_claim_takes_oldest_job_once(queue):
+    first = queue.submit(b'a', 'a.png', {'pipeline': 'default'})
+    second = queue.submit(b'b', 'b.png')
+
+    job = queue.claim('w1')
+    assert (job['id'], job['image'], job['settings']) == (first, b'a', {'pipeline': 'default'})
+    assert queue.claim('w2')['id'] == second
+    assert queue.claim('w3') is None
+
+
+def test_expired_lease_is_claimed_by_another_worker(queue):
+    job_id = queue.submit(b'a')
+    queue.claim('w1', lease=-1)
+
+    job = queue.claim('w2')
+    assert (job['id'], job['worker'], job['attempts']) == (job_id, 'w2', 2)
+    # The first worker lost the job: its heartbeat and result are refused
+    assert not queue.heartbeat(job_id, 'w1')
+    assert not queue.complete(job_id, 'w1', {'error': None})
+    assert queue.complete(job_id, 'w2', {'error': None})
+    assert queue.get(job_id)['status'] == 'done'
+
+
+def test_heartbeat_keeps_the_lease(queue):
+    job_id = queue.submit(b'a')
+    queue.claim('w1', lease=-1)
+    assert queue.heartbeat(job_id, 'w1', stage='ocr')
+
+    assert queue.claim('w2') is None
+    assert queue.get(job_id)['stage'] == 'ocr'
+
+
+def test_job_abandoned_after_max_attempts(queue):
+    job_id = queue.submit(b'a')
+    for attempt in range(MAX_ATTEMPTS):
+        assert queue.claim(f'w{attempt}', lease=-1)['id'] == job_id
+
+    assert queue.claim('w-last') is None
+    job = queue.get(job_id)
+    assert job['status'] == 'failed'
+    assert 'abandoned' in job['error']
@@ -0,0 +1,22 @@
+import preprocess
+from extract_and_parse import ocr_cache_key
+from preprocess import DEFAULT_PIPELINE_SPEC, PreprocessPipeline
+
+
+def use_pipelines(monkeypatch, **specs):
+    monkeypatch.setattr(preprocess, '_pipelines', {name: PreprocessPipeline(name, spec) for name, spec in specs.items()})
+
+
+def test_editing_default_pipeline_changes_key(monkeypatch):
+    use_pipelines(monkeypatch, default=DEFAULT_PIPELINE_SPEC)
+    before = ocr_cache_key(b'image', True)
+
+    use_pipelines(monkeypatch, default=DEFAULT_PIPELINE_SPEC[:-1])
+    assert ocr_cache_key(b'image', True) != before
+
+
+def test_key_depends_on_stages_not_name(monkeypatch):
+    use_pipelines(monkeypatch, default=DEFAULT_PIPELINE_SPEC, copy=DEFAULT_PIPELINE_SPEC)
+    assert ocr_cache_key(b'image', True, 'copy') == ocr_cache_key(b'image', True, 'default')
+    assert ocr_cache_key(b'image', False) != ocr_cache_key(b'image', True)
+    assert ocr_cache_key(b'other', True) != ocr_cache_key(b'image', True)
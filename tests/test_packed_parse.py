@@ -0,0 +1,136 @@
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+import extract_and_parse
+import packed_parse
+from batch_parse import LocalBatchBackend, run_batch
+from bench.mock_groq_server import extract_ocr_text
+from cache import SQLiteCache
+from extract_and_parse import TransactionData, llm_cache_key
+from packed_parse import packed_cache_key, parse_packed, split_packed_response
+from save_to_json import load_transactions
+
+
+class Completion(SimpleNamespace):
+    def model_dump(self):
+        return {'choices': [{'message': {'content': self.choices[0].message.content}}]}
+
+
+class PackedClient:
+    """
+    Answers packed requests with one transaction per receipt, its `notes`
+    set to that receipt's OCR text, so tests can check the matching.
+
+    Args:
+        first: Receipt number the model starts counting from
+        invalid: OCR texts whose transaction comes back invalid in packs
+    """
+
+    def __init__(self, first=1, invalid=()):
+        self.first = first
+        self.invalid = set(invalid)
+        self.requests = 0
+        self.pack_sizes = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.requests += 1
+        prompt = kwargs['messages'][1]['content']
+        texts = re.findall(r'# RECEIPT \d+:\n# (.*?)(?=\n\n# (?:RECEIPT|Analyze))', prompt, re.DOTALL)
+        if not texts:
+            # Single-receipt parse_with_llm request
+            content = json.dumps(transaction(extract_ocr_text(prompt)))
+        else:
+            self.pack_sizes.append(len(texts))
+            content = json.dumps({'transactions': [
+                {'receipt': number, **transaction(text, text in self.invalid)}
+                for number, text in enumerate(texts, self.first)
+            ]})
+        return Completion(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def transaction(ocr_text, invalid=False):
+    fields = {field: None for field in TransactionData.model_fields}
+    fields['notes'] = [ocr_text] if invalid else ocr_text
+    return fields
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = SQLiteCache(str(tmp_path / 'llm.sqlite3'))
+    monkeypatch.setattr(packed_parse, 'get_llm_cache', lambda: cache)
+    monkeypatch.setattr(extract_and_parse, 'get_llm_cache', lambda: cache)
+    return cache
+
+
+def test_packed_key_differs_from_single_receipt_key():
+    assert packed_cache_key("Rs 1,250") != llm_cache_key("Rs 1,250")
+
+
+def test_packed_results_are_cached_apart(cache):
+    texts = ["receipt one", "receipt two"]
+
+    client = PackedClient()
+    results = parse_packed(client, texts)
+    assert [data['notes'] for data, _ in results] == texts
+    assert cache.get(packed_cache_key(texts[0]))['notes'] == texts[0]
+    assert cache.get(llm_cache_key(texts[0])) is None
+
+    # A second run is served from the packed entries
+    parse_packed(client, texts)
+    assert client.requests == 1
+
+
+def packed_reply(*numbers):
+    return json.dumps({'transactions': [{'receipt': number, 'notes': str(number)} for number in numbers]})
+
+
+def test_split_matches_by_receipt_number():
+    items = split_packed_response(packed_reply(2, 1, 3), 3)
+    assert [item['notes'] for item in items] == ['1', '2', '3']
+
+
+def test_split_falls_back_to_position_when_numbering_is_off():
+    # Counted from 0: by number every receipt would get its neighbour's fields
+    items = split_packed_response(packed_reply(0, 1, 2), 3)
+    assert [item['notes'] for item in items] == ['0', '1', '2']
+    items = split_packed_response(packed_reply(1, 1, 3), 3)
+    assert [item['notes'] for item in items] == ['1', '1', '3']
+
+
+def test_split_rejects_unmatchable_replies():
+    assert split_packed_response(packed_reply(0, 1), 3) is None
+    assert split_packed_response(packed_reply(1, 2, 4, 5), 3) is None
+
+
+def test_zero_based_reply_keeps_receipts_apart(cache):
+    texts = ["receipt one", "receipt two", "receipt three"]
+    results = parse_packed(PackedClient(first=0), texts)
+    assert [data['notes'] for data, _ in results] == texts
+
+
+def test_invalid_items_are_retried_alone(cache):
+    texts = ["receipt one", "receipt two", "receipt three"]
+    client = PackedClient(invalid={"receipt two"})
+    results = parse_packed(client, texts)
+    assert [data['notes'] for data, _ in results] == texts
+    assert client.pack_sizes == [3]
+    assert client.requests == 2
+
+
+def test_batch_packs_receipts_and_sends_leftovers_alone(tmp_path):
+    texts = {f"id{idx}": f"receipt {idx}" for idx in range(5)}
+    client = PackedClient(invalid={"receipt 3"})
+    backend = LocalBatchBackend(client, directory=str(tmp_path / 'local'))
+    transactions_file = str(tmp_path / 'transactions.jsonl')
+
+    merged, errors = run_batch(backend, texts, transactions_file, requests_path=str(tmp_path / 'requests.jsonl'),
+                               poll_interval=0, pack_size=2, log=lambda message: None)
+    assert (merged, errors) == (5, {})
+    assert client.pack_sizes == [2, 2, 1]
+    assert client.requests == 4
+    saved = {record['custom_id']: record['notes'] for record in load_transactions(transactions_file)}
+    assert saved == texts
@@ -0,0 +1,9 @@
+import os
+
+from preprocess import PIPELINES_FILE, load_pipelines
+
+
+def test_pipelines_file_does_not_depend_on_cwd(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert os.path.isabs(PIPELINES_FILE)
+    assert 'fast' in load_pipelines()
@@ -0,0 +1,128 @@
+import pytest
+
+import rule_parser
+from rule_parser import FAST_PATH_THRESHOLD, parse_receipt, parse_with_rules
+
+# OCR output of an EasyPaisa transfer screenshot, line breaks as EasyOCR returns them
+EASYPAISA_TEXT = """Funds Transfer
+Transaction Successful
+XYZ
+01234567891234
+Money Transferred
+Rs
+5,400
+to
+ABC
+Account
+Number=
+1234
+EasyPaisa -
+Telenor Bank
+07 Nov 2025
+12.46 AM
+Transaction ID(TID): 123456
+Transactions conducted after 09:00 PM and during
+holidays will show up in receiver's statement in next
+working day but balance will be updated in real time_
+Screenshot
+Share Receipt
+Ok"""
+
+JAZZCASH_TEXT = """JazzCash
+Transaction Successful
+Rs. 2,500
+Sent to
+Bilal Ahmed
+03001234567
+From
+Sana Raza
+03121234567
+Mar 14, 2025
+10:42 AM
+TID: 4821937465
+Fee: Rs. 0
+Done"""
+
+# A bank transfer into an EasyPaisa wallet: names EasyPaisa, isn't its layout
+BANK_TO_EASYPAISA_TEXT = """Meezan Bank
+Funds Transfer Receipt
+Status: Successful
+Amount: PKR 12,000
+From: Ahmed Ali
+Account: 0123-4567890
+To: Sana Raza
+Beneficiary Bank: Easypaisa Bank
+Account: 03451234567
+Date: 2025-03-14
+Time: 10:42 AM
+Reference No: FT25073ABCD
+Paid via Raast to EasyPaisa account"""
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    calls = []
+
+    def parse_with_llm(client, ocr_text, use_cache=True):
+        calls.append(ocr_text)
+        return {'payment_method': 'Bank Transfer'}, None
+
+    monkeypatch.setattr(rule_parser, 'parse_with_llm', parse_with_llm)
+    return calls
+
+
+def test_easypaisa_template():
+    data, confidence = parse_with_rules(EASYPAISA_TEXT)
+    assert confidence == 1.0
+    assert {key: data[key] for key in ('payment_method', 'amount', 'currency', 'transaction_id', 'sender_name',
+                                       'sender_account', 'recipient_name', 'recipient_account', 'bank_name',
+                                       'transaction_date', 'transaction_time')} == {
+        'payment_method': 'EasyPaisa', 'amount': '5400', 'currency': 'Rs', 'transaction_id': '123456',
+        'sender_name': 'XYZ', 'sender_account': '01234567891234', 'recipient_name': 'ABC',
+        'recipient_account': '1234', 'bank_name': 'Telenor Bank', 'transaction_date': '07 Nov 2025',
+        'transaction_time': '12.46 AM'
+    }
+
+
+def test_jazzcash_template():
+    data, confidence = parse_with_rules(JAZZCASH_TEXT)
+    assert confidence == 1.0
+    assert {key: data[key] for key in ('payment_method', 'amount', 'transaction_id', 'sender_name',
+                                       'sender_account', 'recipient_name', 'recipient_account', 'fee')} == {
+        'payment_method': 'JazzCash', 'amount': '2500', 'transaction_id': '4821937465',
+        'sender_name': 'Sana Raza', 'sender_account': '03121234567', 'recipient_name': 'Bilal Ahmed',
+        'recipient_account': '03001234567', 'fee': '0'
+    }
+
+
+def test_known_layouts_skip_the_llm(llm_calls):
+    for text in (EASYPAISA_TEXT, JAZZCASH_TEXT):
+        data, error = parse_receipt(None, text)
+        assert error is None
+        assert data['parse_method'] == 'rules'
+    assert llm_calls == []
+
+
+def test_near_miss_goes_to_the_llm(llm_calls):
+    # Screenshot cropped above the TID line: still the EasyPaisa layout, but too little is known
+    text = EASYPAISA_TEXT.replace("Transaction ID(TID): 123456\n", "")
+    data, confidence = parse_with_rules(text)
+    assert data['payment_method'] == 'EasyPaisa'
+    assert confidence < FAST_PATH_THRESHOLD
+
+    data, error = parse_receipt(object(), text)
+    assert data['parse_method'] == 'llm'
+    assert llm_calls == [text]
+
+
+def test_mentioning_easypaisa_is_not_the_easypaisa_layout(llm_calls):
+    assert parse_with_rules(BANK_TO_EASYPAISA_TEXT) == (None, 0.0)
+
+    data, error = parse_receipt(object(), BANK_TO_EASYPAISA_TEXT)
+    assert data['payment_method'] == 'Bank Transfer'
+    assert llm_calls == [BANK_TO_EASYPAISA_TEXT]
+
+
+def test_mentioning_jazzcash_is_not_the_jazzcash_layout():
+    text = BANK_TO_EASYPAISA_TEXT.replace('Easypaisa', 'JazzCash').replace('EasyPaisa', 'JazzCash')
+    assert parse_with_rules(text) == (None, 0.0)
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from save_to_json import (TransactionLog, compact_transactions, ensure_migrated, load_transactions,
+                          migrate_json_to_jsonl, resolve_transactions_file)
+
+
+@pytest.fixture
+def legacy(tmp_path):
+    path = tmp_path / 'transactions.json'
+    path.write_text(json.dumps([{'transaction_id': '1'}, {'transaction_id': '2'}]))
+    return path
+
+
+def test_migrate_converts_json_array(legacy, tmp_path):
+    dest = tmp_path / 'transactions.jsonl'
+    assert migrate_json_to_jsonl(str(legacy), str(dest)) == 2
+    assert load_transactions(str(dest)) == [{'transaction_id': '1'}, {'transaction_id': '2'}]
+
+
+def test_migrate_refuses_to_overwrite_existing_log(legacy, tmp_path):
+    dest = tmp_path / 'transactions.jsonl'
+    dest.write_text(json.dumps({'transaction_id': 'new'}) + '\n')
+
+    with pytest.raises(FileExistsError):
+        migrate_json_to_jsonl(str(legacy), str(dest))
+    assert load_transactions(str(dest)) == [{'transaction_id': 'new'}]
+
+    assert migrate_json_to_jsonl(str(legacy), str(dest), force=True) == 2
+
+
+def test_ensure_migrated_runs_once(legacy, tmp_path):
+    dest = str(tmp_path / 'transactions.jsonl')
+    assert resolve_transactions_file(str(legacy)) == dest
+    with TransactionLog(dest) as log:
+        log.append({'transaction_id': '3'})
+
+    # The legacy file is still there, but the log must not be migrated over again
+    assert ensure_migrated(dest) == 0
+    assert [txn['transaction_id'] for txn in load_transactions(dest)] == ['1', '2', '3']
+
+
+def test_ensure_migrated_replaces_empty_log(legacy, tmp_path):
+    dest = tmp_path / 'transactions.jsonl'
+    dest.touch()
+    assert ensure_migrated(str(dest)) == 2
+
+
+def test_compact_drops_torn_lines_and_duplicates(tmp_path):
+    path = tmp_path / 'transactions.jsonl'
+    path.write_text('{"transaction_id": "1"}\n{"transaction_id": "1"}\n{"transact')
+    assert compact_transactions(str(path)) == (1, 2)
+
+
+def test_append_after_torn_line_keeps_new_record(tmp_path):
+    path = tmp_path / 'transactions.jsonl'
+    path.write_text('{"transaction_id": "1"}\n{"transact')
+    with TransactionLog(str(path)) as log:
+        log.append({'transaction_id': '2'})
+        log.append({'transaction_id': '3'})
+    assert load_transactions(str(path)) == [{'transaction_id': '1'}, {'transaction_id': '2'},
+                                            {'transaction_id': '3'}]
@@ -0,0 +1,42 @@
+import json
+import sqlite3
+
+import pytest
+
+from transaction_store import TransactionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TransactionStore(str(tmp_path / 'transactions.db'))
+    yield store
+    store._conn.close()
+
+
+def test_add_many_ignores_exact_duplicates(store):
+    assert store.add_many([{'transaction_id': '1'}, {'transaction_id': '1'}, {'transaction_id': '2'}]) == 2
+    assert store.count() == 2
+
+
+def test_failed_add_many_rolls_back(store):
+    store._conn.execute(
+        "CREATE TRIGGER reject_bad BEFORE INSERT ON transactions WHEN NEW.transaction_id = 'bad' "
+        "BEGIN SELECT RAISE(ABORT, 'bad row'); END"
+    )
+    with pytest.raises(sqlite3.IntegrityError):
+        store.add_many([{'transaction_id': '1'}, {'transaction_id': 'bad'}])
+
+    assert not store._conn.in_transaction
+    assert store.count() == 0
+    assert store.add({'transaction_id': '2'}) == 1
+
+
+def test_sync_reads_only_complete_new_lines(store, tmp_path):
+    path = tmp_path / 'transactions.jsonl'
+    path.write_text(json.dumps({'transaction_id': '1'}) + '\n' + '{"transaction_id": "2"')
+    assert store.sync_from_jsonl(str(path)) == 1
+
+    with open(path, 'a') as f:
+        f.write('}\n')
+    assert store.sync_from_jsonl(str(path)) == 1
+    assert [txn['transaction_id'] for txn in store.page()] == ['2', '1']
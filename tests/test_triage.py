@@ -0,0 +1,56 @@
+import random
+
+import cv2
+import numpy as np
+
+from bench.synthetic_receipts import random_receipt, render_receipt
+from triage import SimilarImageIndex, merge_stats, stats_delta, triage_image, triage_stats
+
+
+def flip(fingerprint, bits):
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def test_similar_within_distance_only():
+    index = SimilarImageIndex(max_distance=4)
+    base = random.Random(1).getrandbits(64)
+    assert index.match(base, 'a.png') is None
+    assert index.match(flip(base, [0, 13, 26, 39]), 'b.png') == 'a.png'
+    assert index.match(flip(base, [0, 13, 26, 39, 52]), 'c.png') is None
+
+
+def test_banded_lookup_matches_brute_force():
+    rng = random.Random(7)
+    index = SimilarImageIndex(max_distance=4)
+    seen = []
+    for idx in range(2000):
+        if seen and rng.random() < 0.3:
+            fingerprint = flip(rng.choice(seen)[1], rng.sample(range(64), rng.randint(0, 6)))
+        else:
+            fingerprint = rng.getrandbits(64)
+        expected = any((fingerprint ^ other).bit_count() <= 4 for _, other in seen)
+        match = index.match(fingerprint, idx)
+        assert (match is not None) == expected
+        if match is None:
+            seen.append((idx, fingerprint))
+
+
+def test_merge_worker_stats():
+    before = triage_stats()
+    merge_stats({'accepted': 3, 'rejected': {'blank': 1}, 'downscaled': 2})
+    assert stats_delta(before, triage_stats()) == {'accepted': 3, 'rejected': {'blank': 1}, 'downscaled': 2}
+
+
+def test_long_scrolling_screenshot_is_a_receipt():
+    # A dozen transfers in one bank-app screenshot: ten times taller than wide
+    rng = random.Random(0)
+    lines = []
+    for _ in range(12):
+        lines += random_receipt(rng, 'bank')[0]
+    image = cv2.cvtColor(np.array(render_receipt(lines, width=720)), cv2.COLOR_RGB2BGR)
+    assert image.shape[0] / image.shape[1] > 8
+
+    decision = triage_image(image)
+    assert decision['accept'], decision
@@ -0,0 +1,221 @@
+from contextlib import contextmanager
+import threading
+import time
+import json
+import io
+import os
+import cProfile
+import pstats
+
+try:
+    import pyinstrument
+except ImportError:  # optional profiler
+    pyinstrument = None
+
+# Set OCRECEIPT_TRACE=1 to collect stage metrics for every receipt
+_enabled = os.getenv('OCRECEIPT_TRACE', '') not in ('', '0')
+
+# Histogram bucket bounds (seconds) for the Prometheus dump
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_local = threading.local()
+_metrics_lock = threading.Lock()
+_metrics = {}
+
+def enable(flag=True):
+    """Turn process-wide stage metrics on or off."""
+    global _enabled
+    _enabled = flag
+
+def is_enabled():
+    return _enabled
+
+class Trace:
+    """Stage durations recorded for one receipt, in the order they finished."""
+
+    def __init__(self, name=None):
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans = []
+        self.profiles = []
+
+    def add(self, stage, duration):
+        self.spans.append((stage, duration))
+
+    def add_profile(self, text):
+        self.profiles.append(text)
+
+    def durations(self):
+        """Seconds per stage, summed when a stage ran more than once."""
+        totals = {}
+        for stage, duration in self.spans:
+            totals[stage] = totals.get(stage, 0.0) + duration
+        return totals
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'total': time.perf_counter() - self.start,
+            'stages': self.durations()
+        }
+
+def trace(name=None):
+    """
+    Collect the spans run on this thread into a Trace, whether or not
+    process-wide metrics are enabled.
+
+        with trace('receipt.png') as t:
+            ...
+        t.durations()
+    """
+    return activate(Trace(name))
+
+@contextmanager
+def activate(trace):
+    """Make an existing Trace current on this thread, e.g. to continue it on another thread."""
+    previous = getattr(_local, 'trace', None)
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+class _Span:
+    __slots__ = ('name', 'trace', 'start')
+
+    def __init__(self, name, trace):
+        self.name = name
+        self.trace = trace
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, time.perf_counter() - self.start, self.trace)
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+def span(name):
+    """
+    Time a block as stage `name`.
+
+    When tracing is off and no trace is active this returns a shared no-op
+    context manager, so instrumented code costs one attribute lookup.
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is None and not _enabled:
+        return _NOOP_SPAN
+    return _Span(name, trace)
+
+def record(name, duration):
+    """Record a duration measured elsewhere (e.g. pipeline stage timings)."""
+    trace = getattr(_local, 'trace', None)
+    if trace is None and not _enabled:
+        return
+    _record(name, duration, trace)
+
+def record_spans(spans, trace=None):
+    """Merge (stage, duration) pairs collected in another process into `trace` and the metrics."""
+    trace = trace or getattr(_local, 'trace', None)
+    if trace is None and not _enabled:
+        return
+    for name, duration in spans:
+        _record(name, duration, trace)
+
+def _record(name, duration, trace):
+    if trace is not None:
+        trace.add(name, duration)
+    with _metrics_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = {'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': [0] * len(BUCKETS)}
+        metric['count'] += 1
+        metric['sum'] += duration
+        metric['max'] = max(metric['max'], duration)
+        for idx, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                metric['buckets'][idx] += 1
+
+def metrics_snapshot():
+    """Aggregated stage metrics: {stage: {count, sum, mean, max, buckets}}."""
+    with _metrics_lock:
+        snapshot = {name: dict(metric, buckets=list(metric['buckets'])) for name, metric in _metrics.items()}
+    for metric in snapshot.values():
+        metric['mean'] = metric['sum'] / metric['count'] if metric['count'] else 0.0
+    return snapshot
+
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+def metrics_json():
+    return json.dumps(metrics_snapshot(), indent=2)
+
+def metrics_prometheus():
+    """Stage metrics in the Prometheus text exposition format."""
+    lines = [
+        '# HELP ocreceipt_stage_seconds Time spent per pipeline stage',
+        '# TYPE ocreceipt_stage_seconds histogram'
+    ]
+    for name, metric in sorted(metrics_snapshot().items()):
+        for bound, count in zip(BUCKETS, metric['buckets']):
+            lines.append(f'ocreceipt_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+        lines.append(f'ocreceipt_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {metric["count"]}')
+        lines.append(f'ocreceipt_stage_seconds_sum{{stage="{name}"}} {metric["sum"]}')
+        lines.append(f'ocreceipt_stage_seconds_count{{stage="{name}"}} {metric["count"]}')
+    return '\n'.join(lines) + '\n'
+
+def dump_metrics(path):
+    """Write metrics to `path`: Prometheus text for .prom/.txt, JSON otherwise."""
+    text = metrics_prometheus() if path.endswith(('.prom', '.txt')) else metrics_json()
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+class Profiler:
+    """
+    Optional profiler around a block; `text` holds the report afterwards.
+
+    Uses pyinstrument when requested and installed, cProfile otherwise.
+
+    Args:
+        kind: 'cprofile' or 'pyinstrument'
+        limit: Number of functions in the cProfile report
+    """
+
+    def __init__(self, kind='cprofile', limit=30):
+        self.kind = kind if kind != 'pyinstrument' or pyinstrument is not None else 'cprofile'
+        self.limit = limit
+        self.text = None
+
+    def __enter__(self):
+        if self.kind == 'pyinstrument':
+            self._profiler = pyinstrument.Profiler()
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.kind == 'pyinstrument':
+            self._profiler.stop()
+            self.text = self._profiler.output_text()
+        else:
+            self._profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(self.limit)
+            self.text = out.getvalue()
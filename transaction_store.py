@@ -0,0 +1,227 @@
+import threading
+import sqlite3
+import hashlib
+import json
+import os
+
+# Columns pulled out of the JSON record so they can be indexed and filtered
+INDEXED_FIELDS = [
+    'transaction_id',
+    'transaction_date',
+    'transaction_status',
+    'payment_method',
+    'sender_name',
+    'recipient_name',
+    'amount',
+    'currency',
+    'extraction_timestamp',
+    'custom_id'
+]
+
+def default_store_path(transactions_file):
+    """SQLite index file that sits next to a JSONL transaction file."""
+    return os.path.splitext(transactions_file)[0] + '.db'
+
+class TransactionStore:
+    """
+    SQLite-backed transaction repository for history queries.
+
+    The JSONL transaction log stays the source of truth; this store indexes
+    it (sync_from_jsonl reads only lines appended since the last sync) and
+    serves filtered, paginated queries without loading every record.
+
+    Args:
+        path: SQLite database file
+    """
+
+    def __init__(self, path="transactions.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = ',\n'.join(f"{field} TEXT" for field in INDEXED_FIELDS)
+        self._conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS transactions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                record_hash TEXT NOT NULL UNIQUE,
+                {columns},
+                data TEXT NOT NULL
+            );
+        """)
+        existing = [row[1] for row in self._conn.execute("PRAGMA table_info(transactions)")]
+        for field in INDEXED_FIELDS:
+            if field not in existing:
+                self._conn.execute(f"ALTER TABLE transactions ADD COLUMN {field} TEXT")
+        self._conn.executescript("""
+            CREATE INDEX IF NOT EXISTS idx_txn_transaction_id ON transactions(transaction_id);
+            CREATE INDEX IF NOT EXISTS idx_txn_date ON transactions(transaction_date);
+            CREATE INDEX IF NOT EXISTS idx_txn_payment_method ON transactions(payment_method, id);
+            CREATE INDEX IF NOT EXISTS idx_txn_status ON transactions(transaction_status, id);
+            CREATE INDEX IF NOT EXISTS idx_txn_sender ON transactions(sender_name);
+            CREATE INDEX IF NOT EXISTS idx_txn_recipient ON transactions(recipient_name);
+            CREATE INDEX IF NOT EXISTS idx_txn_custom_id ON transactions(custom_id);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                source TEXT PRIMARY KEY,
+                offset INTEGER NOT NULL,
+                inode INTEGER NOT NULL
+            );
+        """)
+
+    @staticmethod
+    def _row_values(data):
+        canonical = json.dumps(data, sort_keys=True)
+        record_hash = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+        fields = [None if data.get(field) is None else str(data.get(field)) for field in INDEXED_FIELDS]
+        return [record_hash, *fields, json.dumps(data)]
+
+    def add_many(self, transactions):
+        """Insert transactions, ignoring exact duplicates. Returns the number inserted."""
+        rows = [self._row_values(data) for data in transactions]
+        if not rows:
+            return 0
+        placeholders = ', '.join('?' * (len(INDEXED_FIELDS) + 2))
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    f"INSERT OR IGNORE INTO transactions (record_hash, {', '.join(INDEXED_FIELDS)}, data) "
+                    f"VALUES ({placeholders})",
+                    rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                # Don't leave the connection inside a half-written transaction
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._conn.total_changes - before
+
+    def add(self, data):
+        return self.add_many([data])
+
+    def sync_from_jsonl(self, filename):
+        """
+        Import records appended to a JSONL file since the previous sync.
+
+        Only complete lines are consumed. If the file was replaced (e.g. by
+        compaction), it is rescanned from the start; duplicates are ignored.
+
+        Returns:
+            added: Number of new transactions stored
+        """
+        if not os.path.exists(filename):
+            return 0
+        source = os.path.abspath(filename)
+        stat = os.stat(filename)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT offset, inode FROM sync_state WHERE source = ?", (source,)
+            ).fetchone()
+        offset = 0
+        if row is not None and row['inode'] == stat.st_ino and row['offset'] <= stat.st_size:
+            offset = row['offset']
+        if offset == stat.st_size:
+            return 0
+
+        transactions = []
+        with open(filename, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                try:
+                    transactions.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+
+        added = self.add_many(transactions)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (source, offset, inode) VALUES (?, ?, ?)",
+                (source, offset, stat.st_ino)
+            )
+        return added
+
+    @staticmethod
+    def _where(filters):
+        clauses = []
+        params = []
+        for field in ('transaction_id', 'transaction_date', 'transaction_status',
+                      'payment_method', 'sender_name', 'recipient_name'):
+            value = filters.get(field)
+            if value:
+                clauses.append(f"{field} = ?")
+                params.append(value)
+        search = filters.get('search')
+        if search:
+            pattern = f"%{search}%"
+            clauses.append("(sender_name LIKE ? OR recipient_name LIKE ? OR transaction_id LIKE ?)")
+            params.extend([pattern, pattern, pattern])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, **filters):
+        where, params = self._where(filters)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM transactions{where}", params).fetchone()[0]
+
+    def page(self, limit=50, offset=0, before_id=None, **filters):
+        """
+        Return one page of transactions, newest first.
+
+        Pass `before_id` (the smallest id of the previous page) for keyset
+        pagination, which stays fast however deep the page is; `offset`
+        is supported for jumping to an arbitrary page number.
+
+        Filters: transaction_id, transaction_date, transaction_status,
+        payment_method, sender_name, recipient_name, search (substring of
+        sender/recipient name or transaction ID).
+
+        Returns:
+            transactions: List of transaction dicts, each with an `id` key
+        """
+        where, params = self._where(filters)
+        if before_id is not None:
+            where += (" AND " if where else " WHERE ") + "id < ?"
+            params.append(before_id)
+        query = f"SELECT id, data FROM transactions{where} ORDER BY id DESC LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._conn.execute(query, [*params, limit, offset]).fetchall()
+        return [{'id': row['id'], **json.loads(row['data'])} for row in rows]
+
+    def get(self, transaction_row_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, data FROM transactions WHERE id = ?", (transaction_row_id,)
+            ).fetchone()
+        return None if row is None else {'id': row['id'], **json.loads(row['data'])}
+
+    def existing_custom_ids(self, custom_ids):
+        """Subset of `custom_ids` that already have a stored transaction."""
+        custom_ids = list(custom_ids)
+        found = set()
+        with self._lock:
+            for start in range(0, len(custom_ids), 500):
+                chunk = custom_ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT custom_id FROM transactions WHERE custom_id IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def distinct_values(self, field):
+        """Distinct non-null values of an indexed field (e.g. for filter dropdowns)."""
+        if field not in INDEXED_FIELDS:
+            raise ValueError(f"Unknown field: {field}")
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT DISTINCT {field} FROM transactions WHERE {field} IS NOT NULL ORDER BY {field}"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
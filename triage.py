@@ -0,0 +1,175 @@
+import threading
+import math
+import os
+import numpy as np
+import cv2
+
+from preprocess import adaptive_scale
+
+# Pixel budget of the thumbnail used for triage (256 x 256). Capped by area
+# rather than longest side, so long screenshots keep a usable width
+THUMBNAIL_PIXELS = 256 * 256
+
+# Height / width outside which an image is not a receipt. Scrolling bank-app
+# screenshots can be far taller than a screen, hence the generous default
+MIN_ASPECT_RATIO = float(os.getenv('OCRECEIPT_TRIAGE_MIN_ASPECT', '0.2'))
+MAX_ASPECT_RATIO = float(os.getenv('OCRECEIPT_TRIAGE_MAX_ASPECT', '40'))
+
+# Longest side handed to EasyOCR; larger images are downscaled first
+MAX_OCR_SIDE = 2560
+
+# Hamming distance between difference hashes below which images look alike.
+# Receipts from the same app template are often this close, so this is only
+# a hint; duplicates are decided on the image hash and the parsed receipt.
+SIMILAR_DISTANCE = 4
+
+def make_thumbnail(image, max_pixels=THUMBNAIL_PIXELS):
+    """Grayscale thumbnail of at most `max_pixels` pixels."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+    h, w = gray.shape[:2]
+    scale = math.sqrt(max_pixels / (h * w))
+    if scale >= 1:
+        return gray
+    return cv2.resize(gray, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+
+def dhash(gray, hash_size=8):
+    """64-bit difference hash of a grayscale image."""
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+def image_fingerprint(image_bytes):
+    """dhash computed from a reduced-resolution decode (much cheaper than a full decode)."""
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    gray = cv2.imdecode(nparr, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if gray is None:
+        raise ValueError("Could not decode image")
+    return dhash(gray)
+
+class SimilarImageIndex:
+    """
+    Remembers fingerprints and finds earlier images that look alike.
+
+    Fingerprints are split into max_distance + 1 bands and indexed per
+    band. Two fingerprints within max_distance bits must share at least
+    one band exactly, so a lookup only compares against those candidates
+    instead of scanning everything seen so far.
+    """
+
+    def __init__(self, max_distance=SIMILAR_DISTANCE):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        self._widths = [64 // bands + (1 if idx < 64 % bands else 0) for idx in range(bands)]
+        self._index = {}
+        self._lock = threading.Lock()
+
+    def _bands(self, fingerprint):
+        bands = []
+        shift = 0
+        for idx, width in enumerate(self._widths):
+            bands.append((idx, (fingerprint >> shift) & ((1 << width) - 1)))
+            shift += width
+        return bands
+
+    def match(self, fingerprint, key):
+        """Return the key of an earlier look-alike image, or remember this one under `key` and return None."""
+        bands = self._bands(fingerprint)
+        with self._lock:
+            for band in bands:
+                for seen_key, seen in self._index.get(band, ()):
+                    if (seen ^ fingerprint).bit_count() <= self.max_distance:
+                        return seen_key
+            for band in bands:
+                self._index.setdefault(band, []).append((key, fingerprint))
+            return None
+
+def triage_metrics(thumbnail):
+    """Cheap quality metrics computed on the thumbnail."""
+    brightness = float(np.mean(thumbnail))
+    contrast = float(np.std(thumbnail))
+    h, w = thumbnail.shape[:2]
+
+    # Text density: share of pixels that are dark strokes after local thresholding
+    strokes = cv2.adaptiveThreshold(
+        thumbnail, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 10
+    )
+    text_density = float(np.count_nonzero(strokes)) / strokes.size
+
+    return {
+        'brightness': brightness,
+        'contrast': contrast,
+        'aspect_ratio': h / w,
+        'text_density': text_density
+    }
+
+def triage_image(image):
+    """
+    Decide whether an image is worth running through OCR, and at what size.
+
+    The scale is the smaller of the MAX_OCR_SIDE cap and the factor that
+    normalizes glyph height (preprocess.adaptive_scale); it is only
+    computed for images that pass triage.
+
+    Returns:
+        decision: Dict with `accept`, `reason` (why it was rejected),
+            `scale` (resize factor to apply before OCR) and `metrics`
+    """
+    metrics = triage_metrics(make_thumbnail(image))
+    h, w = image.shape[:2]
+    decision = {
+        'accept': True,
+        'reason': None,
+        'scale': 1.0,
+        'metrics': metrics
+    }
+
+    if metrics['contrast'] < 3:
+        decision.update(accept=False, reason='blank')
+    elif metrics['text_density'] < 0.002:
+        decision.update(accept=False, reason='no_text')
+    elif metrics['text_density'] > 0.6 or not MIN_ASPECT_RATIO <= metrics['aspect_ratio'] <= MAX_ASPECT_RATIO:
+        decision.update(accept=False, reason='not_a_receipt')
+    else:
+        decision['scale'] = min(MAX_OCR_SIDE / max(h, w), adaptive_scale(image))
+
+    _record(decision)
+    return decision
+
+# Triage counters (shared per process)
+_stats_lock = threading.Lock()
+_stats = {'accepted': 0, 'rejected': {}, 'downscaled': 0}
+
+def _record(decision):
+    with _stats_lock:
+        if decision['accept']:
+            _stats['accepted'] += 1
+            if decision['scale'] < 1:
+                _stats['downscaled'] += 1
+        else:
+            _stats['rejected'][decision['reason']] = _stats['rejected'].get(decision['reason'], 0) + 1
+
+def triage_stats():
+    with _stats_lock:
+        return {
+            'accepted': _stats['accepted'],
+            'rejected': dict(_stats['rejected']),
+            'downscaled': _stats['downscaled']
+        }
+
+def stats_delta(before, after):
+    """Counts added between two triage_stats() snapshots."""
+    return {
+        'accepted': after['accepted'] - before['accepted'],
+        'rejected': {reason: count - before['rejected'].get(reason, 0)
+                     for reason, count in after['rejected'].items()
+                     if count != before['rejected'].get(reason, 0)},
+        'downscaled': after['downscaled'] - before['downscaled']
+    }
+
+def merge_stats(delta):
+    """Add counts collected in another process (e.g. an OCR worker) to this one."""
+    with _stats_lock:
+        _stats['accepted'] += delta['accepted']
+        _stats['downscaled'] += delta['downscaled']
+        for reason, count in delta['rejected'].items():
+            _stats['rejected'][reason] = _stats['rejected'].get(reason, 0) + count
@@ -1,5 +1,5 @@
 from dotenv import load_dotenv
-from groq import Groq
+from groq import Groq, AsyncGroq
 import os
 
 load_dotenv()
@@ -10,4 +10,11 @@ def init_groq():
     api_key = GROQ_API_KEY
     if api_key:
         return Groq(api_key=api_key)
+    return None
+
+# Initialize async Groq client (retries are handled by async_parse)
+def init_groq_async(base_url=None):
+    api_key = GROQ_API_KEY
+    if api_key:
+        return AsyncGroq(api_key=api_key, base_url=base_url, max_retries=0)
     return None
\ No newline at end of file
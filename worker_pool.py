@@ -0,0 +1,151 @@
+from concurrent.futures import ProcessPoolExecutor, Future
+from contextlib import nullcontext
+import multiprocessing
+import threading
+import time
+import os
+
+from extract_and_parse import warm_up, extract_text_easyocr
+import tracing
+import triage
+
+def _init_worker(torch_threads):
+    """Load and warm up the EasyOCR reader once when a worker process starts."""
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    warm_up()
+
+def _ping(delay):
+    time.sleep(delay)
+    report, error = warm_up()
+    return os.getpid(), report, error
+
+def _ocr_job(image_bytes, use_preprocessing, pipeline='default', traced=False, profile=None):
+    # Stage spans (and a profile, if requested) and triage counts are
+    # collected in the worker and shipped back with the result
+    before = triage.triage_stats()
+    if not traced:
+        result = extract_text_easyocr(image_bytes, use_preprocessing=use_preprocessing, pipeline=pipeline)
+        return result, None, None, triage.stats_delta(before, triage.triage_stats())
+    profiler = tracing.Profiler(profile) if profile else nullcontext()
+    with tracing.trace() as trace, profiler:
+        result = extract_text_easyocr(image_bytes, use_preprocessing=use_preprocessing, pipeline=pipeline)
+    return result, trace.spans, getattr(profiler, 'text', None), triage.stats_delta(before, triage.triage_stats())
+
+class ReceiptWorkerPool:
+    """
+    Pool of OCR worker processes, each holding its own warm EasyOCR reader.
+
+    Submissions block once `max_pending` jobs are queued or running, so
+    producers can't outrun the workers and pile images up in memory.
+
+    Args:
+        num_workers: Number of worker processes (defaults to CPU count)
+        max_pending: Maximum jobs in flight (defaults to 2 per worker)
+        torch_threads: Torch intra-op threads per worker
+    """
+
+    def __init__(self, num_workers=None, max_pending=None, torch_threads=1):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.num_workers * 2
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self.warmup = {}
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(torch_threads,)
+        )
+
+    def start(self):
+        """
+        Start every worker process and wait until each has warmed up its
+        reader, instead of paying for it on the first receipts.
+
+        Returns:
+            warmup: {pid: warm_up report} of every worker (also kept as `self.warmup`)
+
+        Raises:
+            RuntimeError: If a worker could not load the OCR models
+        """
+        # Processes are spawned lazily; a short sleep per ping spreads the
+        # pings over all of them
+        while len(self.warmup) < self.num_workers:
+            pings = [self._executor.submit(_ping, 0.05) for _ in range(self.num_workers)]
+            for ping in pings:
+                pid, report, error = ping.result()
+                if error:
+                    raise RuntimeError(error)
+                self.warmup[pid] = report
+        return self.warmup
+
+    def submit(self, image_bytes, use_preprocessing=True, pipeline='default', profile=None):
+        """
+        Queue one image for OCR, blocking while the pool is saturated.
+
+        Stage timings go to the submitting thread's trace, as does a
+        profiler report when `profile` ('cprofile'/'pyinstrument') is set.
+
+        Returns:
+            future: Resolves to the (text, error) tuple of extract_text_easyocr
+        """
+        # Spans land in the submitting thread's trace, if it has one
+        trace = tracing.current_trace()
+        self._slots.acquire()
+        try:
+            job = self._executor.submit(_ocr_job, image_bytes, use_preprocessing, pipeline,
+                                        tracing.is_enabled() or trace is not None, profile)
+        except Exception:
+            self._slots.release()
+            raise
+
+        future = Future()
+        def on_done(done_job):
+            self._slots.release()
+            try:
+                result, spans, profile_text, triage_counts = done_job.result()
+            except Exception as e:
+                future.set_exception(e)
+                return
+            triage.merge_stats(triage_counts)
+            if spans:
+                tracing.record_spans(spans, trace)
+            if profile_text and trace is not None:
+                trace.add_profile(profile_text)
+            future.set_result(result)
+
+        job.add_done_callback(on_done)
+        return future
+
+    def map(self, images_bytes, use_preprocessing=True, pipeline='default'):
+        """
+        OCR an iterable of images, yielding (text, error) tuples in input order.
+
+        The iterable is consumed lazily, so it can stream from disk.
+        """
+        pending = []
+        for image_bytes in images_bytes:
+            pending.append(self.submit(image_bytes, use_preprocessing, pipeline))
+            while pending and pending[0].done():
+                yield self._result(pending.pop(0))
+        for future in pending:
+            yield self._result(future)
+
+    @staticmethod
+    def _result(future):
+        try:
+            return future.result()
+        except Exception as e:
+            return None, f"OCR Error: {str(e)}"
+
+    def close(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()